@@ -0,0 +1,98 @@
+import os
+import sys
+import types
+
+import pytest
+
+# Die Module liegen flach im Projektverzeichnis
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from zeitansage_fakes import (fake_wav_bytes, install_fake_ffmpeg, start_fake_gtts_server,  # noqa: E402
+                              start_fake_weather_server)
+import zeitansage_log  # noqa: E402
+
+
+@pytest.hookimpl(hookwrapper=True, trylast=True)  # Innerhalb der Ausgabeumleitung von pytest
+def pytest_runtest_call(item):
+    """Gibt die Meldungen aus log() noch während des Tests aus, damit pytest sie dem Test zuordnet."""
+    yield
+    zeitansage_log.flush()
+
+
+@pytest.fixture
+def fake_weather_server():
+    """Lokaler Wetterserver (siehe start_fake_weather_server); url, state."""
+    server = start_fake_weather_server()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def fake_gtts_server():
+    """Fabrik für lokale gTTS-Server (siehe start_fake_gtts_server); alle werden am Ende beendet."""
+    servers = []
+
+    def start(**options):
+        server = start_fake_gtts_server(**options)
+        servers.append(server)
+        return server
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    """Stellt das ffmpeg-Ersatzskript für die Dauer des Tests vorne in den PATH."""
+    monkeypatch.setenv('PATH', os.environ.get('PATH', ''))  # Wird am Ende wiederhergestellt
+    return install_fake_ffmpeg(str(tmp_path))
+
+
+class FakePyttsx3Engine:
+    """pyttsx3-Engine ohne Sprachausgabe: schreibt fake_wav_bytes() und protokolliert setProperty()."""
+
+    def __init__(self, failures=0):
+        self.failures = failures  # So viele runAndWait()-Aufrufe schlagen fehl
+        self.properties = {'voices': [types.SimpleNamespace(id='gmw/en'), types.SimpleNamespace(id='gmw/de')],
+                           'voice': 'gmw/en'}
+        self.set_calls = []
+        self._pending = []
+
+    def getProperty(self, name):
+        return self.properties[name]
+
+    def setProperty(self, name, value):
+        self.set_calls.append((name, value))
+        self.properties[name] = value
+
+    def save_to_file(self, text, path):
+        self._pending.append((text, path))
+
+    def runAndWait(self):
+        pending, self._pending = self._pending, []
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("Treiberfehler")
+        for text, path in pending:
+            with open(path, 'wb') as wav_file:
+                wav_file.write(fake_wav_bytes(text))
+
+    def stop(self):
+        pass
+
+
+@pytest.fixture
+def fake_pyttsx3(monkeypatch):
+    """Ersetzt pyttsx3 durch ein Modul ohne Sprachausgabe; module.engines hält alle erzeugten Engines."""
+    module = types.ModuleType('pyttsx3')
+    module.engines = []
+    module.failures = 0  # Fehlversuche der nächsten Engine
+
+    def init(*args, **kwargs):
+        engine = FakePyttsx3Engine(module.failures)
+        module.failures = 0
+        module.engines.append(engine)
+        return engine
+    module.init = init
+    monkeypatch.setitem(sys.modules, 'pyttsx3', module)
+    return module
@@ -0,0 +1,75 @@
+import datetime
+
+import numpy as np
+
+import zeitansage_log
+from zeitansage_archive import AnnouncementArchive, build_day_archive, grid_phase, load_announcement_archive
+from zeitansage_clips import PhraseClipEngine
+
+RATE = 1000
+INTERVAL = 3600  # 24 Slots, damit der Test schnell bleibt
+
+
+def render_token(text, lang_code):
+    return np.full(len(text) * 5, 0.25 if lang_code == 'de' else -0.25, dtype=np.float32)
+
+
+def make_engine():
+    engine = PhraseClipEngine(render_token, RATE, crossfade_seconds=0)
+    engine.add_language('de', "Es ist %H Uhr.")
+    engine.add_language('en', "It is %I %p.")
+    engine.warm_up()
+    return engine
+
+
+def test_archive_round_trip(tmp_path, capsys):
+    engine = make_engine()
+    path = str(tmp_path / 'tag.archiv')
+    build_day_archive(path, engine, INTERVAL, params={'voices': ('a', 'b')}, workers=2, phase_seconds=0)
+    archive = load_announcement_archive(path, RATE, INTERVAL, {'voices': ('a', 'b')})
+    assert archive.languages == ['de', 'en']
+    when = datetime.datetime(2024, 5, 1, 13, 0, 0)
+    for lang_code in ('de', 'en'):
+        np.testing.assert_array_equal(archive.lookup(lang_code, when), engine.assemble(lang_code, when))
+    audio = archive.lookup('de', when)
+    assert audio.dtype == np.float32 and not audio.flags.writeable
+    assert np.shares_memory(audio, archive.data)  # Sicht in das mmap, keine Kopie pro Abruf
+    assert archive.lookup('de', when.replace(minute=30)) is None  # Kein Slot
+    assert archive.lookup('fr', when) is None
+    zeitansage_log.flush()
+    assert "Tagesarchiv" in capsys.readouterr().out
+
+
+def test_grid_phase_follows_utc_offset():
+    nepal = datetime.timezone(datetime.timedelta(hours=5, minutes=45))
+    assert grid_phase(INTERVAL, datetime.datetime(2024, 5, 1, 13, 45, tzinfo=nepal)) == 45 * 60
+    assert grid_phase(15, datetime.datetime(2024, 5, 1, 13, 45, tzinfo=nepal)) == 0
+    assert grid_phase(INTERVAL, datetime.datetime(2024, 5, 1, 13, 0, tzinfo=datetime.timezone.utc)) == 0
+
+
+def test_archive_slots_follow_shifted_grid(tmp_path):
+    engine = make_engine()
+    path = str(tmp_path / 'tag.archiv')
+    build_day_archive(path, engine, INTERVAL, workers=1, phase_seconds=45 * 60)
+    archive = AnnouncementArchive(path)
+    assert len(archive.index) == 24
+    when = datetime.datetime(2024, 5, 1, 23, 45, 0)
+    np.testing.assert_allclose(archive.lookup('de', when), engine.assemble('de', when), atol=1e-4)
+    assert archive.lookup('de', when.replace(minute=0)) is None  # Liegt nicht auf dem verschobenen Raster
+
+
+def test_archive_is_ignored_with_other_settings(tmp_path, capsys):
+    path = str(tmp_path / 'tag.archiv')
+    build_day_archive(path, make_engine(), INTERVAL, workers=1)
+    assert AnnouncementArchive(path).matches(RATE, INTERVAL)
+    assert load_announcement_archive(path, RATE * 2, INTERVAL) is None
+    assert load_announcement_archive(path, RATE, INTERVAL, {'voices': 'neu'}) is None
+    assert load_announcement_archive(str(tmp_path / 'fehlt'), RATE, INTERVAL) is None
+    (tmp_path / 'kaputt').write_bytes(b'kein Archiv')
+    assert load_announcement_archive(str(tmp_path / 'kaputt'), RATE, INTERVAL) is None
+    (tmp_path / 'alt').write_bytes(b'ZTARCH01' + bytes(8))
+    assert load_announcement_archive(str(tmp_path / 'alt'), RATE, INTERVAL) is None
+    zeitansage_log.flush()
+    output = capsys.readouterr().out
+    assert output.count("WARNUNG: Tagesarchiv") == 4
+    assert "veraltetes Format" in output
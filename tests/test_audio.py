@@ -0,0 +1,197 @@
+import itertools
+import os
+import subprocess
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+from zeitansage_audio import (ClipProcessor, PolyphaseResampler, db_to_gain, decode_audio_bytes, ffmpeg_decode_bytes,
+                              ffmpeg_decode_stream, normalize_loudness, probe_sample_rate, resample_polyphase,
+                              resample_stream, trim_silence, wav_decode_stream)
+from zeitansage_fakes import FAKE_TTS_SAMPLE_RATE, fake_wav_bytes
+
+# Reicht stdin sofort unverändert an stdout weiter (das Fake aus zeitansage_fakes liest erst die ganze Eingabe)
+PASSTHROUGH_FFMPEG_SOURCE = """#!{python}
+import os
+while True:
+    data = os.read(0, 4096)
+    if not data:
+        break
+    os.write(1, data)
+"""
+RAW_BLOCK = np.full(256, 0.25, dtype=np.float32).tobytes()  # f32le-Rohdaten ohne erkennbaren Dateikopf
+
+
+@pytest.fixture
+def passthrough_ffmpeg(tmp_path, monkeypatch):
+    path = tmp_path / 'ffmpeg'
+    path.write_text(PASSTHROUGH_FFMPEG_SOURCE.format(python=sys.executable))
+    path.chmod(0o755)
+    monkeypatch.setenv('PATH', str(tmp_path) + os.pathsep + os.environ.get('PATH', ''))
+
+
+def recording(factory, instances):
+    """Wrapper um factory, der jedes erzeugte Objekt in instances festhält."""
+    def create(*args, **kwargs):
+        instance = factory(*args, **kwargs)
+        instances.append(instance)
+        return instance
+    return create
+
+
+def sine(freq, seconds, rate, amplitude=0.5):
+    t = np.arange(int(seconds * rate)) / rate
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+def dominant_frequency(samples, rate):
+    spectrum = np.abs(np.fft.rfft(samples * np.hanning(len(samples))))
+    return np.argmax(spectrum) * rate / len(samples)
+
+
+def test_resample_length_matches_ratio():
+    for source, target in [(22050, 10000), (24000, 20000), (8000, 44100)]:
+        audio = sine(440, 0.5, source)
+        out = resample_polyphase(audio, source, target)
+        assert len(out) == round(len(audio) * target / source)
+        assert out.dtype == np.float32
+
+
+def test_resample_keeps_frequency():
+    out = resample_polyphase(sine(440, 1.0, 22050), 22050, 10000)
+    assert abs(dominant_frequency(out[1000:-1000], 10000) - 440) < 5
+
+
+def test_resample_removes_content_above_target_nyquist():
+    out = resample_polyphase(sine(7000, 1.0, 22050), 22050, 10000)  # 7 kHz liegt über 5 kHz
+    assert np.sqrt(np.mean(np.square(out[500:-500]))) < 0.01
+
+
+def test_blockwise_resampling_equals_one_shot():
+    audio = sine(300, 0.7, 24000)
+    one_shot = resample_polyphase(audio, 24000, 10000)
+    streamed = np.concatenate(list(resample_stream(np.array_split(audio, 13), 24000, 10000)))
+    np.testing.assert_allclose(streamed, one_shot, atol=1e-5)
+
+
+def test_resampler_keeps_state_between_segments():
+    resampler = PolyphaseResampler(20000, 10000)
+    audio = sine(200, 0.4, 20000)
+    parts = [resampler.process(block) for block in np.array_split(audio, 7)] + [resampler.flush()]
+    joined = np.concatenate(parts)
+    assert len(joined) == len(audio) // 2
+    np.testing.assert_allclose(joined[100:-100], resample_polyphase(audio, 20000, 10000)[100:-100], atol=1e-5)
+
+
+def test_resample_same_rate_is_identity():
+    audio = sine(100, 0.1, 10000)
+    assert resample_polyphase(audio, 10000, 10000) is audio
+
+
+def test_decode_wav_bytes_resamples():
+    wav = fake_wav_bytes("Hallo")
+    assert probe_sample_rate(wav) == FAKE_TTS_SAMPLE_RATE
+    audio = decode_audio_bytes(wav, 10000)
+    expected = int(5 * 0.06 * FAKE_TTS_SAMPLE_RATE)
+    assert len(audio) == round(expected * 10000 / FAKE_TTS_SAMPLE_RATE)
+    assert 0.2 < np.abs(audio).max() < 0.4
+
+
+def test_decode_through_ffmpeg_pipe(fake_ffmpeg):
+    wav = fake_wav_bytes("Hallo")
+    via_ffmpeg = ffmpeg_decode_bytes(wav, 10000)
+    direct = decode_audio_bytes(wav, 10000)
+    assert len(via_ffmpeg) == len(direct)
+    np.testing.assert_allclose(via_ffmpeg, direct, atol=1e-4)
+
+
+def test_decode_without_audio_returns_none(fake_ffmpeg):
+    assert decode_audio_bytes(b'', 10000) is None
+    assert ffmpeg_decode_bytes(b'kein Audio', 10000) is None
+
+
+def test_stream_blocks_have_block_length(fake_ffmpeg):
+    wav = fake_wav_bytes("Hallo Welt")
+    for blocks in (wav_decode_stream(wav, None, block_samples=500),
+                   wav_decode_stream(wav, FAKE_TTS_SAMPLE_RATE, block_samples=500),
+                   ffmpeg_decode_stream(wav, FAKE_TTS_SAMPLE_RATE, block_samples=500)):
+        lengths = [len(block) for block in blocks]
+        assert len(lengths) > 2
+        assert set(lengths[:-1]) == {500} and 0 < lengths[-1] <= 500
+    # Beim Resampling folgen die Blöcke den Eingangsblöcken im Verhältnis der Raten
+    lengths = [len(block) for block in wav_decode_stream(wav, 10000, block_samples=500)]
+    assert max(lengths) <= int(500 * 10000 / FAKE_TTS_SAMPLE_RATE) + 1
+
+
+def test_joined_stream_equals_decode_audio_bytes(fake_ffmpeg):
+    wav = fake_wav_bytes("Hallo Welt")
+    expected = decode_audio_bytes(wav, 10000)
+    for blocks in (wav_decode_stream(wav, 10000, block_samples=333),
+                   ffmpeg_decode_stream(wav, 10000, block_samples=333),
+                   resample_stream(np.array_split(np.concatenate(list(wav_decode_stream(wav, None))), 9),
+                                   FAKE_TTS_SAMPLE_RATE, 10000)):
+        joined = np.concatenate(list(blocks))
+        assert len(joined) == len(expected)
+        np.testing.assert_allclose(joined, expected, atol=1e-4)
+
+
+def test_ffmpeg_stream_yields_before_input_is_complete(passthrough_ffmpeg):
+    more_input, rest_fed = threading.Event(), threading.Event()
+
+    def source():
+        yield RAW_BLOCK * 2
+        more_input.wait(timeout=5)  # Langsame Quelle: der Rest kommt erst nach dem ersten Block
+        rest_fed.set()
+        yield RAW_BLOCK
+
+    blocks = ffmpeg_decode_stream(source(), 10000, block_samples=256)
+    first = next(blocks)
+    assert not rest_fed.is_set()
+    assert len(first) == 256
+    more_input.set()
+    assert [len(block) for block in blocks] == [256, 256]
+
+
+def test_closing_ffmpeg_stream_early_cleans_up(passthrough_ffmpeg, monkeypatch):
+    processes, timers = [], []
+    monkeypatch.setattr(subprocess, 'Popen', recording(subprocess.Popen, processes))
+    monkeypatch.setattr(threading, 'Timer', recording(threading.Timer, timers))
+    blocks = ffmpeg_decode_stream(itertools.repeat(RAW_BLOCK), 10000, block_samples=256)  # Endlose Eingabe
+    next(blocks)
+    feeder = next(thread for thread in threading.enumerate() if thread.name == 'zeitansage-ffmpeg-feed')
+    blocks.close()
+    feeder.join(timeout=5)
+    assert not feeder.is_alive()
+    assert timers[0].finished.is_set()  # cancel() wurde aufgerufen
+    timers[0].join(timeout=5)
+    assert not timers[0].is_alive()
+    assert processes[0].returncode is not None  # Prozess beendet und eingesammelt
+    assert processes[0].stdout.closed and processes[0].stderr.closed
+
+
+def test_trim_silence_keeps_padding():
+    rate = 10000
+    audio = np.concatenate([np.zeros(5000, np.float32), sine(300, 0.5, rate), np.zeros(5000, np.float32)])
+    trimmed = trim_silence(audio, rate, pad_seconds=0.02)
+    assert 5000 <= len(trimmed) <= 5000 + 2 * 200 + 2 * 100
+    assert len(trim_silence(np.zeros(1000, np.float32), rate)) == 0
+
+
+def test_normalize_loudness_hits_target_and_peak_limit():
+    rate = 10000
+    quiet = sine(300, 0.5, rate, amplitude=0.01)
+    normalized = normalize_loudness(quiet, rate, target_rms_db=-20.0)
+    assert abs(20 * np.log10(np.sqrt(np.mean(np.square(normalized)))) + 20.0) < 0.5
+    limited = normalize_loudness(quiet, rate, target_rms_db=0.0, peak_limit_db=-6.0)
+    assert abs(np.abs(limited).max() - db_to_gain(-6.0)) < 1e-3
+
+
+def test_clip_processor_applies_language_gain():
+    rate = 10000
+    audio = sine(300, 0.5, rate, amplitude=0.1)
+    processor = ClipProcessor(rate, target_rms_db=-20.0, gains_db={'de': -6.0})
+    ratio = np.abs(processor.process(audio, 'de')).max() / np.abs(processor.process(audio, 'en')).max()
+    assert abs(ratio - db_to_gain(-6.0)) < 1e-3
+    assert processor.cache_params('de') != processor.cache_params('en')
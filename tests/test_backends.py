@@ -0,0 +1,164 @@
+import time
+import threading
+
+import numpy as np
+import pytest
+
+from zeitansage_audio import ClipProcessor
+from zeitansage_backends import (CachedClipsBackend, EspeakBackend, FallbackTtsEngine, Pyttsx3Backend,
+                                 create_tts_engine)
+from zeitansage_cache import ClipCache
+from zeitansage_fakes import FakeTtsBackend
+
+RATE = 10000
+
+
+class CountingBackend(FakeTtsBackend):
+    """FakeTtsBackend, das Aufrufe zählt und auf Wunsch fehlschlägt."""
+
+    def __init__(self, name, latency_seconds=0.0, latency_budget=5.0, fail=False, serial=False):
+        super().__init__(RATE, latency_seconds, latency_budget=latency_budget)
+        self.name = name
+        self.fail = fail
+        self.serial = serial
+        self.calls = 0
+
+    def cache_params(self, text, lang_code):
+        return dict(super().cache_params(text, lang_code), backend=self.name)
+
+    def synthesize(self, text, lang_code, deadline=None):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("Backend nicht erreichbar")
+        return super().synthesize(text, lang_code, deadline)
+
+
+def test_falls_back_on_failure():
+    broken, working = CountingBackend('kaputt', fail=True), CountingBackend('gut')
+    engine = FallbackTtsEngine([broken, working])
+    assert len(engine.render("Hallo", 'de')) > 0
+    assert (broken.calls, working.calls) == (1, 1)
+    assert broken.stats()['failures'] == 1
+
+
+def test_returns_none_when_no_backend_delivers():
+    engine = FallbackTtsEngine([CountingBackend('kaputt', fail=True)])
+    assert engine.render("Hallo", 'de') is None
+
+
+def test_slow_backend_exceeds_budget_and_reports_late_result(tmp_path):
+    cache = ClipCache(str(tmp_path))
+    slow, fast = CountingBackend('langsam', 0.4, latency_budget=0.1), CountingBackend('schnell')
+    engine = FallbackTtsEngine([slow, fast], cache)
+    late = threading.Event()
+    engine.on_late_result = lambda text, lang_code, clip: late.set()
+    start = time.monotonic()
+    assert engine.render("Hallo", 'de') is not None
+    assert time.monotonic() - start < 0.3
+    assert slow.stats()['timeouts'] == 1
+    assert late.wait(2)
+    assert engine.render("Hallo", 'de') is not None
+    assert slow.calls == 1  # Das späte Ergebnis liegt jetzt im Cache
+    assert fast.calls == 1
+
+
+def test_cycle_deadline_limits_wait():
+    slow = CountingBackend('langsam', 0.5, latency_budget=5.0)
+    engine = FallbackTtsEngine([slow])
+    engine.begin_cycle(time.time() + 0.1)
+    start = time.monotonic()
+    assert engine.render_for_cycle("Hallo", 'de') is None
+    assert time.monotonic() - start < 0.3
+    engine.begin_cycle(time.time() - 1)
+    assert engine.render_for_cycle("Hallo", 'de') is None
+    assert slow.calls == 1  # Deadline schon vorbei: gar nicht erst angefragt
+
+
+def test_serial_backend_queue_does_not_use_up_budget():
+    serial = CountingBackend('seriell', 0.15, latency_budget=0.25, serial=True)
+    engine = FallbackTtsEngine([serial])
+    results = [None] * 4
+
+    def render(index):
+        results[index] = engine.render(f"Text {index}", 'de')
+    threads = [threading.Thread(target=render, args=(index,)) for index in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert all(result is not None for result in results)  # 4 x 0.15 s nacheinander, jede unter ihrem Budget
+    assert serial.stats()['timeouts'] == 0
+
+
+def test_serial_queue_falls_back_at_cycle_deadline():
+    serial = CountingBackend('seriell', 0.3, serial=True)
+    fallback = CountingBackend('ersatz')
+    fallback.inline = True  # Läuft wie das Backend 'cache' auch nach der Deadline noch
+    engine = FallbackTtsEngine([serial, fallback])
+    deadline = time.time() + 0.2
+    blocker = threading.Thread(target=engine.render, args=("Erster", 'de'))
+    blocker.start()
+    time.sleep(0.02)
+    assert engine.render("Zweiter", 'de', deadline) is not None  # Kam nicht an die Reihe: Ersatz
+    blocker.join(5)
+    assert (serial.calls, fallback.calls) == (1, 1)
+    assert serial.stats()['timeouts'] == 1
+
+
+def test_cached_clips_backend_serves_earlier_clip(tmp_path):
+    cache = ClipCache(str(tmp_path))
+    processor = ClipProcessor(RATE)
+    online = CountingBackend('online')
+    first = FallbackTtsEngine([online], cache, processor=processor)
+    clip = first.render("Hallo", 'de')
+    online.fail = True
+    engine = FallbackTtsEngine([online, CachedClipsBackend(cache, [online], processor)], processor=processor)
+    np.testing.assert_array_equal(engine.render("Hallo", 'de'), clip)
+    assert engine.render("Unbekannt", 'de') is None
+
+
+def test_create_tts_engine():
+    engine = create_tts_engine(['pyttsx3', 'espeak', 'cache'], RATE, clip_cache=None)
+    assert [type(backend) for backend in engine.backends] == [Pyttsx3Backend, EspeakBackend]
+    with pytest.raises(ValueError, match="Unbekanntes TTS-Backend"):
+        create_tts_engine(['festival'], RATE)
+
+
+def test_pyttsx3_backend(fake_pyttsx3):
+    backend = Pyttsx3Backend(RATE, 1.0, {'de': 180})
+    audio = backend.synthesize("Hallo", 'de')
+    assert audio is not None and len(audio) > 0
+    engine = fake_pyttsx3.engines[0]
+    assert ('voice', 'gmw/de') in engine.set_calls
+    assert ('rate', 180) in engine.set_calls
+    backend.synthesize("Nochmal", 'de')
+    assert len(engine.set_calls) == 3  # Unveränderte Eigenschaften werden nicht erneut gesetzt
+
+
+def test_serial_backend_warms_up_on_its_synthesis_thread():
+    threads = []
+
+    class ThreadRecordingBackend(CountingBackend):
+        def warm_up(self):
+            threads.append(threading.current_thread())
+
+        def synthesize(self, text, lang_code, deadline=None):
+            threads.append(threading.current_thread())
+            return super().synthesize(text, lang_code, deadline)
+
+    engine = FallbackTtsEngine([ThreadRecordingBackend('seriell', serial=True)])
+    engine.warm_up()
+    engine.render("Hallo", 'de')
+    assert len(threads) == 2 and threads[0] is threads[1] is not threading.current_thread()
+
+
+def test_cached_clips_backend_skips_keys_render_already_checked(tmp_path):
+    cache = ClipCache(str(tmp_path))
+    processor = ClipProcessor(RATE)
+    online = CountingBackend('online', fail=True)
+    lookups = []
+    original_get = cache.get
+    cache.get = lambda key: lookups.append(key) or original_get(key)
+    engine = FallbackTtsEngine([online, CachedClipsBackend(cache, [online], processor)], cache, processor=processor)
+    assert engine.render("Hallo", 'de') is None
+    assert len(lookups) == 1  # Nur die Suche vor dem Aufruf von 'online', keine zweite im Cache-Backend
@@ -0,0 +1,35 @@
+import threading
+import time
+
+import pytest
+
+from zeitansage_benchmark import wait_until
+
+
+def test_wait_until_returns_when_condition_holds():
+    done = threading.Event()
+    main_thread = threading.Thread(target=done.wait, args=(5,))
+    main_thread.start()
+    threading.Timer(0.05, done.set).start()
+    wait_until(done.is_set, main_thread, time.monotonic() + 5, "fertig")
+    main_thread.join()
+
+
+def test_wait_until_fails_when_main_ends_early():
+    main_thread = threading.Thread(target=lambda: None)  # main() kehrt sofort zurück, z.B. wegen fehlender Pakete
+    main_thread.start()
+    main_thread.join()
+    with pytest.raises(RuntimeError, match="beendet"):
+        wait_until(lambda: False, main_thread, time.monotonic() + 5, "die FIFO angelegt war")
+
+
+def test_wait_until_fails_after_deadline():
+    stop = threading.Event()
+    main_thread = threading.Thread(target=stop.wait, args=(5,))
+    main_thread.start()
+    try:
+        with pytest.raises(RuntimeError, match="Zeitüberschreitung"):
+            wait_until(lambda: False, main_thread, time.monotonic() + 0.05, "die Zeitansage bereit war")
+    finally:
+        stop.set()
+        main_thread.join()
@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+
+from zeitansage_cache import ClipCache
+
+
+def clip(value, samples=100):
+    return np.full(samples, value, dtype=np.float32)
+
+
+def test_put_and_get_round_trip(tmp_path):
+    cache = ClipCache(str(tmp_path))
+    key = ClipCache.key(text="zwölf Uhr", lang='de', sample_rate=10000)
+    assert cache.get(key) is None
+    cache.put(key, clip(0.25))
+    np.testing.assert_array_equal(cache.get(key), clip(0.25))
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_key_depends_on_all_params():
+    assert ClipCache.key(text="eins", lang='de') == ClipCache.key(lang='de', text="eins")
+    assert ClipCache.key(text="eins", lang='de') != ClipCache.key(text="eins", lang='en')
+
+
+def test_empty_clip_round_trip(tmp_path):
+    cache = ClipCache(str(tmp_path))
+    cache.put('leer', np.zeros(0, dtype=np.float32))
+    assert len(cache.get('leer')) == 0
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ClipCache(str(tmp_path), max_bytes=1000)
+    cache.put('a', clip(1.0))
+    cache.put('b', clip(2.0))
+    os.utime(cache._path('a'), (1000, 1000))
+    os.utime(cache._path('b'), (2000, 2000))
+    assert cache.get('a') is not None  # Zugriff macht 'a' zum jüngsten Eintrag
+    cache.put('c', clip(3.0))
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache._total_bytes == 800
+
+
+def test_overwrite_does_not_double_count(tmp_path):
+    cache = ClipCache(str(tmp_path), max_bytes=1000)
+    for _ in range(5):
+        cache.put('a', clip(1.0))
+    assert cache._total_bytes == 400
+    cache.put('a', clip(1.0, samples=50))
+    assert cache._total_bytes == 200
+    cache.put('b', clip(2.0))
+    assert cache.get('a') is not None  # Nichts verdrängt: 600 Bytes liegen unter der Grenze
+
+
+def test_restart_counts_existing_clips(tmp_path):
+    ClipCache(str(tmp_path)).put('a', clip(1.0))
+    cache = ClipCache(str(tmp_path))
+    assert cache._total_bytes == 400
+    np.testing.assert_array_equal(cache.get('a'), clip(1.0))
+
+
+def test_get_or_render_renders_once(tmp_path):
+    cache = ClipCache(str(tmp_path))
+    calls = []
+
+    def render():
+        calls.append(1)
+        return clip(0.5)
+    first = cache.get_or_render(render, text="eins")
+    second = cache.get_or_render(render, text="eins")
+    assert len(calls) == 1
+    np.testing.assert_array_equal(first, second)
+    assert cache.get_or_render(lambda: None, text="zwei") is None
+    assert cache.get(ClipCache.key(text="zwei")) is None
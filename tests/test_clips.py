@@ -0,0 +1,78 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from zeitansage_clips import PhraseClipEngine, concatenate_with_crossfade, directive_values, split_time_format
+
+RATE = 1000
+
+
+class TokenRenderer:
+    """render_func, das für jeden Text einen Clip konstanter Höhe liefert und die Aufrufe zählt."""
+
+    def __init__(self, missing=()):
+        self.calls = []
+        self.missing = set(missing)
+
+    def __call__(self, text, lang_code):
+        self.calls.append((lang_code, text))
+        if text in self.missing:
+            return None
+        return np.full(len(text) * 10, 0.1, dtype=np.float32)
+
+
+def test_split_time_format():
+    assert split_time_format("Es ist %H Uhr %M Minuten und %S Sekunden.") == [
+        "Es ist", '%H', "Uhr", '%M', "Minuten und", '%S', "Sekunden."]
+    assert split_time_format("It is %I %M %S %p.") == ["It is", '%I', '%M', '%S', '%p']
+
+
+def test_directive_values():
+    assert len(directive_values('%H')) == 24 and directive_values('%H')[0] == "00"
+    assert directive_values('%I')[0] == "01" and len(directive_values('%I')) == 12
+    assert len(directive_values('%S')) == 60
+    with pytest.raises(ValueError):
+        directive_values('%Y')
+
+
+def test_crossfade_overlaps_clips():
+    a, b = np.ones(10, dtype=np.float32), np.zeros(10, dtype=np.float32)
+    joined = concatenate_with_crossfade([a, np.zeros(0, np.float32), b], 4)
+    assert len(joined) == 16
+    np.testing.assert_allclose(joined[6:10], [1.0, 0.75, 0.5, 0.25])
+    assert len(concatenate_with_crossfade([], 4)) == 0
+
+
+def test_warm_up_renders_every_token_once():
+    renderer = TokenRenderer()
+    engine = PhraseClipEngine(renderer, RATE, crossfade_seconds=0)
+    engine.add_language('de', "Es ist %H Uhr %M.")
+    assert engine.warm_up() == 0
+    assert len(renderer.calls) == 2 + 24 + 60 - 24  # %M deckt 00 bis 23 schon mit ab
+    when = datetime.datetime(2024, 3, 1, 12, 34, 56)
+    assert engine.tokens_for('de', when) == ["Es ist", "12", "Uhr", "34"]
+    assert len(engine.assemble('de', when)) == (6 + 2 + 3 + 2) * 10
+    assert len(renderer.calls) == 62  # Zusammensetzen rendert nichts neu
+
+
+def test_assemble_fails_on_missing_token():
+    engine = PhraseClipEngine(TokenRenderer(missing={"Uhr"}), RATE)
+    engine.add_language('de', "%H Uhr")
+    assert engine.warm_up() == 1
+    assert engine.assemble('de', datetime.datetime(2024, 1, 1, 7)) is None
+
+
+def test_prepare_and_install_swap_languages():
+    engine = PhraseClipEngine(TokenRenderer(), RATE)
+    engine.add_language('de', "Es ist %H Uhr.")
+    engine.add_language('en', "It is %I %p.")
+    engine.warm_up()
+    prepared = engine.prepare_languages({'de': "Beim Ton ist es %H Uhr."})
+    assert engine.templates['de'][0] == "Es ist"  # Noch nicht übernommen
+    engine.install(prepared)
+    assert engine.templates['de'][0] == "Beim Ton ist es"
+    assert ('de', "Es ist") not in engine.clips
+    assert ('en', "It is") in engine.clips
+    engine.remove_language('en')
+    assert 'en' not in engine.templates and not any(key[0] == 'en' for key in engine.clips)
@@ -0,0 +1,165 @@
+import os
+import json
+import signal
+import time
+import types
+
+import pytest
+
+import zeitansage
+import zeitansage2
+import zeitansage_config
+import zeitansage_log
+from zeitansage_config import (ConfigWatcher, load_config_file, module_settings, read_settings,
+                               settings_languages)
+
+DEFAULTS = {'UPDATE_INTERVAL_SECONDS': 15, 'BEEP_VOLUME': 0.5, 'LANGUAGES': ['de', 'en'], 'TIMECODE_VOLUME': None,
+            'ENABLE_FIFO_OUTPUT': True, 'TIME_FORMAT_DE': "Es ist %H Uhr."}
+
+
+def write_json(path, data):
+    path.write_text(json.dumps(data), encoding='utf-8')
+    return str(path)
+
+
+def logged(capsys):
+    zeitansage_log.flush()
+    return capsys.readouterr().out
+
+
+def test_read_settings_toml(tmp_path):
+    if zeitansage_config.tomllib is None:
+        pytest.skip("TOML benötigt Python 3.11 oder das Paket tomli")
+    path = tmp_path / 'zeitansage.toml'
+    path.write_text('UPDATE_INTERVAL_SECONDS = 30\nTIME_FORMAT_DE = "Beim Ton ist es %H Uhr."\n', encoding='utf-8')
+    assert read_settings(str(path), DEFAULTS) == {'UPDATE_INTERVAL_SECONDS': 30,
+                                                  'TIME_FORMAT_DE': "Beim Ton ist es %H Uhr."}
+
+
+def test_read_settings_checks_names_and_types(tmp_path, capsys):
+    path = write_json(tmp_path / 'zeitansage.json', {
+        'BEEP_VOLUME': 1,            # int statt float ist erlaubt
+        'TIMECODE_VOLUME': 0.05,     # None in den Vorgaben erlaubt jeden Wert
+        'UPDATE_INTERVAL_SECONDS': "30",
+        'ENABLE_FIFO_OUTPUT': 1,     # bool verlangt bool
+        'UNBEKANNT': 1,
+    })
+    assert read_settings(path, DEFAULTS) == {'BEEP_VOLUME': 1, 'TIMECODE_VOLUME': 0.05}
+    output = logged(capsys)
+    assert "'UPDATE_INTERVAL_SECONDS'" in output and "falschen Typ" in output
+    assert "'ENABLE_FIFO_OUTPUT'" in output
+    assert "Unbekannte Einstellung 'UNBEKANNT'" in output
+
+
+def test_read_settings_reports_unreadable_files(tmp_path, capsys):
+    assert read_settings(str(tmp_path / 'fehlt.json'), DEFAULTS) is None
+    broken = tmp_path / 'kaputt.json'
+    broken.write_text('{"BEEP_VOLUME": ', encoding='utf-8')
+    assert read_settings(str(broken), DEFAULTS) is None
+    assert read_settings(write_json(tmp_path / 'liste.json', [1, 2]), DEFAULTS) is None
+    output = logged(capsys)
+    assert "ungültige Syntax" in output
+    assert "Schlüssel-Wert-Paaren" in output
+
+
+def test_toml_without_tomllib(tmp_path, monkeypatch):
+    monkeypatch.setattr(zeitansage_config, 'tomllib', None)
+    path = tmp_path / 'zeitansage.toml'
+    path.write_text('BEEP_VOLUME = 0.3\n', encoding='utf-8')
+    with pytest.raises(ValueError, match="tomli"):
+        load_config_file(str(path))
+    assert load_config_file(write_json(tmp_path / 'zeitansage.json', {'BEEP_VOLUME': 0.3})) == {'BEEP_VOLUME': 0.3}
+
+
+def test_module_settings_and_languages():
+    module = types.SimpleNamespace(SAMPLE_RATE=20000, _PRIVATE=1, lower=2, HELPER=len, DERIVED=[])
+    assert module_settings(module, exclude=('DERIVED',)) == {'SAMPLE_RATE': 20000}
+    assert settings_languages(['SPEAKER_RATE_EN', 'VOLUME_GAIN_DE_DB', 'SAMPLE_RATE'], ['de', 'en', 'fr']) == ['de', 'en']
+
+
+def test_watcher_reports_changes_and_reverts_removed_entries(tmp_path):
+    module = types.SimpleNamespace(**DEFAULTS)
+    path = write_json(tmp_path / 'zeitansage.json', {'UPDATE_INTERVAL_SECONDS': 30})
+    watcher = ConfigWatcher(path, module, dict(DEFAULTS))
+    settings = watcher.load()
+    assert settings == {'UPDATE_INTERVAL_SECONDS': 30}
+    vars(module).update(settings)
+    assert watcher.changes() == {}  # Ohne Neuladen keine Änderungen
+
+    write_json(tmp_path / 'zeitansage.json', {'UPDATE_INTERVAL_SECONDS': 30, 'LANGUAGES': ['de']})
+    watcher.request_reload()
+    assert watcher.changes() == {'LANGUAGES': ['de']}
+    module.LANGUAGES = ['de']
+
+    write_json(tmp_path / 'zeitansage.json', {})
+    watcher.request_reload()
+    assert watcher.changes() == {'UPDATE_INTERVAL_SECONDS': 15, 'LANGUAGES': ['de', 'en']}
+
+
+def test_watcher_reports_each_new_value_once(tmp_path):
+    module = types.SimpleNamespace(**DEFAULTS)
+    path = tmp_path / 'zeitansage.json'
+    watcher = ConfigWatcher(write_json(path, {}), module, dict(DEFAULTS))
+    watcher.load()
+    write_json(path, {'ENABLE_FIFO_OUTPUT': False})
+    watcher.request_reload()
+    assert watcher.changes() == {'ENABLE_FIFO_OUTPUT': False}  # Nicht übernommen, das Modul bleibt unverändert
+    write_json(path, {'ENABLE_FIFO_OUTPUT': False, 'BEEP_VOLUME': 0.25})
+    watcher.request_reload()
+    assert watcher.changes() == {'BEEP_VOLUME': 0.25}
+
+
+def test_watcher_keeps_configuration_on_errors(tmp_path, capsys):
+    module = types.SimpleNamespace(**DEFAULTS)
+    path = tmp_path / 'zeitansage.json'
+    watcher = ConfigWatcher(write_json(path, {}), module, dict(DEFAULTS))
+    watcher.load()
+    path.write_text('{', encoding='utf-8')
+    watcher.request_reload()
+    assert watcher.changes() == {}
+    assert "bisherige Konfiguration bleibt in Kraft" in logged(capsys)
+
+
+def test_watcher_notices_saved_file(tmp_path):
+    module = types.SimpleNamespace(**DEFAULTS)
+    path = tmp_path / 'zeitansage.json'
+    watcher = ConfigWatcher(write_json(path, {}), module, dict(DEFAULTS), poll_seconds=0.02)
+    watcher.load()
+    previous_handler = signal.getsignal(signal.SIGHUP)
+    watcher.start()
+    try:
+        write_json(path, {'BEEP_VOLUME': 0.25, 'UPDATE_INTERVAL_SECONDS': 20})
+        deadline = time.monotonic() + 2
+        changes = {}
+        while not changes and time.monotonic() < deadline:
+            time.sleep(0.02)
+            changes = watcher.changes()
+        assert changes == {'BEEP_VOLUME': 0.25, 'UPDATE_INTERVAL_SECONDS': 20}
+        os.kill(os.getpid(), signal.SIGHUP)  # SIGHUP merkt ebenfalls ein Neuladen vor
+        deadline = time.monotonic() + 2
+        while not watcher._pending.is_set() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert watcher._pending.is_set()
+    finally:
+        watcher.stop()
+        signal.signal(signal.SIGHUP, previous_handler)
+
+
+def test_script_update_settings_derives_announcements(monkeypatch):
+    for name in ('TIME_FORMAT_DE', 'SPEAKER_RATE_EN', 'TIME_ANNOUNCEMENTS'):
+        monkeypatch.setattr(zeitansage, name, getattr(zeitansage, name))
+    zeitansage.update_settings({'TIME_FORMAT_DE': "Beim Ton ist es %H Uhr.", 'SPEAKER_RATE_EN': 120})
+    announcements = {lang_code: (time_format, rate) for lang_code, time_format, rate in zeitansage.TIME_ANNOUNCEMENTS}
+    assert announcements['de'][0] == "Beim Ton ist es %H Uhr."
+    assert announcements['en'][1] == 120
+
+
+def test_script_archive_params_follow_languages(monkeypatch):
+    for name in ('LANGUAGES', 'TIME_FORMAT_FR'):
+        monkeypatch.setattr(zeitansage2, name, getattr(zeitansage2, name))
+    before = zeitansage2.archive_params()
+    monkeypatch.setattr(zeitansage2, 'LANGUAGES', ['de', 'en', 'fr'])
+    assert set(zeitansage2.archive_params()['formats']) == {'de', 'en', 'fr'}
+    with_fr = zeitansage2.archive_params()
+    monkeypatch.setattr(zeitansage2, 'TIME_FORMAT_FR', "Il est %H heures.")
+    assert zeitansage2.archive_params() != with_fr != before
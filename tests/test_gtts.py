@@ -0,0 +1,110 @@
+import time
+import threading
+
+import pytest
+
+pytest.importorskip('requests')
+pytest.importorskip('gtts')
+
+import zeitansage_gtts  # noqa: E402
+from zeitansage_audio import decode_audio_bytes  # noqa: E402
+from zeitansage_backends import GttsBackend  # noqa: E402
+from zeitansage_fakes import fake_wav_bytes  # noqa: E402
+from zeitansage_gtts import GttsClient, TokenBucket, parse_gtts_response  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def quick_retries(monkeypatch):
+    monkeypatch.setattr(zeitansage_gtts, 'GTTS_RETRY_BASE_SECONDS', 0.01)
+
+
+def fetch(client, text, deadline=None):
+    return b''.join(client.stream(text, 'de', deadline=deadline))
+
+
+def test_token_bucket_allows_burst_then_throttles():
+    bucket = TokenBucket(rate=20.0, burst=3)
+    start = time.monotonic()
+    for _ in range(3):
+        assert bucket.acquire()
+    assert time.monotonic() - start < 0.03
+    assert bucket.acquire()
+    assert time.monotonic() - start >= 0.04  # Vierter Token erst nach 1/20 Sekunde
+
+
+def test_token_bucket_respects_deadline():
+    bucket = TokenBucket(rate=1.0, burst=1)
+    assert bucket.acquire()
+    start = time.monotonic()
+    assert not bucket.acquire(deadline=time.time() + 0.1)  # Nächster Token erst in einer Sekunde
+    assert time.monotonic() - start < 0.05
+    assert bucket._tokens > -0.5  # Nichts reserviert
+
+
+def test_parse_gtts_response():
+    with pytest.raises(ValueError):
+        parse_gtts_response(')]}\'\n\n[["wrb.fr","anders"]]')
+
+
+def test_client_fetches_audio_over_one_connection(fake_gtts_server):
+    server = fake_gtts_server()
+    client = GttsClient(server.url, requests_per_second=100, burst=10)
+    for text in ("Es ist zwölf Uhr.", "Es ist dreizehn Uhr."):
+        assert fetch(client, text) == fake_wav_bytes(text)
+    assert server.stats['requests'] == 2
+    assert server.stats['connections'] == 1  # Keep-Alive
+
+
+def test_client_retries_server_errors(fake_gtts_server):
+    server = fake_gtts_server(fail_first=2)
+    client = GttsClient(server.url, requests_per_second=100, burst=10, max_retries=2)
+    assert fetch(client, "Hallo") == fake_wav_bytes("Hallo")
+    assert (server.stats['requests'], server.stats['errors']) == (3, 2)
+
+
+def test_client_gives_up_after_max_retries(fake_gtts_server):
+    import requests
+    server = fake_gtts_server(error_every=1)
+    client = GttsClient(server.url, requests_per_second=100, burst=10, max_retries=2)
+    with pytest.raises(requests.exceptions.HTTPError, match="503"):
+        fetch(client, "Hallo")
+    assert server.stats['requests'] == 3
+
+
+def test_client_honours_retry_after(fake_gtts_server):
+    server = fake_gtts_server(fail_first=1, retry_after=0.3)
+    client = GttsClient(server.url, requests_per_second=100, burst=10)
+    start = time.monotonic()
+    assert fetch(client, "Hallo") == fake_wav_bytes("Hallo")
+    assert time.monotonic() - start >= 0.3
+
+
+def test_client_does_not_retry_past_deadline(fake_gtts_server):
+    import requests
+    server = fake_gtts_server(error_every=1, retry_after=5)
+    client = GttsClient(server.url, requests_per_second=100, burst=10, max_retries=5)
+    start = time.monotonic()
+    with pytest.raises(requests.exceptions.HTTPError):
+        fetch(client, "Hallo", deadline=time.time() + 1.0)
+    assert time.monotonic() - start < 0.5  # Retry-After liegt hinter der Deadline: sofort aufgeben
+    assert server.stats['requests'] == 1
+
+
+def test_identical_requests_are_coalesced(fake_gtts_server):
+    server = fake_gtts_server(latency_seconds=0.2)
+    client = GttsClient(server.url, requests_per_second=100, burst=10)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(fetch(client, "Gleicher Text"))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert results == [fake_wav_bytes("Gleicher Text")] * 3
+    assert server.stats['requests'] == 1
+
+
+def test_backend_decodes_through_ffmpeg(fake_gtts_server, fake_ffmpeg):
+    server = fake_gtts_server()
+    backend = GttsBackend(10000, client=GttsClient(server.url, requests_per_second=100, burst=10))
+    audio = backend.synthesize("Hallo", 'de')
+    assert len(audio) == len(decode_audio_bytes(fake_wav_bytes("Hallo"), 10000))
@@ -0,0 +1,61 @@
+import urllib.error
+import urllib.request
+
+import pytest
+
+import zeitansage_log
+from zeitansage_metrics import MetricsRegistry, MetricsServer
+
+
+def test_counter_and_gauge_exposition():
+    registry = MetricsRegistry()
+    counter = registry.counter('test_requests_total', "Anfragen", ('backend',))
+    counter.labels(backend='gtts').inc()
+    counter.labels(backend='gtts').inc(2)
+    counter.labels(backend='say "hi"\n').inc()
+    registry.gauge('test_ready', "Bereit").set(1)
+    assert registry.counter('test_requests_total', "anders") is counter  # Gleichnamige Metrik wird wiederverwendet
+    lines = registry.exposition().splitlines()
+    assert lines[:2] == ["# HELP test_requests_total Anfragen", "# TYPE test_requests_total counter"]
+    assert 'test_requests_total{backend="gtts"} 3' in lines
+    assert 'test_requests_total{backend="say \\"hi\\"\\n"} 1' in lines
+    assert 'test_ready 1' in lines
+
+
+def test_unlabelled_metrics_are_visible_from_start():
+    registry = MetricsRegistry()
+    registry.counter('test_dropped_total', "Verworfen")
+    assert 'test_dropped_total 0' in registry.exposition()
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('test_seconds', "Dauer", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value)
+    with histogram.time():
+        pass
+    lines = registry.exposition().splitlines()
+    assert 'test_seconds_bucket{le="0.1"} 2' in lines
+    assert 'test_seconds_bucket{le="1.0"} 4' in lines
+    assert 'test_seconds_bucket{le="+Inf"} 5' in lines
+    assert 'test_seconds_count 5' in lines
+    assert any(line.startswith('test_seconds_sum 6.05') for line in lines)
+
+
+def test_metrics_server(capsys):
+    registry = MetricsRegistry()
+    registry.gauge('test_up', "Läuft").set(1)
+    server = MetricsServer('127.0.0.1', 0, registry)
+    server.start()
+    try:
+        url = f"http://127.0.0.1:{server._server.server_port}"
+        with urllib.request.urlopen(url + "/metrics", timeout=2) as response:
+            assert response.headers['Content-Type'].startswith("text/plain; version=0.0.4")
+            assert 'test_up 1' in response.read().decode('utf-8')
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(url + "/andere", timeout=2)
+    finally:
+        server.stop()
+    zeitansage_log.flush()
+    assert "INFO: Metriken unter" in capsys.readouterr().out
@@ -0,0 +1,111 @@
+import time
+import socket
+
+import pytest
+
+from zeitansage_network import UDP_PAYLOAD_BYTES, StreamBroadcaster, _StreamClient, http_chunk
+
+
+def free_port(kind=socket.SOCK_STREAM):
+    with socket.socket(socket.AF_INET, kind) as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Zeitüberschreitung"
+        time.sleep(0.01)
+
+
+def receive(sock, num_bytes):
+    data = b''
+    while len(data) < num_bytes:
+        block = sock.recv(num_bytes - len(data))
+        assert block
+        data += block
+    return data
+
+
+@pytest.fixture
+def connect():
+    sockets = []
+
+    def open_connection(port):
+        sock = socket.create_connection(('127.0.0.1', port), timeout=2)
+        sockets.append(sock)
+        return sock
+    yield open_connection
+    for sock in sockets:
+        sock.close()
+
+
+def test_http_chunk():
+    assert http_chunk(b'abc') == b'3\r\nabc\r\n'
+    assert http_chunk(bytes(26)) == b'1a\r\n' + bytes(26) + b'\r\n'
+    assert http_chunk(b'') == b''  # Wäre sonst das Ende der Antwort
+
+
+def test_client_buffer_drops_oldest_blocks():
+    client = _StreamClient('test', max_bytes=10)
+    for block in (b'aaaa', b'bbbb', b'cccc', b'dddd'):
+        client.offer(block)
+    assert list(client.chunks) == [b'cccc', b'dddd']
+    assert (client.queued_bytes, client.skipped_bytes) == (8, 8)
+
+
+def test_tcp_clients_receive_stream(connect):
+    port = free_port()
+    broadcaster = StreamBroadcaster(10000, host='127.0.0.1', tcp_port=port)
+    broadcaster.start()
+    first, second = connect(port), connect(port)
+    wait_for(lambda: len(broadcaster.clients) == 2)
+    broadcaster.publish(b'\x01\x02\x03\x04')
+    broadcaster.publish(b'')
+    broadcaster.publish(b'\x05\x06\x07\x08')
+    assert receive(first, 8) == receive(second, 8) == bytes(range(1, 9))
+    first.close()
+
+    def first_disconnected():
+        broadcaster.publish(bytes(4))  # Eine Trennung fällt erst beim Schreiben auf
+        return len(broadcaster.clients) == 1
+    wait_for(first_disconnected)
+    assert receive(second, 4) == bytes(4)
+
+
+def test_http_stream_is_chunked_without_terminator(connect):
+    port = free_port()
+    broadcaster = StreamBroadcaster(10000, host='127.0.0.1', http_port=port, sample_format='int16')
+    broadcaster.start()
+    sock = connect(port)
+    sock.sendall(b'GET / HTTP/1.1\r\nHost: localhost\r\n\r\n')
+    header = b''
+    while not header.endswith(b'\r\n\r\n'):
+        header += sock.recv(1)
+    assert header.startswith(b'HTTP/1.1 200 OK\r\n')
+    assert b'X-Sample-Rate: 10000\r\n' in header
+    assert b'X-Sample-Format: s16le\r\n' in header
+    assert b'Transfer-Encoding: chunked\r\n' in header
+    wait_for(lambda: len(broadcaster.clients) == 1)
+    broadcaster.publish(b'')  # Darf den Stream nicht beenden
+    broadcaster.publish(b'abcd')
+    assert receive(sock, 9) == b'4\r\nabcd\r\n'
+
+
+def test_udp_subscribers_receive_datagrams():
+    port = free_port(socket.SOCK_DGRAM)
+    broadcaster = StreamBroadcaster(10000, host='127.0.0.1', udp_port=port)
+    broadcaster.start()
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as subscriber:
+        subscriber.settimeout(2)
+        subscriber.bind(('127.0.0.1', 0))
+        subscriber.sendto(b'hallo', ('127.0.0.1', port))
+        wait_for(lambda: broadcaster.udp_subscribers)
+        data = bytes(range(256)) * 12
+        broadcaster.publish(data)
+        datagrams = []
+        while sum(map(len, datagrams)) < len(data):
+            datagrams.append(subscriber.recv(65536))
+    assert b''.join(datagrams) == data
+    assert max(map(len, datagrams)) == UDP_PAYLOAD_BYTES
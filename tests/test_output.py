@@ -0,0 +1,106 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from zeitansage_output import OutputFormat, PcmStreamWriter
+
+
+@pytest.fixture
+def pipe():
+    read_fd, write_fd = os.pipe()
+    yield read_fd, write_fd
+    os.close(read_fd)
+    os.close(write_fd)
+
+
+def test_int16_conversion_rounds_and_clips():
+    output = OutputFormat(10000, sample_format='int16')
+    converted = output.convert(np.array([1.5, -1.5, 0.5, 0.0], dtype=np.float32))
+    assert converted.dtype == np.dtype('<i2')
+    assert converted.tolist() == [32767, -32768, 16384, 0]
+    assert not output.passthrough
+    assert OutputFormat(10000).passthrough
+
+
+def test_output_format_resamples_and_compares():
+    output = OutputFormat(20000, 10000, 'int8')
+    assert output.describe() == "int8, 10000 Hz"
+    assert output.to_source_samples(100) == 200
+    assert output.same_as(OutputFormat(16000, 10000, 'int8'))
+    assert not output.same_as(OutputFormat(20000, 10000, 'int16'))
+    with pytest.raises(ValueError, match="Sample-Format"):
+        OutputFormat(10000, sample_format='int24')
+
+
+def test_writer_writes_float32_to_fd(pipe):
+    read_fd, write_fd = pipe
+    writer = PcmStreamWriter(10000)
+    writer.attach(write_fd)
+    samples = np.linspace(-1, 1, 500, dtype=np.float32)
+    writer.write_segments([samples[:200], np.zeros(0, np.float32), samples[200:]])
+    writer.write_silence(100)
+    data = os.read(read_fd, 65536)
+    assert data == samples.tobytes() + bytes(400)
+    assert writer.samples_written == 600
+    assert writer.bytes_written == 2400
+
+
+def test_writer_converts_fifo_format(pipe):
+    read_fd, write_fd = pipe
+    writer = PcmStreamWriter(10000, output=OutputFormat(10000, sample_format='int16'))
+    writer.attach(write_fd)
+    writer.write_samples(np.full(100, 0.5, dtype=np.float32))
+    assert os.read(read_fd, 65536) == np.full(100, 16384, dtype='<i2').tobytes()
+    assert writer.samples_written == 100
+
+
+def test_taps_never_receive_empty_blocks():
+    writer = PcmStreamWriter(20000)
+    writer.attach(None, pace=False)
+    shared, resampled = [], []
+    writer.add_tap(shared.append)
+    writer.add_tap(resampled.append, OutputFormat(20000, 8000, 'int16'))
+    for _ in range(50):
+        writer.write_samples(np.ones(1, dtype=np.float32))  # Einzelne Samples liefern beim Resampling oft nichts
+    writer.write_segments([])
+    assert len(shared) == 50
+    assert resampled and all(resampled)
+    assert sum(len(block) for block in resampled) < 50 * 2
+
+
+def test_tap_in_same_format_shares_fifo_bytes(pipe):
+    read_fd, write_fd = pipe
+    writer = PcmStreamWriter(10000, output=OutputFormat(10000, sample_format='int16'))
+    writer.attach(write_fd)
+    received = []
+    writer.add_tap(received.append, OutputFormat(10000, sample_format='int16'))
+    writer.write_samples(np.full(10, 0.25, dtype=np.float32))
+    assert received == [os.read(read_fd, 65536)]
+
+
+def test_write_silence_until_event():
+    writer = PcmStreamWriter(10000)
+    writer.attach(None, pace=False)
+    ready = threading.Event()
+    ready.set()
+    writer.write_silence_until(ready)
+    assert writer.samples_written == 0
+    ready.clear()
+    blocks = []
+    writer.add_tap(blocks.append)
+    threading.Timer(0.05, ready.set).start()
+    writer.write_silence_until(ready)
+    assert writer.samples_written > 0
+    assert writer.samples_written % 1000 == 0  # Ganze Blöcke von WRITE_BATCH_SECONDS
+    assert not any(any(block) for block in blocks[:3])
+
+
+def test_paced_writer_follows_clock():
+    writer = PcmStreamWriter(10000)
+    writer.attach(None)
+    assert writer.paced
+    writer.write_silence(10000)  # Eine Sekunde: höchstens PACED_MAX_LEAD_SECONDS Vorlauf
+    assert 0.0 < writer.lead_seconds() <= 0.25
+    assert writer.queued_samples() > 0
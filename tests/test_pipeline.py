@@ -0,0 +1,81 @@
+import time
+import datetime
+import threading
+
+import numpy as np
+
+from zeitansage_pipeline import LookAheadRenderer, Pause, create_render_pool, render_in_parallel
+
+
+def segment(value):
+    return np.full(3, value, dtype=np.float32)
+
+
+def values(results):
+    return [float(result[0]) for result in results]
+
+
+def failing():
+    raise RuntimeError("TTS ausgefallen")
+
+
+def test_results_keep_order_and_run_in_parallel():
+    pool = create_render_pool(4)
+    delays = [0.2, 0.1, 0.15]
+    parts = [lambda value=value, delay=delay: time.sleep(delay) or segment(value) for value, delay in zip((1, 2, 3), delays)]
+    start = time.monotonic()
+    assert values(render_in_parallel(pool, parts)) == [1, 2, 3]
+    assert time.monotonic() - start < 0.35  # Durch das langsamste Segment begrenzt, nicht durch die Summe
+    pool.shutdown()
+
+
+def test_failed_segment_drops_preceding_pause():
+    pool = create_render_pool(2)
+    parts = [lambda: segment(1), Pause(segment(0)), failing, Pause(segment(0)), lambda: segment(3)]
+    assert values(render_in_parallel(pool, parts)) == [1, 0, 3]
+    pool.shutdown()
+
+
+def test_failed_first_segment_drops_following_pause():
+    pool = create_render_pool(2)
+    parts = [lambda: None, Pause(segment(0)), lambda: segment(2), Pause(segment(0)), lambda: segment(3)]
+    assert values(render_in_parallel(pool, parts)) == [2, 0, 3]
+    pool.shutdown()
+
+
+def test_all_segments_failing_leaves_nothing():
+    pool = create_render_pool(2)
+    assert render_in_parallel(pool, [failing, Pause(segment(0)), lambda: None]) == []
+    pool.shutdown()
+
+
+def test_plain_arrays_pass_through():
+    pool = create_render_pool(1)
+    assert values(render_in_parallel(pool, [segment(5), lambda: segment(6)])) == [5, 6]
+    pool.shutdown()
+
+
+def test_look_ahead_renders_in_background():
+    started = threading.Event()
+
+    def render(target_time):
+        started.set()
+        return [segment(target_time.second)]
+    renderer = LookAheadRenderer(render)
+    target = datetime.datetime.now() + datetime.timedelta(seconds=5)
+    renderer.schedule(target)
+    renderer.schedule(target)  # Läuft bereits: kein zweites Rendering
+    assert started.wait(2)
+    collected_time, segments = renderer.collect()
+    assert collected_time == target
+    assert values(segments) == [target.second]
+    assert renderer.collect() == (None, [])
+    renderer.shutdown()
+
+
+def test_look_ahead_failure_yields_no_segments():
+    renderer = LookAheadRenderer(lambda target_time: failing())
+    target = datetime.datetime.now()
+    renderer.schedule(target)
+    assert renderer.collect() == (target, [])
+    renderer.shutdown()
@@ -0,0 +1,127 @@
+import os
+import time
+import threading
+
+import numpy as np
+
+from zeitansage_output import OutputFormat
+from zeitansage_ringbuffer import ByteRingBuffer, FifoSink
+
+
+def frames(start, count):
+    """count float32-Samples mit fortlaufenden Werten ab start als Bytes."""
+    return np.arange(start, start + count, dtype='<f4').tobytes()
+
+
+def test_read_returns_written_bytes_across_wrap():
+    ring = ByteRingBuffer(40)
+    position = 0
+    for start in range(0, 60, 6):
+        ring.write([frames(start, 6)])
+        data, position, skipped = ring.read(position, 1000)
+        assert skipped == 0
+        assert data == frames(start, 6)
+        position += len(data)
+    assert ring.available(position) == 0
+
+
+def test_read_limits_to_max_bytes():
+    ring = ByteRingBuffer(64)
+    ring.write([frames(0, 8)])
+    data, position, _ = ring.read(0, 12)
+    assert data == frames(0, 3)
+    data, _, _ = ring.read(position + len(data), 1000)
+    assert data == frames(3, 5)
+
+
+def test_capacity_is_whole_frames():
+    assert ByteRingBuffer(43, frame_bytes=4).capacity == 40
+    assert ByteRingBuffer(1, frame_bytes=4).capacity == 4
+
+
+def test_overrun_skips_to_oldest_frame():
+    ring = ByteRingBuffer(40)
+    ring.write([frames(0, 25)])
+    data, position, skipped = ring.read(0, 1000)
+    assert skipped == 60
+    assert position == 60
+    assert data == frames(15, 10)
+
+
+def test_overrun_keeps_frame_alignment():
+    ring = ByteRingBuffer(40)
+    ring.write([frames(0, 10), frames(10, 3)])
+    data, position, skipped = ring.read(2, 1000)  # Leseposition mitten im Sample
+    assert skipped == 12  # 10 Bytes Rückstand, aufgerundet auf ganze Samples
+    assert position == 14
+    assert data == frames(0, 13)[14:]
+
+
+def test_oversized_write_keeps_the_end():
+    ring = ByteRingBuffer(16)
+    ring.write([frames(0, 10)])
+    assert ring.write_position == 40
+    data, position, skipped = ring.read(24, 1000)
+    assert (data, position, skipped) == (frames(6, 4), 24, 0)
+
+
+def test_read_skips_region_reserved_by_running_write():
+    ring = ByteRingBuffer(40)
+    ring.write([frames(0, 10)])
+    # Ein Schreibvorgang hat 8 Bytes angekündigt, aber noch nicht veröffentlicht
+    ring.reserved_position = ring.write_position + 8
+    data, position, skipped = ring.read(0, 1000)
+    assert skipped == 8
+    assert data == frames(2, 8)
+
+
+def test_concurrent_reader_never_sees_torn_data():
+    ring = ByteRingBuffer(4096)
+    total = 200000
+    seen = []
+
+    def consume():
+        position = 0
+        while position < total * 4:
+            data, position, _ = ring.read(position, 1024)
+            if data:
+                values = np.frombuffer(data, dtype='<f4')
+                seen.append(bool(np.all(np.diff(values) == 1) and values[0] == position // 4))
+                position += len(data)
+
+    reader = threading.Thread(target=consume)
+    reader.start()
+    for start in range(0, total, 100):
+        ring.write([frames(start, 100)])
+    reader.join(10)
+    assert not reader.is_alive()
+    assert seen and all(seen)
+
+
+def test_fifo_sink_delivers_stream_to_reader(tmp_path):
+    path = str(tmp_path / 'fifo')
+    os.mkfifo(path)
+    reader_fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)  # Reader zuerst, sonst scheitert das Öffnen des Sinks
+    os.set_blocking(reader_fd, True)
+    sink = FifoSink(path, OutputFormat(1000), buffer_seconds=0.5, backpressure=True)
+    sink.start()
+    expected = b''.join(frames(start, 250) for start in range(0, 2000, 250))
+
+    def produce():
+        for start in range(0, 2000, 250):
+            sink.write_views([frames(start, 250)])
+    writer = threading.Thread(target=produce, daemon=True)
+    writer.start()
+
+    received = b''
+    while len(received) < len(expected):
+        block = os.read(reader_fd, 65536)
+        assert block
+        received += block
+    writer.join(5)
+    assert received == expected
+    os.close(reader_fd)
+    deadline = time.monotonic() + 2
+    while sink.position is not None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert sink.position is None  # Reader weg: der Sink wartet auf den nächsten
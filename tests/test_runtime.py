@@ -0,0 +1,90 @@
+import types
+
+import numpy as np
+
+import zeitansage_log
+from zeitansage_runtime import AnnouncementState, create_clip_engine
+
+RATE = 1000
+
+
+class FakeWatcher:
+    """Liefert die vorgemerkten Änderungen einmal, wie ConfigWatcher.changes()."""
+
+    def __init__(self):
+        self.pending = {}
+
+    def changes(self):
+        changes, self.pending = self.pending, {}
+        return changes
+
+
+def make_script():
+    script = types.SimpleNamespace(
+        SAMPLE_RATE=RATE, RENDER_WORKERS=1, TTS_DEADLINE_MARGIN_SECONDS=0.5, ANNOUNCEMENT_ARCHIVE_PATH=None,
+        UPDATE_INTERVAL_SECONDS=15, SPEECH_TARGET_RMS_DB=-20.0, LANGUAGES=['de', 'en'],
+        TIME_FORMAT_DE="Es ist %H Uhr.", TIME_FORMAT_EN="It is %H o'clock.",
+        RELOADABLE_SETTINGS=('UPDATE_INTERVAL_SECONDS', 'SPEECH_TARGET_RMS_DB', 'LANGUAGES', 'TIME_FORMAT_DE',
+                             'TIME_FORMAT_EN'))
+    script.active_languages = lambda: list(script.LANGUAGES)
+    script.time_formats = lambda: {'de': script.TIME_FORMAT_DE, 'en': script.TIME_FORMAT_EN}
+    script.archive_params = lambda: {'formats': script.time_formats()}
+    script.update_settings = lambda settings: vars(script).update(settings)
+    return script
+
+
+def make_tts(rendered):
+    def render(text, lang_code):
+        rendered.append((lang_code, text))
+        return np.full(10, 0.1, dtype=np.float32)
+    return types.SimpleNamespace(render=render, render_for_cycle=render, processor=types.SimpleNamespace(target_rms_db=None),
+                                 report=lambda: None)
+
+
+def make_state(on_change=None):
+    script, rendered, watcher = make_script(), [], FakeWatcher()
+    tts = make_tts(rendered)
+    state = AnnouncementState(script, watcher, create_clip_engine(script, tts), tts, None, on_change=on_change)
+    state.warm_up()
+    rendered.clear()
+    return state, watcher, rendered
+
+
+def finish_reload(state):
+    """Wartet auf die Hintergrund-Renderings und übernimmt sie an der nächsten Zyklusgrenze."""
+    for future in list(state._pending):
+        future.result()
+    state.apply_changes()
+
+
+def test_clip_engine_registers_active_languages():
+    script = make_script()
+    script.LANGUAGES = ['en']
+    assert list(create_clip_engine(script, make_tts([])).templates) == ['en']
+
+
+def test_changed_format_rerenders_only_its_language(capsys):
+    calls = []
+    state, watcher, rendered = make_state(on_change=lambda changes, previous: calls.append((changes, previous)))
+    scheduler = types.SimpleNamespace(interval_seconds=15)
+    state.schedulers.append(scheduler)
+    watcher.pending = {'TIME_FORMAT_EN': "It is %H.", 'UPDATE_INTERVAL_SECONDS': 30, 'BEEP_VOLUME': 0.2}
+    state.apply_changes()
+    finish_reload(state)
+    assert scheduler.interval_seconds == 30
+    assert calls == [({'TIME_FORMAT_EN': "It is %H.", 'UPDATE_INTERVAL_SECONDS': 30},
+                      {'TIME_FORMAT_EN': "It is %H o'clock.", 'UPDATE_INTERVAL_SECONDS': 15})]
+    assert rendered and {lang_code for lang_code, _ in rendered} == {'en'}
+    assert state.clip_engine.templates['en'] == ['It is', '%H']
+    zeitansage_log.flush()
+    assert "'BEEP_VOLUME' wird erst nach einem Neustart wirksam" in capsys.readouterr().out
+
+
+def test_level_change_rerenders_all_and_removed_language_is_dropped():
+    state, watcher, rendered = make_state()
+    watcher.pending = {'SPEECH_TARGET_RMS_DB': -18.0, 'LANGUAGES': ['de']}
+    state.apply_changes()
+    assert state.tts.processor.target_rms_db == -18.0
+    assert list(state.clip_engine.templates) == ['de']
+    finish_reload(state)
+    assert {lang_code for lang_code, _ in rendered} == {'de'}
@@ -0,0 +1,58 @@
+from zeitansage_scheduler import SampleScheduler
+
+RATE = 1000
+
+
+class FakeWriter:
+    def __init__(self, queued=0):
+        self.samples_written = 0
+        self.queued = queued
+
+    def queued_samples(self):
+        return self.queued
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_announcements_on_interval_grid():
+    clock = FakeClock(999.5)
+    scheduler = SampleScheduler(RATE, interval_seconds=15, countdown_seconds=5, clock=clock)
+    writer = FakeWriter()
+    assert scheduler.next_announcement_time(writer) == 1005
+    clock.now = 1000.5  # Countdown für 1005 passt nicht mehr vollständig davor
+    scheduler._last_announcement = None
+    assert scheduler.next_announcement_time(writer) == 1020
+
+
+def test_same_time_is_never_announced_twice():
+    clock = FakeClock(990.0)
+    scheduler = SampleScheduler(RATE, 15, 5, clock=clock)
+    writer = FakeWriter()
+    assert scheduler.next_announcement_time(writer) == 1005
+    assert scheduler.next_announcement_time(writer) == 1020  # Reader schneller als Echtzeit
+
+
+def test_filler_accounts_for_queued_samples():
+    clock = FakeClock(1000.0)
+    scheduler = SampleScheduler(RATE, 15, 5, clock=clock)
+    writer = FakeWriter(queued=500)  # 0,5 s liegen noch in der FIFO
+    assert scheduler.filler_samples(writer, 1010) == 4500
+    assert scheduler.filler_samples(writer, 1004) == 0
+
+
+def test_measure_reports_alignment_and_drift():
+    clock = FakeClock(1000.0)
+    scheduler = SampleScheduler(RATE, 15, 5, clock=clock)
+    writer = FakeWriter()
+    scheduler.attach(writer)
+    writer.samples_written = 5000
+    clock.now = 1005.02  # Uhr läuft 20 ms weiter als die geschriebenen Samples
+    error = scheduler.measure(writer, planned_time=1005.0)
+    assert abs(error - 0.02) < 1e-9
+    assert abs(scheduler.drift_seconds - 0.02) < 1e-9
@@ -0,0 +1,79 @@
+import calendar
+
+import numpy as np
+
+from zeitansage_signals import CountdownBlock, generate_tone, irig_b_frames, irig_b_signal
+
+# 2024-03-01 12:34:56.7 UTC: Tag 61 des Schaltjahres
+TIMESTAMP = calendar.timegm((2024, 3, 1, 12, 34, 56)) + 0.7
+
+
+def bcd(frame, positions, weights):
+    return sum(weight for position, weight in zip(positions, weights) if frame[position] == 1)
+
+
+def test_irig_b_frame_fields():
+    frame = irig_b_frames([TIMESTAMP])[0]
+    assert bcd(frame, (1, 2, 3, 4, 6, 7, 8), (1, 2, 4, 8, 10, 20, 40)) == 56
+    assert bcd(frame, (10, 11, 12, 13, 15, 16, 17), (1, 2, 4, 8, 10, 20, 40)) == 34
+    assert bcd(frame, (20, 21, 22, 23, 25, 26), (1, 2, 4, 8, 10, 20)) == 12
+    assert bcd(frame, (30, 31, 32, 33, 35, 36, 37, 38, 40, 41), (1, 2, 4, 8, 10, 20, 40, 80, 100, 200)) == 61
+    assert bcd(frame, (45, 46, 47, 48), (1, 2, 4, 8)) == 7
+    assert bcd(frame, (50, 51, 52, 53, 55, 56, 57, 58), (1, 2, 4, 8, 10, 20, 40, 80)) == 24
+    sbs_positions = tuple(range(80, 89)) + tuple(range(90, 98))
+    assert bcd(frame, sbs_positions, [2 ** bit for bit in range(17)]) == 12 * 3600 + 34 * 60 + 56
+
+
+def test_irig_b_markers():
+    frame = irig_b_frames([TIMESTAMP])[0]
+    markers = [0, 9, 19, 29, 39, 49, 59, 69, 79, 89, 99]
+    assert [position for position in range(100) if frame[position] == 2] == markers
+
+
+def test_irig_b_frames_vectorized():
+    frames = irig_b_frames(TIMESTAMP + np.arange(5))
+    for offset, frame in enumerate(frames):
+        assert bcd(frame, (1, 2, 3, 4, 6, 7, 8), (1, 2, 4, 8, 10, 20, 40)) == (56 + offset) % 60
+    assert bcd(frames[4], (10, 11, 12, 13, 15, 16, 17), (1, 2, 4, 8, 10, 20, 40)) == 35  # 12:35:00
+
+
+def test_irig_b_signal_pulse_widths():
+    rate = 48000
+    start = float(int(TIMESTAMP))
+    signal = irig_b_signal(start, rate, rate, volume=1.0)
+    envelope = np.abs(signal).reshape(-1, rate // 1000).max(axis=1)  # Spitze je 1-ms-Trägerperiode
+    high = (envelope > 0.65).reshape(100, 10).sum(axis=1)  # Pulsdauer je Bit in ms
+    expected = np.array([2, 5, 8])[irig_b_frames([start])[0]]
+    np.testing.assert_array_equal(high, expected)
+    assert abs(envelope.min() - 0.3) < 0.01  # Pause: 10:3
+
+
+def test_generate_tone_ramps():
+    tone = generate_tone(1000, 0.1, 10000, 0.5)
+    assert len(tone) == 1000
+    assert tone.dtype == np.float32
+    assert abs(tone[0]) < 1e-6 and abs(tone[-1]) < 0.01
+    assert abs(np.abs(tone).max() - 0.5) < 0.03
+
+
+def test_countdown_block_layout():
+    countdown = CountdownBlock(10000, beats=3, beat_interval=1.0, frequency=1000, duration=0.1, volume=0.5,
+                               final_frequency=1500, final_duration=0.5)
+    block = countdown.render(TIMESTAMP)
+    assert len(block) == 30000
+    assert countdown.beat_offsets() == [0, 10000, 20000]
+    for offset in countdown.beat_offsets()[:-1]:
+        assert np.abs(block[offset:offset + 1000]).max() > 0.4
+        assert not block[offset + 1000:offset + 10000].any()
+    assert np.abs(block[20000:25000]).max() > 0.4  # Längerer Schlusston
+    assert countdown.render(TIMESTAMP + 10) is block  # Ohne Zeitcode immer derselbe Block
+    assert not block.flags.writeable
+
+
+def test_countdown_with_timecode():
+    countdown = CountdownBlock(10000, beats=2, beat_interval=1.0, frequency=1000, duration=0.1, volume=0.5,
+                               timecode_volume=0.1)
+    block = countdown.render(TIMESTAMP)
+    expected = countdown.block + irig_b_signal(TIMESTAMP - 2.0, 20000, 10000, 0.1)
+    np.testing.assert_allclose(block, expected)
+    assert np.abs(block[5000:10000]).max() > 0  # Auch zwischen den Tönen liegt der Zeitcode
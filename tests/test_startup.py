@@ -0,0 +1,43 @@
+import time
+
+import zeitansage_log
+from zeitansage_log import log
+from zeitansage_startup import READY, StartupPhases
+
+
+def test_log_is_written_in_background(capsys):
+    log("INFO: erste Meldung")
+    log("INFO: zweite Meldung")
+    zeitansage_log.flush()
+    assert capsys.readouterr().out == "INFO: erste Meldung\nINFO: zweite Meldung\n"
+
+
+def test_muted_log_drops_messages(capsys):
+    zeitansage_log.mute()
+    try:
+        log("INFO: unterdrückt")
+    finally:
+        zeitansage_log.mute(False)
+    zeitansage_log.flush()
+    assert capsys.readouterr().out == ""
+
+
+def test_phases_run_concurrently_and_set_ready(capsys):
+    startup = StartupPhases()
+    assert READY.labels().value == 0
+    startup.on_air()
+
+    def failing():
+        raise RuntimeError("kein Netz")
+    startup.run_in_background({'TTS-Engine': lambda: time.sleep(0.2), 'Clips': lambda: time.sleep(0.2),
+                               'Wetter': failing})
+    assert not startup.ready.is_set()
+    assert startup.ready.wait(2)
+    assert startup.ready_seconds < 0.35  # Gleichzeitig, nicht nacheinander
+    assert set(startup.timings) == {'TTS-Engine', 'Clips', 'Wetter'}
+    assert READY.labels().value == 1
+    zeitansage_log.flush()
+    output = capsys.readouterr().out
+    assert "INFO: Sendebeginn nach" in output
+    assert "FEHLER: Startphase 'Wetter' fehlgeschlagen: kein Netz" in output
+    assert "INFO: Bereit nach" in output
@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+
+from zeitansage_replay import run_replay
+from zeitansage_signals import CountdownBlock
+from zeitansage_stations import create_station, station_languages
+
+RATE = 1000
+START = 1699999980  # Volle Minute, damit der Zeitplan auf dem Raster beginnt
+
+
+def make_station(config, segments, interval_seconds=60):
+    countdown = CountdownBlock(RATE, 3, 1.0, 100, 0.1, 0.5)
+    return create_station(config, RATE, lambda when: list(segments), countdown, interval_seconds, create_fifo=False)
+
+
+def test_station_languages():
+    stations = [{'languages': ['en']}, {}]
+    assert station_languages(stations, ['de', 'en', 'fr']) == ['de', 'en', 'fr']
+    assert station_languages([{'languages': ['fr', 'de']}], ['de', 'en', 'fr']) == ['de', 'fr']
+
+
+def test_create_station_from_config():
+    station = make_station({'fifo_path': '/tmp/zeitansage_test', 'timezone': 'UTC', 'sample_rate': 500,
+                            'sample_format': 'int16', 'interval_seconds': 30}, [])
+    assert station.name == '/tmp/zeitansage_test'
+    assert str(station.timezone) == 'UTC'
+    assert station.output.describe() == "int16, 500 Hz"
+    assert station.scheduler.interval_seconds == 30
+    assert not os.path.exists('/tmp/zeitansage_test')  # create_fifo=False fasst die FIFO nicht an
+
+
+def test_replay_keeps_schedule(tmp_path):
+    speech = np.full(500, 0.1, dtype=np.float32)
+    stations = [make_station({'name': 'berlin', 'fifo_path': None, 'timezone': 'Europe/Berlin'}, [speech]),
+                make_station({'name': 'utc', 'fifo_path': None, 'sample_format': 'int16'}, [speech], 30)]
+    report = run_replay(stations, START, 180, output_dir=str(tmp_path), report_path=str(tmp_path / 'report.json'))
+    assert report['ok']
+    berlin, utc = report['stations']
+    assert berlin['cycles'] >= 2 and utc['cycles'] >= 5
+    assert berlin['alignment_error_ms']['max'] <= 1.0
+    assert berlin['announced_mismatches'] == 0
+    assert berlin['timeline'][0]['actual'].endswith('+01:00')
+    # Mitschnitt im FIFO-Format der Station: alles, was der Writer geschrieben hat
+    assert os.path.getsize(tmp_path / 'berlin.f32le') == stations[0].writer.samples_written * 4
+    assert os.path.getsize(tmp_path / 'utc.s16le') == stations[1].writer.samples_written * 2
+    assert stations[0].writer.samples_written >= 180 * RATE
+    assert (tmp_path / 'report.json').exists()
+
+
+def test_replay_fails_without_speech():
+    station = make_station({'name': 'stumm', 'fifo_path': None}, [])
+    report = run_replay([station], START, 120, include_cycles=False)
+    assert not report['ok']
+    assert report['stations'][0]['empty_announcements'] == report['stations'][0]['cycles'] > 0
+    assert 'timeline' not in report['stations'][0]
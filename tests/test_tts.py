@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+import zeitansage_tts
+from zeitansage_fakes import fake_wav_bytes
+from zeitansage_tts import Pyttsx3EngineManager, get_voice_by_lang_code
+
+
+def test_get_voice_by_lang_code():
+    assert get_voice_by_lang_code(None, 'DE', ['gmw/en', 'gmw/de']) == 'gmw/de'
+    assert get_voice_by_lang_code(None, 'fr', ['gmw/en', 'gmw/de']) is None
+
+
+def test_engine_is_created_once_and_properties_cached(fake_pyttsx3):
+    manager = Pyttsx3EngineManager()
+    manager.warm_up()
+    assert manager.synthesize_wav_bytes("Hallo", 1.0, 150, 'de') == fake_wav_bytes("Hallo")
+    assert manager.synthesize_wav_bytes("Hello", 1.0, 150, 'en') == fake_wav_bytes("Hello")
+    assert manager.synthesize_wav_bytes("Servus", 1.0, 150, 'fr') is not None  # Standardstimme
+    assert len(fake_pyttsx3.engines) == 1
+    engine = fake_pyttsx3.engines[0]
+    assert engine.set_calls == [('voice', 'gmw/de'), ('rate', 150), ('volume', 1.0), ('voice', 'gmw/en')]
+
+
+def test_driver_error_reinitializes_engine(fake_pyttsx3):
+    fake_pyttsx3.failures = 1
+    manager = Pyttsx3EngineManager()
+    assert manager.synthesize_wav_bytes("Hallo", 1.0, 150, 'de') == fake_wav_bytes("Hallo")
+    assert len(fake_pyttsx3.engines) == 2
+    assert ('voice', 'gmw/de') in fake_pyttsx3.engines[1].set_calls  # Eigenschaften der neuen Engine neu gesetzt
+
+
+def test_gives_up_after_second_failure(fake_pyttsx3, tmp_path):
+    manager = Pyttsx3EngineManager()
+    manager.warm_up()
+    fake_pyttsx3.engines[0].failures = 1
+    fake_pyttsx3.failures = 1
+    assert not manager.save_to_file("Hallo", str(tmp_path / 'a.wav'), 1.0, 150)
+    assert manager.save_to_file("Hallo", str(tmp_path / 'b.wav'), 1.0, 150)
+    assert len(fake_pyttsx3.engines) == 3
+
+
+def test_temp_file_is_removed_when_synthesis_fails(fake_pyttsx3, tmp_path, monkeypatch):
+    monkeypatch.setattr(zeitansage_tts, 'TTS_TEMP_DIR', str(tmp_path))
+    manager = Pyttsx3EngineManager()
+    manager.warm_up()
+    fake_pyttsx3.engines[0].failures = 1
+    fake_pyttsx3.failures = 1  # Auch die neu initialisierte Engine scheitert
+    assert manager.synthesize_wav_bytes("Hallo", 1.0, 150, 'de') is None
+    assert os.listdir(tmp_path) == []
+
+    def broken_save_to_file(*args, **kwargs):
+        raise OSError("Datenträger voll")
+    monkeypatch.setattr(manager, 'save_to_file', broken_save_to_file)
+    with pytest.raises(OSError):
+        manager.synthesize_wav_bytes("Hallo", 1.0, 150, 'de')
+    assert os.listdir(tmp_path) == []
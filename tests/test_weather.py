@@ -0,0 +1,119 @@
+import time
+
+import pytest
+
+pytest.importorskip('requests')
+
+import zeitansage_log  # noqa: E402
+from zeitansage_fakes import FAKE_WEATHER  # noqa: E402
+from zeitansage_weather import WeatherPoller, fetch_weather_data  # noqa: E402
+
+
+class Recorder:
+    """prepare()-Ersatz, der alle Aufrufe mitschreibt."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, data):
+        self.calls.append(data)
+        return None if data is None else f"{data['temperatureC']} Grad"
+
+
+def test_fetch_weather_data(fake_weather_server):
+    assert fetch_weather_data(fake_weather_server.url, 2.0) == FAKE_WEATHER
+
+
+def test_fetch_weather_data_errors(fake_weather_server, capsys):
+    fake_weather_server.state['status'] = 500
+    assert fetch_weather_data(fake_weather_server.url, 2.0) is None
+    fake_weather_server.state.update(status=200, body=b'kein JSON')
+    assert fetch_weather_data(fake_weather_server.url, 2.0) is None
+    fake_weather_server.stop()
+    assert fetch_weather_data(fake_weather_server.url, 2.0) is None
+    zeitansage_log.flush()
+    output = capsys.readouterr().out
+    assert "HTTP-Fehler 500" in output
+    assert "Konnte JSON" in output
+    assert "Verbindungsfehler" in output
+
+
+def test_prepares_only_on_change(fake_weather_server):
+    prepare = Recorder()
+    poller = WeatherPoller(fake_weather_server.url, 2.0, prepare)
+    poller.refresh()
+    poller.refresh()
+    assert prepare.calls == [FAKE_WEATHER]
+    assert poller.prepared() == "21.4 Grad"
+    fake_weather_server.state['data'] = dict(FAKE_WEATHER, temperatureC=22.0)
+    poller.refresh()
+    assert poller.current()['temperatureC'] == 22.0
+    assert poller.prepared() == "22.0 Grad"
+    poller.reprepare()  # Gleiche Daten, aber neu aufbereiten
+    poller.refresh()
+    assert len(prepare.calls) == 3
+
+
+def test_serves_cached_data_until_max_age(fake_weather_server):
+    prepare = Recorder()
+    poller = WeatherPoller(fake_weather_server.url, 2.0, prepare, max_age_seconds=0.2)
+    poller.refresh()
+    fake_weather_server.state['status'] = 503
+    poller.refresh()
+    assert poller.current() == FAKE_WEATHER  # Fehlschlag: letzter gültiger Wert bleibt
+    assert prepare.calls == [FAKE_WEATHER]
+    time.sleep(0.25)
+    poller.refresh()
+    assert poller.current() is None
+    assert prepare.calls == [FAKE_WEATHER, None]
+    assert poller.prepared() is None
+
+
+def test_failing_prepare_is_retried(fake_weather_server):
+    calls = []
+
+    def prepare(data):
+        calls.append(data)
+        if len(calls) == 1:
+            raise RuntimeError("TTS nicht erreichbar")
+        return "fertig"
+    poller = WeatherPoller(fake_weather_server.url, 2.0, prepare)
+    poller.refresh()
+    assert poller.prepared() is None
+    poller.refresh()
+    assert poller.prepared() == "fertig"
+
+
+def test_background_refresh_every_ttl(fake_weather_server):
+    poller = WeatherPoller(fake_weather_server.url, 2.0, Recorder(), refresh_seconds=0.05)
+    poller.start()
+    try:
+        assert poller.ready.wait(2)
+        assert poller.current() == FAKE_WEATHER
+        time.sleep(0.3)
+        assert fake_weather_server.state['requests'] >= 4
+    finally:
+        poller.stop()
+    requests_after_stop = fake_weather_server.state['requests']
+    time.sleep(0.15)
+    assert fake_weather_server.state['requests'] <= requests_after_stop + 1
+
+
+def test_ready_even_if_first_fetch_fails(fake_weather_server):
+    fake_weather_server.state['status'] = 500
+    poller = WeatherPoller(fake_weather_server.url, 2.0, Recorder(), refresh_seconds=10)
+    poller.start()
+    try:
+        assert poller.ready.wait(2)
+        assert poller.current() is None
+    finally:
+        poller.stop()
+
+
+def test_disabled_poller_prepares_unavailable_once():
+    prepare = Recorder()
+    poller = WeatherPoller(None, 2.0, prepare)
+    poller.refresh()
+    poller.refresh()
+    assert prepare.calls == [None]
+    assert poller.session is None  # Ohne URL wird requests gar nicht erst geladen
@@ -1,13 +1,46 @@
 import os
-import time
+import sys
+import argparse
+import functools
 import datetime
-import pyttsx3
 import numpy as np
-import stat
-import subprocess
+import shutil
+from zeitansage_cache import ClipCache
+from zeitansage_backends import create_tts_engine
+from zeitansage_pipeline import LookAheadRenderer, Pause, create_render_pool, render_in_parallel
+from zeitansage_signals import CountdownBlock
+from zeitansage_output import OutputFormat
+from zeitansage_stations import ensure_fifo, station_languages
+from zeitansage_metrics import MetricsServer
+from zeitansage_runtime import (AnnouncementState, create_clip_engine, load_config, run_archive_build, run_single_fifo,
+                                run_station_mode)
+from zeitansage_startup import StartupPhases
+from zeitansage_log import flush, log
 
 # --- Konfiguration ---
 FIFO_PATH = os.path.join(os.path.expanduser("~"), "zeitansage_audio_fifo")
+ENABLE_FIFO_OUTPUT = True # False: nur Netzwerk-Streaming, ohne Named Pipe
+FIFO_SAMPLE_FORMAT = 'float32' # Sample-Format der Named Pipe: 'float32', 'int16' (halbe Bandbreite) oder 'int8'
+FIFO_SAMPLE_RATE = None        # Abtastrate der Named Pipe in Hz (None = SAMPLE_RATE, sonst wird resampelt)
+
+# Netzwerk-Streaming desselben Streams (None bzw. leer = deaktiviert)
+STREAM_HOST = "0.0.0.0"   # Adresse, auf der die Stream-Server lauschen
+STREAM_TCP_PORT = None    # Roher Stream über TCP, z.B. 7355
+STREAM_HTTP_PORT = None   # Stream als chunked HTTP-Antwort, z.B. 8000
+STREAM_UDP_PORT = None    # UDP-Abonnement per beliebigem Datagramm an diesen Port, z.B. 7356
+STREAM_UDP_TARGETS = []   # Feste UDP-Ziele, z.B. [("192.168.1.50", 7356)]
+STREAM_SAMPLE_FORMAT = 'float32' # Sample-Format der Netzwerk-Streams (unabhängig von der Named Pipe)
+STREAM_SAMPLE_RATE = None        # Abtastrate der Netzwerk-Streams in Hz (None = SAMPLE_RATE)
+
+# Metriken im Prometheus-Textformat unter http://METRICS_HOST:METRICS_PORT/metrics (None = deaktiviert)
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = None       # z.B. 9464
+
+CLIP_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "zeitansage") # Gerenderte Clips (float32)
+CLIP_CACHE_MAX_MB = 200 # Größengrenze des Clip-Caches, ältere Clips werden verdrängt
+# Vorab gerenderte Zeitansagen eines ganzen Tages (erstellen mit: python zeitansage.py --build-archive)
+ANNOUNCEMENT_ARCHIVE_PATH = os.path.join(CLIP_CACHE_DIR, "tagesarchiv.zta")
+
 SAMPLE_RATE = 20000  # Abtastrate in Hz (20 kHz)
 BEEP_FREQUENCY = 500 # Frequenz des Beep-Tons in Hz
 BEEP_DURATION_SECONDS = 0.2 # Dauer eines einzelnen Beep-Tons
@@ -17,227 +50,206 @@ UPDATE_INTERVAL_SECONDS = 15 # Zeitintervall zwischen dem Beginn der Ansagen (er
 COUNTDOWN_BEATS = 5 # Anzahl der Beeps vor der Hauptansage
 BEEP_CYCLE_INTERVAL = 1.0 # Zeit zwischen den Beep-Beginnen (1 Sekunde für "jede Sekunde")
 INTER_LANGUAGE_SILENCE_SECONDS = 0.75 # Pause zwischen den verschiedenen Sprachansagen
+RENDER_WORKERS = 4 # Threads für paralleles Rendern der Sprachen und Phrasen-Clips
 
-SPEAKER_VOLUME = 0.8 # Lautstärke der Sprachausgabe (0.0 - 1.0)
 BEEP_VOLUME = 0.5 # Lautstärke des Beep-Tons (0.0 - 1.0)
+FINAL_BEEP_FREQUENCY = None        # Eigene Frequenz des letzten Tons vor der Ansage in Hz (None = BEEP_FREQUENCY)
+FINAL_BEEP_DURATION_SECONDS = None # Eigene Dauer des letzten Tons (None = BEEP_DURATION_SECONDS)
+TIMECODE_VOLUME = None # Pegel eines IRIG-B-Zeitcodes (1 kHz, UTC), der dem Countdown beigemischt wird, z.B. 0.05 (None = aus)
+SPEECH_TARGET_RMS_DB = -20.0 # Lautstärke der Sprachausgabe: alle Clips werden auf diesen Pegel normalisiert (dBFS, RMS)
+
+# TTS-Backends in Rückfall-Reihenfolge ('pyttsx3', 'gtts', 'espeak', 'cache' = nur bereits gerenderte Clips)
+TTS_BACKENDS = ['pyttsx3', 'espeak', 'cache']
+TTS_LATENCY_BUDGETS = {'pyttsx3': 3.0, 'espeak': 2.0} # Sekunden pro Anfrage, danach wird ausgewichen
+TTS_DEADLINE_MARGIN_SECONDS = 0.5 # So lange vor dem Ton muss das Rendering eines Zyklus spätestens fertig sein
 
 # NEU: Sprechgeschwindigkeiten pro Sprache (Wörter pro Minute)
 SPEAKER_RATE_DE = 180 # Standard für Deutsch
 SPEAKER_RATE_EN = 150 # Langsamer für Englisch
 SPEAKER_RATE_FR = 150 # Langsamer für Französisch
 
-# --- Hilfsfunktionen ---
+# Zeitansage je Sprache als strftime-Format (Platzhalter %H, %I, %M, %S, %p)
+TIME_FORMAT_DE = "Es ist %H Uhr %M Minuten und %S Sekunden."
+TIME_FORMAT_EN = "It is %I %M %S %p."
+TIME_FORMAT_FR = "Il est %H heures %M minutes et %S secondes."
+
+# Zeitansagen in Sendereihenfolge: (Sprachcode, strftime-Format, Sprechrate), abgeleitet aus den Einstellungen oben
+TIME_ANNOUNCEMENTS = [
+    ('de', TIME_FORMAT_DE, SPEAKER_RATE_DE),
+    ('en', TIME_FORMAT_EN, SPEAKER_RATE_EN),
+    ('fr', TIME_FORMAT_FR, SPEAKER_RATE_FR),
+]
+LANGUAGES = ['de', 'en', 'fr'] # Angesagte Sprachen (Auswahl aus TIME_ANNOUNCEMENTS)
+
+# Mehrstationen-Betrieb: mehrere Ausgaben in einem Prozess, die sich Clip-Cache, TTS und Phrasen-Clips teilen
+# (leer = eine Station mit den Einstellungen oben). Je Station ein dict mit 'name', 'fifo_path' und optional
+# 'timezone' (z.B. "America/New_York"), 'languages' (Sprachcodes aus TIME_ANNOUNCEMENTS), 'interval_seconds',
+# 'sample_rate' und 'sample_format' der FIFO. Beispiel:
+# STATIONS = [{'name': 'berlin', 'fifo_path': '/tmp/zeitansage_berlin', 'timezone': "Europe/Berlin"},
+#             {'name': 'new-york', 'fifo_path': '/tmp/zeitansage_ny', 'timezone': "America/New_York", 'languages': ['en']}]
+STATIONS = []
+
+# Konfigurationsdatei (TOML, oder JSON bei anderer Endung) mit Einstellungen von oben, z.B. 'UPDATE_INTERVAL_SECONDS = 30'.
+# Sie wird beim Start gelesen, falls vorhanden, und zur Laufzeit beobachtet (neu laden mit SIGHUP oder durch Speichern).
+CONFIG_PATH = os.path.join(os.path.expanduser("~"), ".config", "zeitansage.toml")
+# Diese Einstellungen werden zur Laufzeit an der nächsten Zyklusgrenze übernommen, alle anderen erst nach einem Neustart
+RELOADABLE_SETTINGS = ('UPDATE_INTERVAL_SECONDS', 'SPEECH_TARGET_RMS_DB', 'SPEAKER_RATE_DE', 'SPEAKER_RATE_EN',
+                       'SPEAKER_RATE_FR', 'TIME_FORMAT_DE', 'TIME_FORMAT_EN', 'TIME_FORMAT_FR', 'LANGUAGES')
+DERIVED_SETTINGS = ('TIME_ANNOUNCEMENTS',) # Werden aus anderen Einstellungen abgeleitet und sind nicht direkt einstellbar
 
-def generate_beep_wave(freq, duration, sample_rate, volume):
-    """Generiert einen Sinuswellen-Beep (Float32)."""
-    t = np.linspace(0, duration, int(sample_rate * duration), endpoint=False)
-    beep_wave = (volume * np.sin(2 * np.pi * freq * t)).astype(np.float32)
-    return beep_wave
+# --- Hilfsfunktionen ---
 
 def generate_silence_wave(duration_seconds, sample_rate):
     """Generiert ein Array von Stille (Float32)."""
     return np.zeros(int(duration_seconds * sample_rate), dtype=np.float32)
 
-def get_voice_by_lang_code(engine, lang_code_prefix):
-    """Sucht eine passende Stimme basierend auf einem Sprachcode-Präfix."""
-    voices = engine.getProperty('voices')
-    for voice in voices:
-        if lang_code_prefix.lower() in voice.id.lower():
-            return voice.id
-    return None # Fallback to default
-
-def generate_tts_wav(text, output_path, volume, speech_rate, lang_code_prefix=None):
-    """Generiert eine WAV-Datei aus Text mit pyttsx3 und versucht, die Sprache und Rate einzustellen."""
-    engine = pyttsx3.init()
-    
-    if lang_code_prefix:
-        voice_id = get_voice_by_lang_code(engine, lang_code_prefix)
-        if voice_id:
-            engine.setProperty('voice', voice_id)
-            print(f"INFO: Stimme für '{lang_code_prefix}' gefunden und eingestellt: {voice_id}")
-        else:
-            print(f"WARNUNG: Keine Stimme für '{lang_code_prefix}' gefunden. Verwende Standardstimme.")
-    
-    engine.setProperty('rate', speech_rate) # HIER WIRD DIE SPRACHRATE GESETZT
-    engine.setProperty('volume', volume)
-    
-    engine.save_to_file(text, output_path)
-    engine.runAndWait()
-
-def convert_wav_to_float32_mono_20khz(input_wav_path, target_sample_rate):
+def render_time_announcement(clip_engine, lang_code, time_format, when, archive=None):
+    """Liefert die Zeitansage einer Sprache für 'when' aus dem Tagesarchiv oder setzt sie zusammen (oder None bei Fehler)."""
+    log(f"Rendere Ansage '{lang_code}': {when.strftime(time_format)}")
+    tts_audio_data = archive.lookup(lang_code, when) if archive is not None else None
+    if tts_audio_data is None:
+        tts_audio_data = clip_engine.assemble(lang_code, when)
+    if tts_audio_data is None: log(f"Fehler bei Ansage '{lang_code}', überspringe.")
+    return tts_audio_data
+
+def render_announcement_segments(clip_engine, render_pool, when, inter_lang_silence_wave, archive=None, languages=None):
     """
-    Konvertiert eine WAV-Datei zu einem NumPy float32 Array (mono, target_sample_rate)
-    mithilfe von FFmpeg und gibt es zurück.
+    Rendert alle Sprachsegmente eines Zyklus für den Zeitpunkt 'when' parallel und gibt sie in Sendereihenfolge zurück
+    (mit 'languages' nur diese Sprachcodes, z.B. für eine Station). Angesagt werden nur Sprachen, die in der
+    Clip-Engine registriert sind; eine zur Laufzeit hinzugefügte Sprache also erst, wenn ihre Clips bereitstehen.
     """
-    ffmpeg_command = [
-        'ffmpeg',
-        '-i', input_wav_path,
-        '-f', 'f32le',               # Ausgabeformat: 32-bit float, little-endian
-        '-acodec', 'pcm_f32le',      # Audio-Codec: PCM 32-bit float, little-endian
-        '-ar', str(target_sample_rate), # Audio-Abtastrate
-        '-ac', '1',                  # Audio-Kanäle (mono)
-        '-map_metadata', '-1',       # Keine Metadaten kopieren
-        '-loglevel', 'error',        # Nur Fehler ausgeben
-        '-'                          # Ausgabe an stdout
-    ]
-    
-    try:
-        process = subprocess.run(ffmpeg_command, check=True, capture_output=True)
-        audio_data = np.frombuffer(process.stdout, dtype=np.float32)
-        return audio_data
-    except subprocess.CalledProcessError as e:
-        print(f"FEHLER: FFmpeg-Prozess fehlgeschlagen bei Konvertierung von '{input_wav_path}'.")
-        print(f"FFmpeg stdout: {e.stdout.decode()}")
-        print(f"FFmpeg stderr: {e.stderr.decode()}")
-        return None
-    except Exception as e:
-        print(f"Ein unerwarteter Fehler ist aufgetreten während der FFmpeg-Konvertierung: {e}")
-        return None
+    parts = []
+    announcements = [entry for entry in TIME_ANNOUNCEMENTS
+                     if entry[0] in clip_engine.templates and (languages is None or entry[0] in languages)]
+    for index, (lang_code, time_format, _) in enumerate(announcements):
+        if index > 0:
+            parts.append(Pause(inter_lang_silence_wave)) # Kurze Pause zwischen den Sprachen
+        parts.append(functools.partial(render_time_announcement, clip_engine, lang_code, time_format, when, archive))
+    return render_in_parallel(render_pool, parts)
+
+def single_station_config():
+    """Die Einzelstation aus den FIFO-Einstellungen als Eintrag der Stationsliste."""
+    return {'name': 'zeitansage', 'fifo_path': FIFO_PATH, 'sample_rate': FIFO_SAMPLE_RATE, 'sample_format': FIFO_SAMPLE_FORMAT}
+
+def archive_params():
+    """Alle Einstellungen, die den Inhalt des Tagesarchivs bestimmen."""
+    return {'backends': TTS_BACKENDS, 'announcements': TIME_ANNOUNCEMENTS, 'target_rms_db': SPEECH_TARGET_RMS_DB}
+
+def active_languages():
+    """Die angesagten Sprachen; im Mehrstationen-Betrieb nur die, die eine Station ansagt."""
+    return station_languages(STATIONS, LANGUAGES) if STATIONS else list(LANGUAGES)
+
+def time_formats():
+    """Die strftime-Formate der Zeitansagen je Sprache, in Sendereihenfolge."""
+    return {lang_code: time_format for lang_code, time_format, _ in TIME_ANNOUNCEMENTS}
+
+def update_settings(settings):
+    """Übernimmt Einstellungen (z.B. aus der Konfigurationsdatei) und leitet TIME_ANNOUNCEMENTS neu ab."""
+    global TIME_ANNOUNCEMENTS
+    globals().update(settings)
+    TIME_ANNOUNCEMENTS = [(lang_code, globals()[f"TIME_FORMAT_{lang_code.upper()}"],
+                           globals()[f"SPEAKER_RATE_{lang_code.upper()}"])
+                          for lang_code, _, _ in TIME_ANNOUNCEMENTS]
 
 # --- Haupt-Streaming-Funktion ---
 
-def main():
-    try:
-        subprocess.run(['ffmpeg', '-version'], check=True, capture_output=True)
-        print("FFmpeg gefunden. Wird für Audioverarbeitung verwendet.")
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        print("FEHLER: FFmpeg ist nicht installiert oder nicht im PATH gefunden.")
-        print("Bitte installieren Sie FFmpeg (z.B. 'sudo apt install ffmpeg' unter Debian/Ubuntu).")
-        return
-
-    if os.path.exists(FIFO_PATH):
-        if not stat.S_ISFIFO(os.stat(FIFO_PATH).st_mode):
-            print(f"FEHLER: '{FIFO_PATH}' existiert, ist aber keine Named Pipe. Bitte löschen oder umbenennen.")
-            return
+def main(build_archive=False, replay_hours=None, replay_start=None, replay_output=None, replay_report=None, config_path=None):
+    script = sys.modules[__name__]
+    # Startphasen messen; bis TTS-Engine und Clips aufgewärmt sind, geht schon Stille hinaus
+    startup = StartupPhases()
+
+    # Die Konfigurationsdatei gilt ab dem Start und wird danach weiter beobachtet
+    config_watcher, settings = load_config(script, config_path, startup)
+    if settings is None:
+        return 1
+    update_settings(settings)
+
+    # Nur im PATH nachsehen statt 'ffmpeg -version' zu starten, das kostet beim Start einen ganzen Prozess
+    with startup.phase('Abhängigkeiten'):
+        ffmpeg_path = shutil.which('ffmpeg')
+    if ffmpeg_path:
+        log("FFmpeg gefunden. Wird für Nicht-WAV-Ausgaben der TTS-Engine verwendet.")
     else:
-        try:
-            os.mkfifo(FIFO_PATH)
-            print(f"Named Pipe (FIFO) '{FIFO_PATH}' erstellt.")
-        except OSError as e:
-            print(f"FEHLER: Konnte Named Pipe '{FIFO_PATH}' nicht erstellen: {e}")
-            print("Stellen Sie sicher, dass Sie die Berechtigung haben, in Ihrem Home-Verzeichnis zu schreiben.")
-            return
-
-    # Beep-Wellenform einmalig generieren und im RAM halten
-    beep_wave = generate_beep_wave(BEEP_FREQUENCY, BEEP_DURATION_SECONDS, SAMPLE_RATE, BEEP_VOLUME)
-    
-    # Stille-Segment für die Lücke zwischen den Beeps
-    silence_after_beep_duration = BEEP_CYCLE_INTERVAL - BEEP_DURATION_SECONDS
-    silence_after_beep_wave = generate_silence_wave(silence_after_beep_duration, SAMPLE_RATE)
-    
-    # Kombiniertes Beep+Stille Segment, das zyklisch gesendet wird
-    pulsed_beep_segment = np.concatenate((beep_wave, silence_after_beep_wave))
+        # WAV-Ausgaben werden direkt mit NumPy dekodiert, FFmpeg ist nur noch Rückfallebene
+        log("WARNUNG: FFmpeg ist nicht installiert oder nicht im PATH gefunden. Nur WAV-Ausgaben werden unterstützt.")
+        log("Bei Bedarf FFmpeg installieren (z.B. 'sudo apt install ffmpeg' unter Debian/Ubuntu).")
+
+    single_fifo = ENABLE_FIFO_OUTPUT and not build_archive and not STATIONS and replay_hours is None
+    if single_fifo and not ensure_fifo(FIFO_PATH):
+        return 1
+
+    # Der ganze Countdown (Töne mit weichen Flanken und Pausen) wird einmalig berechnet und im RAM gehalten
+    countdown = CountdownBlock(SAMPLE_RATE, COUNTDOWN_BEATS, BEEP_CYCLE_INTERVAL, BEEP_FREQUENCY, BEEP_DURATION_SECONDS,
+                               BEEP_VOLUME, FINAL_BEEP_FREQUENCY, FINAL_BEEP_DURATION_SECONDS, timecode_volume=TIMECODE_VOLUME)
 
     # Stille-Segment zwischen den Sprachen
     inter_lang_silence_wave = generate_silence_wave(INTER_LANGUAGE_SILENCE_SECONDS, SAMPLE_RATE)
 
-    tts_wav_path = os.path.join(os.path.expanduser("~"), "zeitansage_temp_tts.wav")
-
-    print(f"Schreibe Audio-Stream als float32 in Named Pipe '{FIFO_PATH}' mit {SAMPLE_RATE} Hz...")
-    print("Starte einen Reader (z.B. VLC oder GNU Radio) aus dieser Pipe.")
-
-    next_update_time = time.monotonic() # Zeitpunkt für den Beginn des nächsten Update-Zyklus
-
-    while True:
-        try:
-            with open(FIFO_PATH, 'wb') as fifo_file:
-                print(f"FIFO '{FIFO_PATH}' geöffnet. Warte auf Reader...")
-                
-                while True: # Innere Schleife, die läuft, solange der Reader verbunden ist
-                    time_until_next_cycle = next_update_time - time.monotonic()
-                    if time_until_next_cycle > 0:
-                        print(f"Warte {time_until_next_cycle:.2f} Sekunden bis zum nächsten Ansage-Zyklus...")
-                        silence_duration = time_until_next_cycle
-                        block_size_samples = int(SAMPLE_RATE * 0.1) # 100ms Blöcke
-                        total_samples_written = 0
-                        silence_samples = int(silence_duration * SAMPLE_RATE)
-                        
-                        while total_samples_written < silence_samples:
-                            current_block_samples = min(block_size_samples, silence_samples - total_samples_written)
-                            current_silence_block = generate_silence_wave(current_block_samples / SAMPLE_RATE, SAMPLE_RATE)
-                            try:
-                                fifo_file.write(current_silence_block.tobytes())
-                                fifo_file.flush()
-                                total_samples_written += current_block_samples
-                            except BrokenPipeError:
-                                print(f"BrokenPipeError während Stille: Reader von '{FIFO_PATH}' hat Verbindung getrennt. Warte auf neuen Reader...")
-                                break
-                            # time.sleep(0.01) # Kurze Pause, um CPU nicht zu überlasten, kann bei stabilen Systemen auch weggelassen werden
-                        if total_samples_written < silence_samples:
-                            break # Break occurred during silence writing
-
-                    # Starte den Countdown
-                    print(f"Beginne {COUNTDOWN_BEATS}-Sekunden-Countdown...")
-                    for i in range(COUNTDOWN_BEATS, 0, -1):
-                        print(f"Countdown: {i}...")
-                        try:
-                            fifo_file.write(pulsed_beep_segment.tobytes())
-                            fifo_file.flush()
-                        except BrokenPipeError:
-                            print(f"BrokenPipeError während Countdown: Reader von '{FIFO_PATH}' hat Verbindung getrennt. Warte auf neuen Reader...")
-                            break
-                    else: # Only runs if loop completed without break
-                        i = 0 # Indicate countdown completed
-
-                    if i != 0: # If countdown loop was broken
-                        break # Break out of inner while loop as well
-
-
-                    # --- Zeitansagen in verschiedenen Sprachen ---
-                    now = datetime.datetime.now()
-                    
-                    # 1. Deutsche Ansage
-                    german_text = now.strftime("Es ist %H Uhr %M Minuten und %S Sekunden.")
-                    print(f"Generiere Deutsch: {german_text}")
-                    generate_tts_wav(german_text, tts_wav_path, SPEAKER_VOLUME, SPEAKER_RATE_DE, lang_code_prefix='de')
-                    tts_audio_data = convert_wav_to_float32_mono_20khz(tts_wav_path, SAMPLE_RATE)
-                    if tts_audio_data is None: print("Fehler bei deutscher Ansage, überspringe.")
-                    else:
-                        try: fifo_file.write(tts_audio_data.tobytes()); fifo_file.flush()
-                        except BrokenPipeError: print("BrokenPipeError nach Deutsch, warte..."); break
-
-
-                    # 2. Kurze Pause
-                    try: fifo_file.write(inter_lang_silence_wave.tobytes()); fifo_file.flush()
-                    except BrokenPipeError: print("BrokenPipeError nach Pause, warte..."); break
-
-
-                    # 3. Englische Ansage
-                    english_text = now.strftime("It is %I %M %S %p.") 
-                    print(f"Generiere Englisch: {english_text}")
-                    # Hier wird die neue Rate für Englisch übergeben
-                    generate_tts_wav(english_text, tts_wav_path, SPEAKER_VOLUME, SPEAKER_RATE_EN, lang_code_prefix='en')
-                    tts_audio_data = convert_wav_to_float32_mono_20khz(tts_wav_path, SAMPLE_RATE)
-                    if tts_audio_data is None: print("Fehler bei englischer Ansage, überspringe.")
-                    else:
-                        try: fifo_file.write(tts_audio_data.tobytes()); fifo_file.flush()
-                        except BrokenPipeError: print("BrokenPipeError nach Englisch, warte..."); break
-
-
-                    # 4. Kurze Pause
-                    try: fifo_file.write(inter_lang_silence_wave.tobytes()); fifo_file.flush()
-                    except BrokenPipeError: print("BrokenPipeError nach Pause, warte..."); break
-
-
-                    # 5. Französische Ansage
-                    french_text = now.strftime("Il est %H heures %M minutes et %S secondes.")
-                    print(f"Generiere Französisch: {french_text}")
-                    # Hier wird die neue Rate für Französisch übergeben
-                    generate_tts_wav(french_text, tts_wav_path, SPEAKER_VOLUME, SPEAKER_RATE_FR, lang_code_prefix='fr')
-                    tts_audio_data = convert_wav_to_float32_mono_20khz(tts_wav_path, SAMPLE_RATE)
-                    if tts_audio_data is None: print("Fehler bei französischer Ansage, überspringe.")
-                    else:
-                        try: fifo_file.write(tts_audio_data.tobytes()); fifo_file.flush()
-                        except BrokenPipeError: print("BrokenPipeError nach Französisch, warte..."); break
-                    
-
-                    # --- Zyklusende ---
-                    next_update_time = time.monotonic() + UPDATE_INTERVAL_SECONDS
-                    print(f"Alle Ansagen gesendet. Nächster Zyklus beginnt in {UPDATE_INTERVAL_SECONDS} Sekunden (total).")
-
-        except Exception as e:
-            print(f"Fehler beim Öffnen der FIFO: {e}. Versuche es erneut in 5 Sekunden.")
-            time.sleep(5)
+    # Gerenderte Clips überleben Neustarts im Festplatten-Cache
+    clip_cache = ClipCache(CLIP_CACHE_DIR, CLIP_CACHE_MAX_MB * 1024 * 1024)
+
+    # Gemeinsamer Pool, auf dem Phrasen-Clips und Sprachsegmente parallel gerendert werden
+    render_pool = create_render_pool(RENDER_WORKERS)
+
+    # TTS über austauschbare Backends; verpasst eines sein Zeitbudget, wird auf das nächste ausgewichen
+    speech_rates = {lang_code: rate for lang_code, _, rate in TIME_ANNOUNCEMENTS}
+    tts = create_tts_engine(TTS_BACKENDS, SAMPLE_RATE, clip_cache, TTS_LATENCY_BUDGETS,
+                            speech_rates=speech_rates, target_rms_db=SPEECH_TARGET_RMS_DB)
+
+    # Feste Wörter und Zahlen aller Sprachen einmalig rendern; im Zyklus wird nur noch zusammengesetzt
+    clip_engine = create_clip_engine(script, tts)
+    tts.on_late_result = lambda text, lang_code, clip: clip_engine.replace_token(lang_code, text, clip)
+
+    # Batch-Modus: alle Ansagen des Tages auf allen Kernen in ein Archiv rendern und beenden
+    if build_archive:
+        return run_archive_build(script, clip_engine, render_pool)
+
+    # Wiedergabemodus: liegt ein passendes Tagesarchiv vor, werden die Ansagen nur noch per mmap gelesen.
+    # Archiv und Clips werden im Hintergrund vorbereitet, während schon Stille gesendet wird.
+    # Geänderte Sprechraten gelten über das gemeinsame dict der Backends.
+    state = AnnouncementState(script, config_watcher, clip_engine, tts, render_pool, on_change=lambda changes, previous:
+                              speech_rates.update({lang_code: rate for lang_code, _, rate in TIME_ANNOUNCEMENTS}))
+    startup.run_in_background({'TTS-Engine': tts.warm_up, 'Phrasen-Clips': state.warm_up})
+
+    # Latenz-Histogramme und Zähler für Prometheus bereitstellen
+    if METRICS_PORT is not None and replay_hours is None:
+        MetricsServer(METRICS_HOST, METRICS_PORT).start()
+
+    def render_segments(when, languages=None):
+        return render_announcement_segments(clip_engine, render_pool, when, inter_lang_silence_wave, state.archive,
+                                            languages)
+
+    # Mehrstationen-Betrieb und Zeitraffer (--replay) auf einer Ereignisschleife
+    if STATIONS or replay_hours is not None:
+        return run_station_mode(script, state, startup,
+                                lambda config: functools.partial(render_segments, languages=config.get('languages')),
+                                countdown, replay_hours, replay_start, replay_output, replay_report)
+
+    # Gerendert wird einmal mit SAMPLE_RATE als float32, jede Ausgabe wandelt in ihr eigenes Format
+    fifo_output = OutputFormat(SAMPLE_RATE, FIFO_SAMPLE_RATE, FIFO_SAMPLE_FORMAT)
+    log(f"Schreibe Audio-Stream als {fifo_output.sample_format} in Named Pipe '{FIFO_PATH}' "
+        f"mit {fifo_output.sample_rate} Hz...")
+    log("Starte einen Reader (z.B. VLC oder GNU Radio) aus dieser Pipe.")
+    run_single_fifo(script, state, startup, LookAheadRenderer(render_segments), countdown, fifo_output)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Mehrsprachige Zeitansage als float32-Audiostream.")
+    parser.add_argument('--build-archive', action='store_true',
+                        help=f"alle Zeitansagen eines Tages nach '{ANNOUNCEMENT_ARCHIVE_PATH}' rendern und beenden")
+    parser.add_argument('--replay', type=float, metavar='STUNDEN',
+                        help="den Zeitplan im Zeitraffer über STUNDEN simulierte Stunden abspielen und prüfen (ohne FIFO)")
+    parser.add_argument('--replay-start', metavar='ISO-ZEIT',
+                        help="Startzeit des Zeitraffers, z.B. 2024-03-31T00:00 (Standard: jetzt)")
+    parser.add_argument('--replay-output', metavar='VERZEICHNIS',
+                        help="die Streams des Zeitraffers als Rohdaten in dieses Verzeichnis schreiben")
+    parser.add_argument('--replay-report', metavar='DATEI',
+                        help="den Zeitplan-Bericht des Zeitraffers als JSON in diese Datei schreiben")
+    parser.add_argument('--config', metavar='DATEI',
+                        help=f"Einstellungen aus dieser Datei lesen (TOML oder JSON, "
+                             f"Standard: '{CONFIG_PATH}', falls vorhanden)")
+    args = parser.parse_args()
+    replay_start = datetime.datetime.fromisoformat(args.replay_start).timestamp() if args.replay_start else None
+    exit_code = main(build_archive=args.build_archive, replay_hours=args.replay, replay_start=replay_start,
+                     replay_output=args.replay_output, replay_report=args.replay_report, config_path=args.config)
+    flush()  # Gepufferte Log-Meldungen vor dem Beenden ausgeben
+    sys.exit(exit_code)
@@ -1,18 +1,51 @@
 import os
-import time
+import sys
+import argparse
+import functools
 import datetime
-from gtts import gTTS # Neu: gTTS Bibliothek importieren
 import numpy as np
-import stat
-import subprocess
-import requests # F�r HTTP-Anfragen
-import json     # F�r JSON-Verarbeitung
+import shutil
+import importlib.util
+from zeitansage_backends import create_tts_engine
+from zeitansage_gtts import GttsClient
+from zeitansage_cache import ClipCache
+from zeitansage_pipeline import LookAheadRenderer, Pause, create_render_pool, render_in_parallel
+from zeitansage_signals import CountdownBlock
+from zeitansage_output import OutputFormat
+from zeitansage_stations import ensure_fifo, station_languages
+from zeitansage_metrics import MetricsServer
+from zeitansage_runtime import (AnnouncementState, create_clip_engine, load_config, run_archive_build, run_single_fifo,
+                                run_station_mode)
+from zeitansage_startup import StartupPhases
+from zeitansage_log import flush, log
+from zeitansage_weather import WeatherPoller
 # pyttsx3, socket und base64 werden f�r diese Version nicht ben�tigt
 
 # --- Konfiguration ---
 # Pfad zur Named Pipe (FIFO) im selben Verzeichnis wie das Skript
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 FIFO_PATH = os.path.join(SCRIPT_DIR, "zeitansage_audio_fifo")
+ENABLE_FIFO_OUTPUT = True # False: nur Netzwerk-Streaming, ohne Named Pipe
+FIFO_SAMPLE_FORMAT = 'float32' # Sample-Format der Named Pipe: 'float32', 'int16' (halbe Bandbreite) oder 'int8'
+FIFO_SAMPLE_RATE = None        # Abtastrate der Named Pipe in Hz (None = SAMPLE_RATE, sonst wird resampelt)
+
+# Netzwerk-Streaming desselben Streams (None bzw. leer = deaktiviert)
+STREAM_HOST = "0.0.0.0"   # Adresse, auf der die Stream-Server lauschen
+STREAM_TCP_PORT = None    # Roher Stream über TCP, z.B. 7355
+STREAM_HTTP_PORT = None   # Stream als chunked HTTP-Antwort, z.B. 8000
+STREAM_UDP_PORT = None    # UDP-Abonnement per beliebigem Datagramm an diesen Port, z.B. 7356
+STREAM_UDP_TARGETS = []   # Feste UDP-Ziele, z.B. [("192.168.1.50", 7356)]
+STREAM_SAMPLE_FORMAT = 'float32' # Sample-Format der Netzwerk-Streams (unabhängig von der Named Pipe)
+STREAM_SAMPLE_RATE = None        # Abtastrate der Netzwerk-Streams in Hz (None = SAMPLE_RATE)
+
+# Metriken im Prometheus-Textformat unter http://METRICS_HOST:METRICS_PORT/metrics (None = deaktiviert)
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = None       # z.B. 9464
+
+CLIP_CACHE_DIR = os.path.join(SCRIPT_DIR, "zeitansage_cache") # Gerenderte Clips (float32)
+CLIP_CACHE_MAX_MB = 200 # Größengrenze des Clip-Caches, ältere Clips werden verdrängt
+# Vorab gerenderte Zeitansagen eines ganzen Tages (erstellen mit: python zeitansage2.py --build-archive)
+ANNOUNCEMENT_ARCHIVE_PATH = os.path.join(CLIP_CACHE_DIR, "tagesarchiv.zta")
 
 SAMPLE_RATE = 10000  # Abtastrate in Hz (10 kHz)
 BEEP_FREQUENCY = 500 # Frequenz des Beep-Tons in Hz
@@ -24,9 +57,13 @@ COUNTDOWN_BEATS = 5 # Anzahl der Beeps vor der Hauptansage
 BEEP_CYCLE_INTERVAL = 1.0 # Zeit zwischen den Beep-Beginnen (1 Sekunde f�r "jede Sekunde")
 INTER_LANGUAGE_SILENCE_SECONDS = 0.75 # Pause zwischen den verschiedenen Sprachansagen
 INTER_ANNOUNCEMENT_SILENCE_SECONDS = 0.5 # Kurze Pause zwischen Zeit- und Wetteransage
+RENDER_WORKERS = 4 # Threads für paralleles Rendern (gTTS-Anfragen und FFmpeg laufen gleichzeitig)
 
-SPEAKER_VOLUME = 0.8 # Lautst�rke der Sprachausgabe (0.0 - 1.0)
 BEEP_VOLUME = 0.5 # Lautst�rke des Beep-Tons (0.0 - 1.0)
+FINAL_BEEP_FREQUENCY = None        # Eigene Frequenz des letzten Tons vor der Ansage in Hz (None = BEEP_FREQUENCY)
+FINAL_BEEP_DURATION_SECONDS = None # Eigene Dauer des letzten Tons (None = BEEP_DURATION_SECONDS)
+TIMECODE_VOLUME = None # Pegel eines IRIG-B-Zeitcodes (1 kHz, UTC), der dem Countdown beigemischt wird, z.B. 0.05 (None = aus)
+SPEECH_TARGET_RMS_DB = -20.0 # Alle Sprach-Clips werden auf diesen Pegel normalisiert (dBFS, RMS)
 
 # gTTS steuert die Sprechgeschwindigkeit nicht direkt �ber eine Rate wie pyttsx3.
 # Die gTTS-Bibliothek bietet nur einen 'slow'-Parameter (True/False).
@@ -37,342 +74,388 @@ SPEAKER_RATE_DE_COMMENT = "Normale Geschwindigkeit f�r Deutsch (gTTS)"
 SPEAKER_RATE_EN_COMMENT = "Etwas langsamer f�r Englisch (gTTS)"
 SPEAKER_RATE_FR_COMMENT = "Noch langsamer f�r Franz�sisch (gTTS)"
 
-# NEU: Lautst�rkeanpassungen in dB f�r die Sprachsynthese via FFmpeg (positiver Wert = lauter)
+# Lautstärkeanpassungen in dB relativ zu SPEECH_TARGET_RMS_DB (positiver Wert = lauter)
 VOLUME_GAIN_DE_DB = 6.0 # Beispiel: 6 dB Lautst�rkeerh�hung f�r Deutsch
 VOLUME_GAIN_EN_DB = 0.0 # Keine zus�tzliche Lautst�rkeerh�hung f�r Englisch
 VOLUME_GAIN_FR_DB = 0.0 # Keine zus�tzliche Lautst�rkeerh�hung f�r Franz�sisch (falls reaktiviert)
+VOLUME_GAINS_DB = {'de': VOLUME_GAIN_DE_DB, 'en': VOLUME_GAIN_EN_DB, 'fr': VOLUME_GAIN_FR_DB} # Abgeleitet aus den Einzelwerten
+
+# TTS-Backends in Rückfall-Reihenfolge ('gtts', 'pyttsx3', 'espeak', 'cache' = nur bereits gerenderte Clips)
+TTS_BACKENDS = ['gtts', 'espeak', 'cache']
+TTS_LATENCY_BUDGETS = {'gtts': 4.0, 'espeak': 2.0} # Sekunden pro Anfrage, danach wird ausgewichen
+TTS_DEADLINE_MARGIN_SECONDS = 0.5 # So lange vor dem Ton muss das Rendering eines Zyklus spätestens fertig sein
+GTTS_URL = "https://translate.google.com" # Für Tests ein lokaler Mock-Server, z.B. "http://127.0.0.1:8099"
+GTTS_REQUESTS_PER_SECOND = 3.0 # Ratenlimit für gTTS-Anfragen (über alle Stationen), damit Google nicht drosselt
+GTTS_BURST = 6                 # So viele Anfragen dürfen am Stück gestellt werden
+GTTS_MAX_RETRIES = 2           # Wiederholungen nach Verbindungsfehlern, 429 und 5xx (nur innerhalb der Deadline)
+
+# strftime-Formate der Zeitansagen; daraus werden die Phrasen-Clips abgeleitet
+TIME_FORMAT_DE = "Es ist %H Uhr %M Minuten und %S Sekunden."
+TIME_FORMAT_EN = "It is %I %M and %S seconds %p." # Angepasste Formatierung für natürlichere Aussprache
+TIME_FORMAT_FR = "Il est %H heures %M minutes et %S secondes."
+
+# Sprachen eines Zyklus in Sendereihenfolge: (Sprachcode, strftime-Format, Bezeichnung Zeitansage, Bezeichnung Wetter),
+# die Formate werden aus TIME_FORMAT_* abgeleitet
+ANNOUNCEMENT_LANGUAGES = [
+    ('de', TIME_FORMAT_DE, "deutscher", "Deutsch"),
+    ('en', TIME_FORMAT_EN, "englischer", "Englisch"),
+    # Französische Ansage ist auskommentiert, wie vom Benutzer gewünscht (Wettertexte gibt es nur für DE/EN).
+    # ('fr', TIME_FORMAT_FR, "französischer", "Französisch"),
+]
+LANGUAGES = ['de', 'en'] # Angesagte Sprachen (Auswahl aus ANNOUNCEMENT_LANGUAGES)
 
 
 # Wetter-API-Endpunkt
 WEATHER_API_URL = "http://kremser-digital.duckdns.org/data" # Adresse f�r die JSON-Daten
 WEATHER_FETCH_TIMEOUT = 5 # Timeout in Sekunden f�r den API-Aufruf
+WEATHER_REFRESH_SECONDS = 60 # Wetterdaten werden im Hintergrund in diesem Abstand erneuert
+WEATHER_MAX_AGE_SECONDS = 600 # Ältere Wetterdaten gelten als nicht verfügbar
+
+# Mehrstationen-Betrieb: mehrere Ausgaben in einem Prozess, die sich Clip-Cache, TTS, Phrasen-Clips und
+# Wetterabruf teilen (leer = eine Station mit den Einstellungen oben). Je Station ein dict mit 'name',
+# 'fifo_path' und optional 'timezone' (z.B. "Europe/Vienna"), 'languages' (Sprachcodes aus
+# ANNOUNCEMENT_LANGUAGES), 'interval_seconds', 'sample_rate', 'sample_format' und 'weather_url'
+# (Stationen mit derselben Wetterquelle teilen sich einen Abruf). Beispiel:
+# STATIONS = [{'name': 'wien', 'fifo_path': '/tmp/zeitansage_wien', 'timezone': "Europe/Vienna"},
+#             {'name': 'london', 'fifo_path': '/tmp/zeitansage_london', 'timezone': "Europe/London", 'languages': ['en']}]
+STATIONS = []
+
+# Konfigurationsdatei (TOML, oder JSON bei anderer Endung) mit Einstellungen von oben, z.B. 'VOLUME_GAIN_DE_DB = 3.0'.
+# Sie wird beim Start gelesen, falls vorhanden, und zur Laufzeit beobachtet (neu laden mit SIGHUP oder durch Speichern).
+CONFIG_PATH = os.path.join(SCRIPT_DIR, "zeitansage2.toml")
+# Diese Einstellungen werden zur Laufzeit an der nächsten Zyklusgrenze übernommen, alle anderen erst nach einem Neustart
+RELOADABLE_SETTINGS = ('UPDATE_INTERVAL_SECONDS', 'SPEECH_TARGET_RMS_DB',
+                       'VOLUME_GAIN_DE_DB', 'VOLUME_GAIN_EN_DB', 'VOLUME_GAIN_FR_DB',
+                       'TIME_FORMAT_DE', 'TIME_FORMAT_EN', 'TIME_FORMAT_FR', 'LANGUAGES', 'WEATHER_API_URL')
+# Werden aus anderen Einstellungen abgeleitet und sind nicht direkt einstellbar
+DERIVED_SETTINGS = ('ANNOUNCEMENT_LANGUAGES', 'VOLUME_GAINS_DB')
 
 # --- Hilfsfunktionen ---
 
-def generate_beep_wave(freq, duration, sample_rate, volume):
-    """Generiert einen Sinuswellen-Beep (Float32)."""
-    t = np.linspace(0, duration, int(sample_rate * duration), endpoint=False)
-    beep_wave = (volume * np.sin(2 * np.pi * freq * t)).astype(np.float32)
-    return beep_wave
-
 def generate_silence_wave(duration_seconds, sample_rate):
     """Generiert ein Array von Stille (Float32)."""
     return np.zeros(int(duration_seconds * sample_rate), dtype=np.float32)
 
-# Funktion zur Generierung von TTS-Audiodateien mit gTTS
-def generate_gtts_audio_file(text, output_path, lang_code, slow_speed=False):
+def build_weather_texts(weather_data):
+    """Formuliert die deutschen und englischen Wettertexte aus den JSON-Wetterdaten."""
+    german_weather_text = "Wetter nicht verfügbar."
+    english_weather_text = "Weather not available."
+
+    if weather_data:
+        try:
+            temp_c = weather_data.get("temperatureC")
+            temp_f = weather_data.get("temperatureF")
+            humid  = weather_data.get("humidity")
+            preas  = weather_data.get("pressure")
+            wind_speed = weather_data.get("windSpeed") # NEU: Windgeschwindigkeit auslesen
+
+            if temp_c is not None:
+                german_weather_text = f"Die Temperatur betraegt {temp_c:.0f} Grad Celsius."
+                if humid is not None:
+                    german_weather_text += f" Die Luftfeuchtigkeit liegt bei {humid:.0f} Prozent."
+                if preas is not None:
+                    german_weather_text += f" Der Luftdruck liegt bei {preas:.0f} Hektopascal."
+                # NEU: Windgeschwindigkeit für Deutsch
+                if wind_speed is not None:
+                    if wind_speed <= 0.5:
+                        german_weather_text += " Es ist kein Wind."
+                    else:
+                        german_weather_text += f" Die Windgeschwindigkeit beträgt {wind_speed:.1f} Meter pro Sekunde."
+            else:
+                german_weather_text = "Temperatur in Celsius nicht gefunden."
+
+            if temp_f is not None:
+                english_weather_text = f"The temperature is {temp_f:.0f} degrees Fahrenheit."
+                if humid is not None:
+                    english_weather_text += f" The humidity is {humid:.0f} percent."
+                if preas is not None:
+                    english_weather_text += f" The pressure is {preas:.0f} hectopascals."
+                # NEU: Windgeschwindigkeit für Englisch
+                if wind_speed is not None:
+                    if wind_speed <= 0.5:
+                        english_weather_text += " There is no wind."
+                    else:
+                        english_weather_text += f" The wind speed is {wind_speed:.1f} meters per second."
+            else:
+                english_weather_text = "Temperature in Fahrenheit not found."
+
+        except Exception as e:
+            log(f"FEHLER: Problem beim Extrahieren der Wetterdaten aus JSON: {e}")
+            german_weather_text = "Wetterdaten fehlerhaft."
+            english_weather_text = "Weather data faulty."
+    else:
+        log("INFO: Keine Wetterdaten verfügbar oder Fehler beim Abruf.")
+
+    return german_weather_text, english_weather_text
+
+def render_weather_clips(tts, render_pool, weather_data):
+    """
+    Formuliert und rendert die Wetteransagen für neue Wetterdaten, alle Sprachen parallel.
+    Wird vom WeatherPoller im Hintergrund nur bei geänderten Werten aufgerufen.
+    Gibt {Sprachcode: (Text, Clip oder None)} zurück.
+    """
+    texts = dict(zip(('de', 'en'), build_weather_texts(weather_data)))
+    for lang_code, text in texts.items():
+        log(f"Generiere Wetter '{lang_code}': {text}")
+    futures = {lang_code: render_pool.submit(tts.render, text, lang_code)
+               for lang_code, text in texts.items()}
+    return {lang_code: (texts[lang_code], future.result()) for lang_code, future in futures.items()}
+
+def replace_late_clip(clip_engine, weather_pollers, text, lang_code, clip):
+    """Tauscht einen Ersatz-Clip (z.B. espeak) gegen das verspätet eingetroffene Original des bevorzugten Backends."""
+    clip_engine.replace_token(lang_code, text, clip)
+    for weather_poller in weather_pollers:
+        weather_clips = weather_poller.prepared()
+        if weather_clips and weather_clips.get(lang_code, (None, None))[0] == text:
+            weather_clips[lang_code] = (text, clip)
+
+def render_time_announcement(clip_engine, lang_code, time_format, when, label, archive=None):
+    """
+    Liefert die Zeitansage einer Sprache für 'when' aus dem Tagesarchiv oder setzt sie
+    aus den Phrasen-Clips zusammen (oder None bei Fehler).
+    """
+    log(f"Rendere {label} Zeit: {when.strftime(time_format)}")
+    tts_audio_data = archive.lookup(lang_code, when) if archive is not None else None
+    if tts_audio_data is None:
+        tts_audio_data = clip_engine.assemble(lang_code, when)
+    if tts_audio_data is None: log(f"FEHLER bei {label} Zeitansage (Phrasen-Clips), überspringe.");
+    return tts_audio_data
+
+def render_announcement_segments(clip_engine, weather_poller, render_pool, when, inter_lang_silence_wave,
+                                 inter_announcement_silence_wave, archive=None, languages=None):
+    """
+    Setzt alle Segmente eines Zyklus für den Zeitpunkt 'when' in Sendereihenfolge zusammen
+    (DE Zeit, DE Wetter, EN Zeit, EN Wetter, jeweils mit Pausen; mit 'languages' nur diese Sprachcodes).
+    Die Zeitansagen aller Sprachen werden parallel auf dem Render-Pool erzeugt (oder aus dem Tagesarchiv gelesen),
+    die Wetteransagen kommen bereits gerendert vom WeatherPoller. Fehlgeschlagene Ansagen werden übersprungen.
+    """
+    weather_clips = weather_poller.prepared() or {}
+
+    def weather_segment(lang_code, label):
+        weather_text, tts_audio_data = weather_clips.get(lang_code, (None, None))
+        log(f"{label} Wetter: {weather_text}")
+        if tts_audio_data is None: log(f"FEHLER bei {label.lower()}er Wetteransage (nicht vorab gerendert), überspringe.");
+        return tts_audio_data
+
+    parts = []
+    for lang_code, time_format, time_label, weather_label in ANNOUNCEMENT_LANGUAGES:
+        # Eine zur Laufzeit hinzugefügte Sprache erst, wenn ihre Phrasen-Clips bereitstehen
+        if lang_code not in clip_engine.templates or (languages is not None and lang_code not in languages):
+            continue
+        parts += [
+            # Zeitansage, zusammengesetzt aus den Phrasen-Clips (inkl. Lautstärke-Boost); parallel gerendert,
+            # jede weitere Sprache verlängert die Renderzeit des Zyklus daher nicht
+            functools.partial(render_time_announcement, clip_engine, lang_code, time_format, when, time_label, archive),
+            # Kurze Pause zwischen Zeit und Wetter
+            Pause(inter_announcement_silence_wave),
+            # Wetteransage
+            weather_segment(lang_code, weather_label),
+            # Kurze Pause zwischen Sprachen
+            Pause(inter_lang_silence_wave),
+        ]
+    return render_in_parallel(render_pool, parts)
+
+def single_station_config():
+    """Die Einzelstation aus den FIFO-Einstellungen als Eintrag der Stationsliste."""
+    return {'name': 'zeitansage', 'fifo_path': FIFO_PATH, 'sample_rate': FIFO_SAMPLE_RATE, 'sample_format': FIFO_SAMPLE_FORMAT}
+
+def archive_params():
+    """Alle Einstellungen, die den Inhalt des Tagesarchivs bestimmen (nur Zeitansagen, das Wetter bleibt live)."""
+    formats = {lang_code: globals()[f"TIME_FORMAT_{lang_code.upper()}"] for lang_code in active_languages()}
+    return {'backends': TTS_BACKENDS, 'formats': formats, 'gains_db': VOLUME_GAINS_DB, 'target_rms_db': SPEECH_TARGET_RMS_DB}
+
+def active_languages():
+    """Die angesagten Sprachen; im Mehrstationen-Betrieb nur die, die eine Station ansagt."""
+    return station_languages(STATIONS, LANGUAGES) if STATIONS else list(LANGUAGES)
+
+def time_formats():
+    """Die strftime-Formate der Zeitansagen je Sprache, in Sendereihenfolge."""
+    return {lang_code: time_format for lang_code, time_format, _, _ in ANNOUNCEMENT_LANGUAGES}
+
+def check_dependencies(startup):
+    """
+    Prüft die Abhängigkeiten, ohne sie schon zu laden: FFmpeg nur im PATH suchen, die Bibliotheken nur finden.
+    Importiert werden requests und gTTS erst beim Aufwärmen im Hintergrund. Gibt (TTS-Backends, requests
+    vorhanden) zurück; ohne FFmpeg oder ohne verfügbares TTS-Backend ist die Liste leer.
+    """
+    with startup.phase('Abhängigkeiten'):
+        ffmpeg_path = shutil.which('ffmpeg')
+        requests_spec = importlib.util.find_spec('requests')
+        gtts_spec = importlib.util.find_spec('gtts')
+    if ffmpeg_path:
+        log("FFmpeg gefunden. Wird für Audioverarbeitung verwendet.")
+    else:
+        log("FEHLER: FFmpeg ist nicht installiert oder nicht im PATH gefunden.")
+        log("Bitte installieren Sie FFmpeg (z.B. 'sudo apt install ffmpeg' unter Debian/Ubuntu).")
+        return [], requests_spec is not None
+    # requests und gTTS braucht nur das gTTS-Backend (requests auch der Wetterabruf); fehlen sie, wird ohne
+    # gTTS über die übrigen Backends gesprochen, statt den Start abzubrechen
+    tts_backends = list(TTS_BACKENDS)
+    if requests_spec is None:
+        log("WARNUNG: 'requests' Bibliothek nicht gefunden ('pip install requests'), Wetteransagen sind nicht verfügbar.")
+    if 'gtts' in tts_backends:
+        missing = [name for name, spec in (('requests', requests_spec), ('gtts', gtts_spec)) if spec is None]
+        if missing:
+            log(f"WARNUNG: {' und '.join(missing)} nicht gefunden ('pip install {' '.join(missing)}'), "
+                "das TTS-Backend 'gtts' entfällt.")
+            tts_backends.remove('gtts')
+        else:
+            log("INFO: requests und gTTS gefunden, das TTS-Backend 'gtts' ist verfügbar.")
+    if not tts_backends:
+        log("FEHLER: Kein TTS-Backend verfügbar, bitte TTS_BACKENDS prüfen.")
+    return tts_backends, requests_spec is not None
+
+def create_weather_pollers(prepare, requests_available):
+    """
+    Ein WeatherPoller pro Wetterquelle (Schlüssel: URL), den sich alle Stationen mit derselben Quelle teilen.
+    Ohne requests wird nichts abgerufen, die Poller melden dann nur fehlende Wetterdaten.
+    """
+    weather_pollers = {}
+    for weather_url in [config.get('weather_url', WEATHER_API_URL) for config in STATIONS] or [WEATHER_API_URL]:
+        if weather_url not in weather_pollers:
+            weather_pollers[weather_url] = WeatherPoller(weather_url if requests_available else None,
+                                                         WEATHER_FETCH_TIMEOUT, prepare=prepare,
+                                                         refresh_seconds=WEATHER_REFRESH_SECONDS,
+                                                         max_age_seconds=WEATHER_MAX_AGE_SECONDS)
+    return weather_pollers
+
+def warm_up_weather(weather_pollers):
+    """Startphase 'Wetter': alle Poller starten und ihren ersten Abruf samt gerenderter Wetteransage abwarten."""
+    for weather_poller in weather_pollers.values():
+        weather_poller.start()
+    for weather_poller in weather_pollers.values():
+        weather_poller.ready.wait()
+
+def apply_weather_changes(weather_pollers, tts, requests_available, changes, previous):
     """
-    Generiert eine MP3-Audio-Datei aus Text mit gTTS.
-    Die Geschwindigkeit kann mit 'slow_speed=True' auf 0.5x reduziert werden.
+    on_change nach geänderten Einstellungen: neue Pegel an die TTS-Engine geben. Stationen ohne eigene
+    Wetterquelle folgen WEATHER_API_URL; bei neuem Pegel wird das Wetter sofort neu gerendert.
     """
-    try:
-        # gTTS speichert direkt eine MP3-Datei
-        tts = gTTS(text=text, lang=lang_code, slow=slow_speed)
-        tts.save(output_path)
-        print(f"INFO: gTTS-Audio f�r '{lang_code}' erfolgreich gespeichert in '{output_path}'.")
-        return True
-    except Exception as e:
-        print(f"FEHLER: gTTS konnte Audio nicht generieren oder speichern f�r Text '{text[:50]}...': {e}")
-        return False
-
-def convert_audio_to_float32_mono_10khz(input_audio_path, target_sample_rate, volume_db=0.0):
+    tts.processor.gains_db = dict(VOLUME_GAINS_DB)
+    old_weather_url = previous.get('WEATHER_API_URL', WEATHER_API_URL)
+    default_poller = weather_pollers.get(old_weather_url)
+    if 'WEATHER_API_URL' in changes and default_poller is not None:
+        if any(config.get('weather_url') == old_weather_url for config in STATIONS):
+            log("WARNUNG: Eine Station nutzt die bisherige WEATHER_API_URL ausdrücklich, "
+                "die Änderung wird erst nach einem Neustart wirksam.")
+        else:
+            default_poller.url = WEATHER_API_URL if requests_available else None
+            default_poller.reprepare()
+    if any(name == 'SPEECH_TARGET_RMS_DB' or name.startswith('VOLUME_GAIN_') for name in changes):
+        for weather_poller in weather_pollers.values():
+            weather_poller.reprepare()
+
+def update_settings(settings):
     """
-    Konvertiert eine Audio-Datei (z.B. MP3 von gTTS) zu einem NumPy float32 Array (mono, target_sample_rate)
-    mithilfe von FFmpeg und gibt es zur�ck.
-    FFmpeg erkennt das Eingabeformat automatisch.
-    F�gt optional einen Lautst�rke-Filter hinzu.
+    Übernimmt Einstellungen (z.B. aus der Konfigurationsdatei) und leitet
+    VOLUME_GAINS_DB und ANNOUNCEMENT_LANGUAGES neu ab.
     """
-    ffmpeg_command = [
-        'ffmpeg',
-        '-i', input_audio_path,
-        '-f', 'f32le',               # Ausgabeformat: 32-bit float, little-endian
-        '-acodec', 'pcm_f32le',      # Audio-Codec: PCM 32-bit float, little-endian
-        '-ar', str(target_sample_rate), # Audio-Abtastrate (ziel: 10 kHz)
-        '-ac', '1',                  # Audio-Kan�le (mono)
-        '-map_metadata', '-1',       # Keine Metadaten kopieren
-        '-loglevel', 'error',        # Nur Fehler ausgeben
-    ]
-    
-    # NEU: FFmpeg-Lautst�rke-Filter hinzuf�gen
-    if volume_db != 0.0:
-        ffmpeg_command.extend(['-af', f"volume={volume_db}dB"])
-
-    ffmpeg_command.append('-') # Ausgabe an stdout
-    
-    try:
-        process = subprocess.run(ffmpeg_command, check=True, capture_output=True)
-        audio_data = np.frombuffer(process.stdout, dtype=np.float32)
-        return audio_data
-    except subprocess.CalledProcessError as e: # Korrigierter Fehlername
-        print(f"FEHLER: FFmpeg-Prozess fehlgeschlagen bei Konvertierung von '{input_audio_path}'.")
-        print(f"FFmpeg stdout: {e.stdout.decode()}")
-        print(f"FFmpeg stderr: {e.stderr.decode()}")
-        return None
-    except Exception as e:
-        print(f"Ein unerwarteter Fehler ist aufgetreten w�hrend der FFmpeg-Konvertierung: {e}")
-        return None
-
-def fetch_weather_data(url, timeout):
-    """Ruft Wetterdaten von einer URL ab und parst sie als JSON."""
-    try:
-        response = requests.get(url, timeout=timeout)
-        response.raise_for_status()
-        return json.loads(response.text)
-    except requests.exceptions.Timeout:
-        print(f"FEHLER: Timeout beim Abrufen von Wetterdaten von {url}")
-        return None
-    except requests.exceptions.ConnectionError:
-        print(f"FEHLER: Verbindungsfehler beim Abrufen von Wetterdaten von {url}. Ist der Server erreichbar?")
-        return None
-    except requests.exceptions.HTTPError as e:
-        print(f"FEHLER: HTTP-Fehler {e.response.status_code} beim Abrufen von Wetterdaten von {url}")
-        return None
-    except json.JSONDecodeError:
-        print(f"FEHLER: Konnte JSON von {url} nicht parsen. Ung�ltiges JSON-Format. Raw-Daten: '{response.text[:100]}...'")
-        return None
-    except Exception as e:
-        print(f"Ein unerwarteter Fehler ist beim Abrufen/Parsen von Wetterdaten aufgetreten: {e}")
-        return None
+    global VOLUME_GAINS_DB, ANNOUNCEMENT_LANGUAGES
+    globals().update(settings)
+    VOLUME_GAINS_DB = {lang_code: globals()[f"VOLUME_GAIN_{lang_code.upper()}_DB"] for lang_code in VOLUME_GAINS_DB}
+    ANNOUNCEMENT_LANGUAGES = [(lang_code, globals()[f"TIME_FORMAT_{lang_code.upper()}"], time_label, weather_label)
+                              for lang_code, _, time_label, weather_label in ANNOUNCEMENT_LANGUAGES]
 
 # --- Haupt-Streaming-Funktion ---
 
-def main():
-    # Pr�fe Abh�ngigkeiten
-    try:
-        subprocess.run(['ffmpeg', '-version'], check=True, capture_output=True)
-        print("FFmpeg gefunden. Wird f�r Audioverarbeitung verwendet.")
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        print("FEHLER: FFmpeg ist nicht installiert oder nicht im PATH gefunden.")
-        print("Bitte installieren Sie FFmpeg (z.B. 'sudo apt install ffmpeg' unter Debian/Ubuntu).")
-        return
-    try:
-        import requests
-        print("Requests Bibliothek gefunden. Wird f�r HTTP-Anfragen verwendet.")
-    except ImportError:
-        print("FEHLER: 'requests' Bibliothek nicht gefunden. Bitte installieren Sie sie ('pip install requests').")
-        return
-    try:
-        from gtts import gTTS
-        print("gTTS Bibliothek gefunden. Wird f�r Text-zu-Sprache verwendet.")
-    except ImportError:
-        print("FEHLER: 'gtts' Bibliothek nicht gefunden. Bitte installieren Sie sie ('pip install gtts').")
-        return
-    
-    # FIFO erstellen und Berechtigungen pr�fen
-    if os.path.exists(FIFO_PATH):
-        if not stat.S_ISFIFO(os.stat(FIFO_PATH).st_mode):
-            print(f"FEHLER: '{FIFO_PATH}' existiert, ist aber keine Named Pipe. Bitte l�schen oder umbenennen.")
-            return
-    else:
-        try:
-            os.mkfifo(FIFO_PATH)
-            print(f"Named Pipe (FIFO) '{FIFO_PATH}' erstellt.")
-        except OSError as e:
-            print(f"FEHLER: Konnte Named Pipe '{FIFO_PATH}' nicht erstellen: {e}")
-            print("Stellen Sie sicher, dass Sie die Berechtigung haben, in diesem Verzeichnis zu schreiben.")
-            return
+def main(build_archive=False, replay_hours=None, replay_start=None, replay_output=None, replay_report=None, config_path=None):
+    script = sys.modules[__name__]
+    # Startphasen messen; bis TTS-Engine, Clips und Wetter aufgewärmt sind, geht schon Stille hinaus
+    startup = StartupPhases()
 
-    print(f"Schreibe Audio-Stream als float32 in Named Pipe '{FIFO_PATH}' mit {SAMPLE_RATE} Hz...")
-    print("Starte einen Reader (z.B. VLC oder GNU Radio) aus dieser Pipe.")
+    # Die Konfigurationsdatei gilt ab dem Start und wird danach weiter beobachtet
+    config_watcher, settings = load_config(script, config_path, startup)
+    if settings is None:
+        return 1
+    update_settings(settings)
 
-    beep_wave = generate_beep_wave(BEEP_FREQUENCY, BEEP_DURATION_SECONDS, SAMPLE_RATE, BEEP_VOLUME)
-    silence_after_beep_duration = BEEP_CYCLE_INTERVAL - BEEP_DURATION_SECONDS
-    silence_after_beep_wave = generate_silence_wave(silence_after_beep_duration, SAMPLE_RATE)
-    pulsed_beep_segment = np.concatenate((beep_wave, silence_after_beep_wave))
+    tts_backends, requests_available = check_dependencies(startup)
+    if not tts_backends:
+        return 1
+
+    # FIFO erstellen und Berechtigungen prüfen
+    single_fifo = ENABLE_FIFO_OUTPUT and not build_archive and not STATIONS and replay_hours is None
+    if single_fifo and not ensure_fifo(FIFO_PATH):
+        return 1
+
+    countdown = CountdownBlock(SAMPLE_RATE, COUNTDOWN_BEATS, BEEP_CYCLE_INTERVAL, BEEP_FREQUENCY, BEEP_DURATION_SECONDS,
+                               BEEP_VOLUME, FINAL_BEEP_FREQUENCY, FINAL_BEEP_DURATION_SECONDS, timecode_volume=TIMECODE_VOLUME)
 
     inter_lang_silence_wave = generate_silence_wave(INTER_LANGUAGE_SILENCE_SECONDS, SAMPLE_RATE)
     inter_announcement_silence_wave = generate_silence_wave(INTER_ANNOUNCEMENT_SILENCE_SECONDS, SAMPLE_RATE)
 
-    # Der Pfad f�r die tempor�re MP3-Datei im Skript-Verzeichnis
-    tts_audio_file_path = os.path.join(SCRIPT_DIR, "zeitansage_temp_tts.mp3") # .mp3 statt .wav
+    # Gerenderte Clips (auch wiederkehrende Wettertexte) überleben Neustarts im Festplatten-Cache
+    clip_cache = ClipCache(CLIP_CACHE_DIR, CLIP_CACHE_MAX_MB * 1024 * 1024)
 
-    next_update_time = time.monotonic() # Zeitpunkt f�r den Beginn des n�chsten Update-Zyklus
+    # Gemeinsamer Pool, auf dem Phrasen-Clips, Wetter- und Zeitansagen parallel gerendert werden
+    render_pool = create_render_pool(RENDER_WORKERS)
 
-    while True:
-        try:
-            # �ffne die FIFO im Bin�r-Schreibmodus. Dies blockiert, bis ein Reader die Pipe �ffnet.
-            with open(FIFO_PATH, 'wb') as fifo_file:
-                print(f"FIFO '{FIFO_PATH}' ge�ffnet. Warte auf Reader...")
-                
-                while True: # Innere Schleife, die l�uft, solange der Reader verbunden ist
-                    time_until_next_cycle = next_update_time - time.monotonic()
-                    if time_until_next_cycle > 0:
-                        print(f"Warte {time_until_next_cycle:.2f} Sekunden bis zum n�chsten Ansage-Zyklus...")
-                        silence_duration = time_until_next_cycle
-                        block_size_samples = int(SAMPLE_RATE * 0.1) # 100ms Bl�cke f�r Stille
-                        total_samples_written = 0
-                        silence_samples = int(silence_duration * SAMPLE_RATE)
-                        
-                        while total_samples_written < silence_samples:
-                            current_block_samples = min(block_size_samples, silence_samples - total_samples_written)
-                            current_silence_block = generate_silence_wave(current_block_samples / SAMPLE_RATE, SAMPLE_RATE)
-                            try:
-                                fifo_file.write(current_silence_block.tobytes())
-                                fifo_file.flush()
-                                total_samples_written += current_block_samples
-                            except BrokenPipeError:
-                                print(f"BrokenPipeError w�hrend Stille: Reader von '{FIFO_PATH}' hat Verbindung getrennt. Warte auf neuen Reader...")
-                                break 
-                        if total_samples_written < silence_samples:
-                            break # Break occurred during silence writing
-
-                    # Starte den Countdown
-                    print(f"Beginne {COUNTDOWN_BEATS}-Sekunden-Countdown...")
-                    for i in range(COUNTDOWN_BEATS, 0, -1):
-                        print(f"Countdown: {i}...")
-                        try:
-                            fifo_file.write(pulsed_beep_segment.tobytes())
-                            fifo_file.flush()
-                        except BrokenPipeError:
-                            print(f"BrokenPipeError w�hrend Countdown: Reader von '{FIFO_PATH}' hat Verbindung getrennt. Warte auf neuen Reader...")
-                            break
-                    else: # Only runs if loop completed without break
-                        i = 0 
-                    if i != 0: # If countdown loop was broken
-                        break # Break out of inner while loop as well
-
-
-                    # --- Wetterdaten abrufen ---
-                    weather_data = fetch_weather_data(WEATHER_API_URL, WEATHER_FETCH_TIMEOUT)
-                    german_weather_text = "Wetter nicht verf�gbar."
-                    english_weather_text = "Weather not available."
-                    
-                    if weather_data:
-                        try:
-                            temp_c = weather_data.get("temperatureC")
-                            temp_f = weather_data.get("temperatureF")
-                            humid  = weather_data.get("humidity")
-                            preas  = weather_data.get("pressure")
-                            wind_speed = weather_data.get("windSpeed") # NEU: Windgeschwindigkeit auslesen
-
-                            if temp_c is not None:
-                                german_weather_text = f"Die Temperatur betraegt {temp_c:.0f} Grad Celsius."
-                                if humid is not None:
-                                    german_weather_text += f" Die Luftfeuchtigkeit liegt bei {humid:.0f} Prozent."
-                                if preas is not None:
-                                    german_weather_text += f" Der Luftdruck liegt bei {preas:.0f} Hektopascal."
-                                # NEU: Windgeschwindigkeit f�r Deutsch
-                                if wind_speed is not None:
-                                    if wind_speed <= 0.5:
-                                        german_weather_text += " Es ist kein Wind."
-                                    else:
-                                        german_weather_text += f" Die Windgeschwindigkeit betr�gt {wind_speed:.1f} Meter pro Sekunde."
-                            else:
-                                german_weather_text = "Temperatur in Celsius nicht gefunden."
-
-                            if temp_f is not None:
-                                english_weather_text = f"The temperature is {temp_f:.0f} degrees Fahrenheit."
-                                if humid is not None:
-                                    english_weather_text += f" The humidity is {humid:.0f} percent."
-                                if preas is not None:
-                                    english_weather_text += f" The pressure is {preas:.0f} hectopascals."
-                                # NEU: Windgeschwindigkeit f�r Englisch
-                                if wind_speed is not None:
-                                    if wind_speed <= 0.5:
-                                        english_weather_text += " There is no wind."
-                                    else:
-                                        english_weather_text += f" The wind speed is {wind_speed:.1f} meters per second."
-                            else:
-                                english_weather_text = "Temperature in Fahrenheit not found."
-                                
-                        except Exception as e:
-                            print(f"FEHLER: Problem beim Extrahieren der Wetterdaten aus JSON: {e}")
-                            german_weather_text = "Wetterdaten fehlerhaft."
-                            english_weather_text = "Weather data faulty."
-                    else:
-                        print("INFO: Keine Wetterdaten verf�gbar oder Fehler beim Abruf.")
-
-                    # --- Zeit- und Wetteransagen in verschiedenen Sprachen ---
-                    now = datetime.datetime.now()
-                    
-                    # 1. Deutsche Ansage (Zeit)
-                    german_time_text = now.strftime("Es ist %H Uhr %M Minuten und %S Sekunden.")
-                    print(f"Generiere Deutsch Zeit: {german_time_text}")
-                    # gTTS-Synthese und FFmpeg-Konvertierung mit Lautst�rke-Boost
-                    tts_success = generate_gtts_audio_file(german_time_text, tts_audio_file_path, 'de', slow_speed=False)
-                    if tts_success:
-                        tts_audio_data = convert_audio_to_float32_mono_10khz(tts_audio_file_path, SAMPLE_RATE, volume_db=VOLUME_GAIN_DE_DB)
-                        if tts_audio_data is None: print("FEHLER bei deutscher Zeitansage (FFmpeg), �berspringe.");
-                        else:
-                            try: fifo_file.write(tts_audio_data.tobytes()); fifo_file.flush()
-                            except BrokenPipeError: print("BrokenPipeError nach Deutsch Zeit, warte..."); break
-                    else: print("FEHLER bei deutscher Zeitansage (gTTS), �berspringe.");
-
-                    # Kurze Pause zwischen Zeit und Wetter
-                    try: fifo_file.write(inter_announcement_silence_wave.tobytes()); fifo_file.flush()
-                    except BrokenPipeError: print("BrokenPipeError nach Pause Zeit/Wetter, warte..."); break
-
-                    # 2. Deutsche Ansage (Wetter)
-                    print(f"Generiere Deutsch Wetter: {german_weather_text}")
-                    tts_success = generate_gtts_audio_file(german_weather_text, tts_audio_file_path, 'de', slow_speed=False)
-                    if tts_success:
-                        tts_audio_data = convert_audio_to_float32_mono_10khz(tts_audio_file_path, SAMPLE_RATE, volume_db=VOLUME_GAIN_DE_DB)
-                        if tts_audio_data is None: print("FEHLER bei deutscher Wetteransage (FFmpeg), �berspringe.");
-                        else:
-                            try: fifo_file.write(tts_audio_data.tobytes()); fifo_file.flush()
-                            except BrokenPipeError: print("BrokenPipeError nach Deutsch Wetter, warte..."); break
-                    else: print("FEHLER bei deutscher Wetteransage (gTTS), �berspringe.");
-
-
-                    # 3. Kurze Pause zwischen Sprachen
-                    try: fifo_file.write(inter_lang_silence_wave.tobytes()); fifo_file.flush()
-                    except BrokenPipeError: print("BrokenPipeError nach Pause (DE-EN), warte..."); break
-
-
-                    # 4. Englische Ansage (Zeit)
-                    # NEU: Angepasste Formatierung f�r nat�rlichere Aussprache
-                    english_time_text = now.strftime("It is %I %M and %S seconds %p.") 
-                    print(f"Generiere Englisch Zeit: {english_time_text}")
-                    tts_success = generate_gtts_audio_file(english_time_text, tts_audio_file_path, 'en', slow_speed=False)
-                    if tts_success:
-                        tts_audio_data = convert_audio_to_float32_mono_10khz(tts_audio_file_path, SAMPLE_RATE, volume_db=VOLUME_GAIN_EN_DB)
-                        if tts_audio_data is None: print("FEHLER bei englischer Zeitansage (FFmpeg), �berspringe.");
-                        else:
-                            try: fifo_file.write(tts_audio_data.tobytes()); fifo_file.flush()
-                            except BrokenPipeError: print("BrokenPipeError nach Englisch Zeit, warte..."); break
-                    else: print("FEHLER bei englischer Zeitansage (gTTS), �berspringe.");
-
-                    # Kurze Pause zwischen Zeit und Wetter
-                    try: fifo_file.write(inter_announcement_silence_wave.tobytes()); fifo_file.flush()
-                    except BrokenPipeError: print("BrokenPipeError nach Pause Zeit/Wetter, warte..."); break
-
-                    # 5. Englische Ansage (Wetter)
-                    print(f"Generiere Englisch Wetter: {english_weather_text}")
-                    tts_success = generate_gtts_audio_file(english_weather_text, tts_audio_file_path, 'en', slow_speed=False)
-                    if tts_success:
-                        tts_audio_data = convert_audio_to_float32_mono_10khz(tts_audio_file_path, SAMPLE_RATE, volume_db=VOLUME_GAIN_EN_DB)
-                        if tts_audio_data is None: print("FEHLER bei englischer Wetteransage (FFmpeg), �berspringe.");
-                        else:
-                            try: fifo_file.write(tts_audio_data.tobytes()); fifo_file.flush()
-                            except BrokenPipeError: print("BrokenPipeError nach Englisch Wetter, warte..."); break
-                    else: print("FEHLER bei englischer Wetteransage (gTTS), �berspringe.");
-
-
-                    # 6. Kurze Pause zwischen Sprachen (f�r den �bergang zu Franz�sisch, auch wenn auskommentiert)
-                    try: fifo_file.write(inter_lang_silence_wave.tobytes()); fifo_file.flush()
-                    except BrokenPipeError: print("BrokenPipeError nach Pause (EN-FR), warte..."); break
-
-                    # Kommentar: Franz�sische Ansage ist auskommentiert, wie vom Benutzer gew�nscht.
-                    # # 7. Franz�sische Ansage (Zeit)
-                    # french_time_text = now.strftime("Il est %H heures %M minutes et %S secondes.") 
-                    # print(f"Generiere Franz�sisch Zeit: {french_time_text}")
-                    # tts_success = generate_gtts_audio_file(french_time_text, tts_audio_file_path, 'fr', slow_speed=True) # Franz�sisch ggf. langsamer
-                    # if tts_success:
-                    #     tts_audio_data = convert_audio_to_float32_mono_10khz(tts_audio_file_path, SAMPLE_RATE, volume_db=VOLUME_GAIN_FR_DB)
-                    #     if tts_audio_data is None: print("FEHLER bei franz�sischer Zeitansage (FFmpeg), �berspringe.");
-                    #     else:
-                    #         try: fifo_file.write(tts_audio_data.tobytes()); fifo_file.flush()
-                    #         except BrokenPipeError: print("BrokenPipeError nach Franz�sisch Zeit, warte..."); break
-                    # else: print("FEHLER bei franz�sischer Zeitansage (gTTS), �berspringe.");
-                    
-
-                    # --- Zyklusende ---
-                    next_update_time = time.monotonic() + UPDATE_INTERVAL_SECONDS
-                    print(f"Alle Ansagen gesendet. N�chster Zyklus beginnt in {UPDATE_INTERVAL_SECONDS} Sekunden (total).")
+    # TTS über austauschbare Backends; verpasst gTTS sein Zeitbudget, wird auf das nächste ausgewichen
+    tts = create_tts_engine(tts_backends, SAMPLE_RATE, clip_cache, TTS_LATENCY_BUDGETS,
+                            gains_db=VOLUME_GAINS_DB, target_rms_db=SPEECH_TARGET_RMS_DB,
+                            gtts_client=GttsClient(GTTS_URL, GTTS_REQUESTS_PER_SECOND, GTTS_BURST, GTTS_MAX_RETRIES))
 
-        except Exception as e:
-            print(f"FEHLER im Haupt-Loop: {e}. Versuche es erneut in 5 Sekunden.")
-            time.sleep(5)
+    # Feste Wörter und Zahlen der Zeitansagen einmalig rendern; im Zyklus wird nur noch zusammengesetzt
+    clip_engine = create_clip_engine(script, tts)
+
+    # Batch-Modus: alle Zeitansagen des Tages auf allen Kernen in ein Archiv rendern und beenden
+    if build_archive:
+        return run_archive_build(script, clip_engine, render_pool)
+
+    # Wetterdaten im Hintergrund aktuell halten; Wetteransagen nur bei geänderten Werten neu rendern
+    weather_pollers = create_weather_pollers(functools.partial(render_weather_clips, tts, render_pool), requests_available)
+    tts.on_late_result = functools.partial(replace_late_clip, clip_engine, weather_pollers.values())
+
+    # Wiedergabemodus: liegt ein passendes Tagesarchiv vor, werden die Zeitansagen nur noch per mmap gelesen.
+    # Archiv, Clips und Wetter werden im Hintergrund vorbereitet, während schon Stille gesendet wird.
+    state = AnnouncementState(script, config_watcher, clip_engine, tts, render_pool,
+                              on_change=functools.partial(apply_weather_changes, weather_pollers, tts, requests_available))
+    startup.run_in_background({'TTS-Engine': tts.warm_up, 'Phrasen-Clips': state.warm_up,
+                               'Wetter': functools.partial(warm_up_weather, weather_pollers)})
+
+    # Latenz-Histogramme und Zähler für Prometheus bereitstellen
+    if METRICS_PORT is not None and replay_hours is None:
+        MetricsServer(METRICS_HOST, METRICS_PORT).start()
+
+    def render_segments(weather_poller, when, languages=None):
+        return render_announcement_segments(clip_engine, weather_poller, render_pool, when, inter_lang_silence_wave,
+                                            inter_announcement_silence_wave, state.archive, languages)
+
+    def station_renderer(config):
+        return functools.partial(render_segments, weather_pollers[config.get('weather_url', WEATHER_API_URL)],
+                                 languages=config.get('languages'))
+
+    # Mehrstationen-Betrieb und Zeitraffer (--replay) auf einer Ereignisschleife
+    if STATIONS or replay_hours is not None:
+        return run_station_mode(script, state, startup, station_renderer, countdown, replay_hours, replay_start,
+                                replay_output, replay_report)
+
+    # Gerendert wird einmal mit SAMPLE_RATE als float32, jede Ausgabe wandelt in ihr eigenes Format
+    fifo_output = OutputFormat(SAMPLE_RATE, FIFO_SAMPLE_RATE, FIFO_SAMPLE_FORMAT)
+    log(f"Schreibe Audio-Stream als {fifo_output.sample_format} in Named Pipe '{FIFO_PATH}' "
+        f"mit {fifo_output.sample_rate} Hz...")
+    log("Starte einen Reader (z.B. VLC oder GNU Radio) aus dieser Pipe.")
+    look_ahead = LookAheadRenderer(functools.partial(render_segments, weather_pollers[WEATHER_API_URL]))
+    run_single_fifo(script, state, startup, look_ahead, countdown, fifo_output)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Zeit- und Wetteransage (gTTS) als float32-Audiostream.")
+    parser.add_argument('--build-archive', action='store_true',
+                        help=f"alle Zeitansagen eines Tages nach '{ANNOUNCEMENT_ARCHIVE_PATH}' rendern und beenden")
+    parser.add_argument('--replay', type=float, metavar='STUNDEN',
+                        help="den Zeitplan im Zeitraffer über STUNDEN simulierte Stunden abspielen und prüfen (ohne FIFO)")
+    parser.add_argument('--replay-start', metavar='ISO-ZEIT',
+                        help="Startzeit des Zeitraffers, z.B. 2024-03-31T00:00 (Standard: jetzt)")
+    parser.add_argument('--replay-output', metavar='VERZEICHNIS',
+                        help="die Streams des Zeitraffers als Rohdaten in dieses Verzeichnis schreiben")
+    parser.add_argument('--replay-report', metavar='DATEI',
+                        help="den Zeitplan-Bericht des Zeitraffers als JSON in diese Datei schreiben")
+    parser.add_argument('--config', metavar='DATEI',
+                        help=f"Einstellungen aus dieser Datei lesen (TOML oder JSON, "
+                             f"Standard: '{CONFIG_PATH}', falls vorhanden)")
+    args = parser.parse_args()
+    replay_start = datetime.datetime.fromisoformat(args.replay_start).timestamp() if args.replay_start else None
+    exit_code = main(build_archive=args.build_archive, replay_hours=args.replay, replay_start=replay_start,
+                     replay_output=args.replay_output, replay_report=args.replay_report, config_path=args.config)
+    flush()  # Gepufferte Log-Meldungen vor dem Beenden ausgeben
+    sys.exit(exit_code)
@@ -0,0 +1,201 @@
+import os
+import json
+import struct
+import datetime
+import numpy as np
+
+from zeitansage_clips import PhraseClipEngine
+from zeitansage_log import log
+
+# --- Konfiguration ---
+ARCHIVE_MAGIC = b'ZTARCH02'     # Version 02: float32-Samples (01 speicherte int16)
+ARCHIVE_ALIGNMENT = 8           # Index und Daten beginnen auf 8-Byte-Grenzen
+SLOTS_PER_TASK = 60             # Ansage-Slots pro Auftrag an einen Worker-Prozess
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+# --- Hilfsfunktionen ---
+
+def _align(position):
+    return (position + ARCHIVE_ALIGNMENT - 1) // ARCHIVE_ALIGNMENT * ARCHIVE_ALIGNMENT
+
+
+def grid_phase(interval_seconds, when=None):
+    """
+    Lage des Ansage-Rasters gegenüber der lokalen Mitternacht in Sekunden. Wie im
+    SampleScheduler liegen die Ansagen auf Vielfachen von interval_seconds in
+    Epoch-Sekunden; weicht der UTC-Versatz von 'when' (Standard: jetzt, Ortszeit)
+    davon ab, z.B. +05:45 bei stündlichen Ansagen, ist das Raster ortszeitlich verschoben.
+    """
+    when = when or datetime.datetime.now()
+    local_seconds = when.hour * 3600 + when.minute * 60 + when.second
+    return (local_seconds - int(when.timestamp())) % interval_seconds
+
+
+def slot_time(slot, interval_seconds, phase_seconds=0):
+    """Uhrzeit (als datetime von heute) des Ansage-Slots Nummer 'slot' auf dem um phase_seconds verschobenen Raster."""
+    midnight = datetime.datetime.combine(datetime.date.today(), datetime.time())
+    return midnight + datetime.timedelta(seconds=phase_seconds + slot * interval_seconds)
+
+
+# --- Worker-Prozesse ---
+
+_worker_engine = None
+
+
+def _init_worker(templates, clips, sample_rate, crossfade_seconds):
+    """Baut im Worker-Prozess eine Clip-Engine aus den bereits gerenderten Tokens auf."""
+    global _worker_engine
+    _worker_engine = PhraseClipEngine(_no_render, sample_rate, crossfade_seconds)
+    _worker_engine.templates = templates
+    _worker_engine.clips = clips
+
+
+def _no_render(text, lang_code):
+    return None  # Im Worker wird nicht synthetisiert, alle Tokens kommen vorgerendert
+
+
+def _render_slots(first_slot, last_slot, interval_seconds, phase_seconds, languages):
+    """Rendert die Slots [first_slot, last_slot) für alle Sprachen als float32-Arrays."""
+    results = []
+    for slot in range(first_slot, last_slot):
+        when = slot_time(slot, interval_seconds, phase_seconds)
+        for lang_code in languages:
+            audio_data = _worker_engine.assemble(lang_code, when)
+            if audio_data is None:
+                audio_data = np.zeros(0, dtype=np.float32)
+            results.append(np.asarray(audio_data, dtype='<f4'))
+    return results
+
+
+# --- Archiv erstellen ---
+
+def build_day_archive(path, clip_engine, interval_seconds, params=None, workers=None, phase_seconds=None):
+    """
+    Rendert alle Zeitansagen eines Tages (SECONDS_PER_DAY / interval_seconds Slots, je
+    Sprache der clip_engine) parallel auf mehreren Prozessen in eine Archivdatei.
+    Die Slots liegen auf dem Raster des Schedulers (grid_phase(), sofern
+    phase_seconds nicht angegeben ist).
+
+    Aufbau: Magic, Länge und JSON-Kopf, Index (Slots x Sprachen x [Offset, Länge]
+    in Samples, uint64) und die float32-Daten. 'params' wird im Kopf abgelegt und
+    beim Laden verglichen, damit ein Archiv mit anderen Einstellungen nicht
+    versehentlich abgespielt wird. Die Tokens müssen bereits gerendert sein
+    (clip_engine.warm_up()).
+    """
+    languages = list(clip_engine.templates)
+    if phase_seconds is None:
+        phase_seconds = grid_phase(interval_seconds)
+    slots = (SECONDS_PER_DAY - phase_seconds + interval_seconds - 1) // interval_seconds
+    header = json.dumps({
+        'sample_rate': clip_engine.sample_rate,
+        'interval_seconds': interval_seconds,
+        'phase_seconds': phase_seconds,
+        'languages': languages,
+        'slots': slots,
+        'params': params or {},
+    }, sort_keys=True).encode('utf-8')
+    index_offset = _align(len(ARCHIVE_MAGIC) + 4 + len(header))
+    index = np.zeros((slots, len(languages), 2), dtype='<u8')
+    data_offset = _align(index_offset + index.nbytes)
+
+    from concurrent.futures import ProcessPoolExecutor  # Nur im Batch-Modus, spart Importzeit beim Start
+    temp_path = path + ".tmp"
+    crossfade_seconds = clip_engine.crossfade_samples / clip_engine.sample_rate
+    with open(temp_path, 'wb') as archive_file, ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker,
+            initargs=(clip_engine.templates, dict(clip_engine.clips), clip_engine.sample_rate, crossfade_seconds)) as pool:
+        archive_file.write(ARCHIVE_MAGIC + struct.pack('<I', len(header)) + header)
+        archive_file.seek(data_offset)
+
+        ranges = [(first, min(first + SLOTS_PER_TASK, slots)) for first in range(0, slots, SLOTS_PER_TASK)]
+        futures = [pool.submit(_render_slots, first, last, interval_seconds, phase_seconds, languages)
+                   for first, last in ranges]
+        position = 0  # in Samples ab data_offset
+        reported = 0
+        for (first, last), future in zip(ranges, futures):
+            results = iter(future.result())
+            for slot in range(first, last):
+                for lang_index in range(len(languages)):
+                    audio_data = next(results)
+                    index[slot, lang_index] = (position, len(audio_data))
+                    archive_file.write(memoryview(audio_data).cast('B'))
+                    position += len(audio_data)
+            if last * 10 // slots > reported:  # Fortschritt in 10-%-Schritten
+                reported = last * 10 // slots
+                log(f"INFO: Archiv {last}/{slots} Slots gerendert.")
+
+        archive_file.seek(index_offset)
+        archive_file.write(index.tobytes())
+    os.replace(temp_path, path)
+    log(f"INFO: Tagesarchiv '{path}' erstellt ({os.path.getsize(path) / 1e6:.1f} MB).")
+
+
+# --- Archiv abspielen ---
+
+class AnnouncementArchive:
+    """Liest ein Tagesarchiv per mmap und liefert die Ansage eines Slots ohne Synthese und ohne Kopie."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as archive_file:
+            magic = archive_file.read(len(ARCHIVE_MAGIC))
+            if magic != ARCHIVE_MAGIC:
+                if magic.startswith(ARCHIVE_MAGIC[:-2]):
+                    raise ValueError(f"'{path}' hat ein veraltetes Format, bitte mit --build-archive neu erstellen.")
+                raise ValueError(f"'{path}' ist kein Zeitansage-Archiv.")
+            header_length, = struct.unpack('<I', archive_file.read(4))
+            self.header = json.loads(archive_file.read(header_length).decode('utf-8'))
+        self.sample_rate = self.header['sample_rate']
+        self.interval_seconds = self.header['interval_seconds']
+        self.phase_seconds = self.header.get('phase_seconds', 0)
+        self.languages = self.header['languages']
+        self.params = self.header['params']
+        slots = self.header['slots']
+
+        index_offset = _align(len(ARCHIVE_MAGIC) + 4 + header_length)
+        self.index = np.memmap(path, dtype='<u8', mode='r', offset=index_offset, shape=(slots, len(self.languages), 2))
+        data_offset = _align(index_offset + self.index.nbytes)
+        if os.path.getsize(path) > data_offset:
+            self.data = np.memmap(path, dtype='<f4', mode='r', offset=data_offset)
+        else:
+            self.data = np.zeros(0, dtype='<f4')  # Nur leere Ansagen: mmap einer leeren Region ist nicht möglich
+
+    def matches(self, sample_rate, interval_seconds, params=None):
+        """Prüft, ob das Archiv mit den aktuellen Einstellungen erstellt wurde."""
+        params = json.loads(json.dumps(params or {}))  # Tupel wie im gespeicherten Kopf als Listen vergleichen
+        return (self.sample_rate == sample_rate and self.interval_seconds == interval_seconds
+                and self.params == params)
+
+    def lookup(self, lang_code, when):
+        """
+        Liefert die Ansage für 'when' als schreibgeschützte float32-Sicht in das Archiv,
+        oder None, wenn es keinen passenden Slot gibt (z.B. wenn sich das Raster durch einen
+        anderen UTC-Versatz verschoben hat).
+        """
+        seconds = when.hour * 3600 + when.minute * 60 + when.second - self.phase_seconds
+        if seconds < 0 or seconds % self.interval_seconds or lang_code not in self.languages:
+            return None
+        slot = seconds // self.interval_seconds
+        if slot >= len(self.index):
+            return None
+        offset, length = self.index[slot, self.languages.index(lang_code)]
+        if length == 0:
+            return None
+        return self.data[offset:offset + length]
+
+
+def load_announcement_archive(path, sample_rate, interval_seconds, params=None):
+    """Öffnet ein Tagesarchiv für den Wiedergabemodus; None, wenn es fehlt oder nicht zu den Einstellungen passt."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        archive = AnnouncementArchive(path)
+    except (OSError, ValueError) as e:
+        log(f"WARNUNG: Tagesarchiv '{path}' konnte nicht geladen werden: {e}")
+        return None
+    if not archive.matches(sample_rate, interval_seconds, params):
+        log(f"WARNUNG: Tagesarchiv '{path}' wurde mit anderen Einstellungen erstellt und wird ignoriert. "
+            "Bitte mit --build-archive neu erstellen.")
+        return None
+    log(f"INFO: Wiedergabe aus Tagesarchiv '{path}' ({len(archive.index)} Slots, {', '.join(archive.languages)}).")
+    return archive
@@ -0,0 +1,448 @@
+import io
+import math
+import time
+import wave
+import itertools
+import threading
+import subprocess
+import numpy as np
+
+from zeitansage_log import log
+from zeitansage_metrics import METRICS
+
+# --- Konfiguration ---
+FFMPEG_DECODE_TIMEOUT = 30   # Sekunden, nach denen ein hängender FFmpeg-Dekoder abgebrochen wird
+DECODE_BLOCK_SAMPLES = 4096  # Samples pro Block beim gestreamten Dekodieren (begrenzt den Speicher pro Clip)
+
+# Polyphasen-Resampler (Kaiser-gefensterter Sinc)
+RESAMPLE_ZERO_CROSSINGS = 16  # Nulldurchgänge des Sinc je Seite (Filterlänge)
+RESAMPLE_ROLLOFF = 0.9        # Grenzfrequenz relativ zur Nyquist-Frequenz der niedrigeren Rate
+RESAMPLE_KAISER_BETA = 8.0    # Form des Kaiser-Fensters (ca. 80 dB Sperrdämpfung)
+RESAMPLE_MAX_PHASES = 1024    # Obergrenze der vorberechneten Phasen bei "krummen" Verhältnissen
+RESAMPLE_BLOCK_SAMPLES = 16384  # Ausgabe-Samples pro vektorisiertem Block (begrenzt den Speicherbedarf)
+
+# Nachbearbeitung jedes neu erzeugten Clips (einmalig, das Ergebnis landet im ClipCache)
+CLIP_TARGET_RMS_DB = -20.0      # Einheitlicher Sprachpegel aller Backends (RMS der Sprachanteile in dBFS)
+CLIP_PEAK_LIMIT_DB = -1.0       # Höchster Spitzenpegel nach der Normalisierung (dBFS)
+TRIM_THRESHOLD_DB = -40.0       # Blöcke so weit unter dem lautesten Block gelten als Stille
+TRIM_FLOOR_DB = -60.0           # Absolute Untergrenze der Stille-Schwelle (dBFS)
+TRIM_FRAME_SECONDS = 0.01       # Blocklänge für die Energiemessung
+TRIM_PAD_SECONDS = 0.02         # Rest-Stille, die vor und nach der Sprache stehen bleibt
+
+# Abtastraten von MPEG-Audio (gTTS liefert MPEG-2 Layer III mit 24 kHz) nach Versions-Bits
+MPEG_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),  # MPEG-1
+    2: (22050, 24000, 16000),  # MPEG-2
+    0: (11025, 12000, 8000),   # MPEG-2.5
+}
+
+# PCM-Sample-Breite (Bytes) -> (NumPy-Typ, Nullpunkt, Skalierung auf -1.0 ... 1.0)
+WAV_SAMPLE_FORMATS = {
+    1: (np.uint8, 128.0, 128.0),
+    2: (np.dtype('<i2'), 0.0, 32768.0),
+    4: (np.dtype('<i4'), 0.0, 2147483648.0),
+}
+
+# --- Metriken ---
+DECODE_SECONDS = METRICS.histogram('zeitansage_decode_seconds', "Dauer der Umwandlung eines TTS-Clips in float32", ('method',))
+DECODE_FIRST_BLOCK_SECONDS = METRICS.histogram('zeitansage_decode_first_block_seconds',
+                                               "Zeit bis zum ersten dekodierten float32-Block eines Clips", ('method',))
+
+
+# --- Hilfsfunktionen ---
+
+def db_to_gain(volume_db):
+    """Rechnet eine Lautstärkeänderung in dB in einen linearen Faktor um."""
+    return 10.0 ** (volume_db / 20.0)
+
+
+class PolyphaseResampler:
+    """
+    Resampelt einen float32-Strom blockweise um das rationale Verhältnis
+    target_rate/source_rate (Polyphasen-Filter mit Kaiser-gefenstertem Sinc).
+
+    Die Filterkoeffizienten werden einmal pro Phase vorberechnet; jeder Block wird
+    vollständig vektorisiert gefiltert. Der Zustand (Filtervorlauf und Position)
+    bleibt zwischen process()-Aufrufen erhalten, so dass aufeinanderfolgende
+    Segmente lückenlos und ohne Rundungsdrift ineinander übergehen.
+    """
+
+    def __init__(self, source_rate, target_rate, zero_crossings=RESAMPLE_ZERO_CROSSINGS):
+        divisor = math.gcd(source_rate, target_rate)
+        self.source_rate = source_rate
+        self.target_rate = target_rate
+        self.up = target_rate // divisor
+        self.down = source_rate // divisor
+        self.phases = min(self.up, RESAMPLE_MAX_PHASES)
+
+        # Beim Heruntertakten wird der Tiefpass auf die Zielrate gestaucht (und entsprechend länger)
+        cutoff = min(1.0, target_rate / source_rate) * RESAMPLE_ROLLOFF
+        self.half_width = int(math.ceil(zero_crossings / cutoff))
+        offsets = np.arange(1 - self.half_width, self.half_width + 1)   # Eingabe-Samples relativ zu floor(t)
+        distance = (np.arange(self.phases) / self.phases)[:, None] - offsets[None, :]
+        window = np.i0(RESAMPLE_KAISER_BETA * np.sqrt(np.clip(1.0 - (distance / self.half_width) ** 2, 0.0, None)))
+        weights = cutoff * np.sinc(cutoff * distance) * window
+        weights /= weights.sum(axis=1, keepdims=True)  # Gleichanteil bleibt in jeder Phase erhalten
+        self.weights = weights.astype(np.float32)
+        self.reset()
+
+    def reset(self):
+        """Verwirft Vorlauf und Position, z.B. vor einem unabhängigen Clip."""
+        self._buffer = np.zeros(self.half_width, dtype=np.float32)  # Virtuelle Stille vor Sample 0
+        self._buffer_start = -self.half_width  # Absoluter Index von _buffer[0]
+        self._consumed = 0                     # Bisher übergebene Eingabe-Samples
+        self._next_output = 0                  # Index des nächsten Ausgabe-Samples
+
+    def process(self, samples):
+        """Nimmt weitere Eingabe-Samples auf und gibt alle bereits berechenbaren Ausgabe-Samples zurück."""
+        samples = np.asarray(samples, dtype=np.float32)
+        self._buffer = np.concatenate((self._buffer, samples))
+        self._consumed += len(samples)
+        buffer_end = self._buffer_start + len(self._buffer)
+        # Ausgabe n liegt bei t = n * down / up und braucht Eingaben bis floor(t) + half_width
+        last_output = ((buffer_end - self.half_width) * self.up - 1) // self.down
+        output = self._filter(self._next_output, last_output + 1)
+        self._next_output = max(self._next_output, last_output + 1)
+        keep_from = (self._next_output * self.down) // self.up - self.half_width + 1
+        if keep_from > self._buffer_start:
+            self._buffer = self._buffer[keep_from - self._buffer_start:]
+            self._buffer_start = keep_from
+        return output
+
+    def flush(self):
+        """Gibt die restlichen Ausgabe-Samples bis zum Ende der bisherigen Eingabe zurück und setzt zurück."""
+        total_outputs = (self._consumed * self.up + self.down - 1) // self.down
+        tail = self.process(np.zeros(self.half_width, dtype=np.float32))
+        tail = tail[:max(0, total_outputs - (self._next_output - len(tail)))]
+        self.reset()
+        return tail
+
+    def _filter(self, first, end):
+        if end <= first:
+            return np.zeros(0, dtype=np.float32)
+        taps = np.arange(1 - self.half_width, self.half_width + 1)
+        blocks = []
+        for block_start in range(first, end, RESAMPLE_BLOCK_SAMPLES):
+            positions = np.arange(block_start, min(end, block_start + RESAMPLE_BLOCK_SAMPLES), dtype=np.int64) * self.down
+            base, remainder = np.divmod(positions, self.up)
+            phase = remainder * self.phases // self.up
+            indices = (base - self._buffer_start)[:, None] + taps[None, :]
+            blocks.append(np.einsum('ij,ij->i', self._buffer[indices], self.weights[phase]))
+        return np.concatenate(blocks).astype(np.float32, copy=False)
+
+
+def resample_stream(blocks, source_sample_rate, target_sample_rate):
+    """
+    Resampelt einen Strom von float32-Blöcken, ohne ihn vorher zu sammeln. Jeder
+    Block wird sofort gefiltert und weitergegeben (etwa len(block) * Ratenverhältnis
+    Samples); insgesamt entstehen genau round(n * target_sample_rate / source_sample_rate) Samples.
+    """
+    if source_sample_rate == target_sample_rate:
+        yield from blocks
+        return
+    resampler = PolyphaseResampler(source_sample_rate, target_sample_rate)
+    consumed = produced = 0
+    for block in blocks:
+        consumed += len(block)
+        output = resampler.process(block)
+        produced += len(output)
+        if len(output):
+            yield output
+    target_length = int(round(consumed * target_sample_rate / source_sample_rate))
+    tail = resampler.flush()[:max(0, target_length - produced)]
+    if produced + len(tail) < target_length:
+        tail = np.pad(tail, (0, target_length - produced - len(tail)))
+    if len(tail):
+        yield tail
+
+
+def collect_blocks(blocks, method=None):
+    """Fügt einen Strom von float32-Blöcken zu einem Array zusammen (mit method: Zeit bis zum ersten Block messen)."""
+    start = time.monotonic()
+    parts = []
+    for block in blocks:
+        if not parts and method is not None:
+            DECODE_FIRST_BLOCK_SECONDS.labels(method=method).observe(time.monotonic() - start)
+        parts.append(block)
+    if not parts:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate(parts).astype(np.float32, copy=False)
+
+
+def resample_polyphase(audio_data, source_sample_rate, target_sample_rate):
+    """Resampelt ein float32-Array (z.B. einen Master-Clip) einmalig auf die Zielrate."""
+    if source_sample_rate == target_sample_rate or len(audio_data) == 0:
+        return audio_data
+    return collect_blocks(resample_stream([audio_data], source_sample_rate, target_sample_rate))
+
+
+def probe_sample_rate(audio_bytes):
+    """
+    Liest die Abtastrate aus dem Kopf von WAV- oder MPEG-Audiodaten (MP3 von gTTS),
+    ohne zu dekodieren. Gibt None zurück, wenn das Format nicht erkannt wird.
+    """
+    if audio_bytes[:4] == b'RIFF' and audio_bytes[8:12] == b'WAVE':
+        return int.from_bytes(audio_bytes[24:28], 'little') or None
+    offset = 0
+    if audio_bytes[:3] == b'ID3' and len(audio_bytes) >= 10:
+        # ID3v2-Tag überspringen (Größe als "syncsafe" Integer, optional mit Footer)
+        size = 0
+        for byte in audio_bytes[6:10]:
+            size = (size << 7) | (byte & 0x7F)
+        offset = 10 + size + (10 if audio_bytes[5] & 0x10 else 0)
+    end = min(len(audio_bytes) - 3, offset + 64 * 1024)
+    while offset < end:
+        offset = audio_bytes.find(b'\xff', offset, end)
+        if offset < 0:
+            return None
+        version = (audio_bytes[offset + 1] >> 3) & 0x03
+        layer = (audio_bytes[offset + 1] >> 1) & 0x03
+        bitrate_index = audio_bytes[offset + 2] >> 4
+        rate_index = (audio_bytes[offset + 2] >> 2) & 0x03
+        if (audio_bytes[offset + 1] & 0xE0) == 0xE0 and version in MPEG_SAMPLE_RATES and layer != 0 \
+                and bitrate_index != 0x0F and rate_index != 0x03:
+            return MPEG_SAMPLE_RATES[version][rate_index]
+        offset += 1
+    return None
+
+
+def wav_decode_stream(wav_bytes, target_sample_rate, block_samples=DECODE_BLOCK_SAMPLES):
+    """
+    Dekodiert eine PCM-WAV-Datei aus dem Speicher blockweise zu float32 (mono,
+    target_sample_rate), ganz ohne FFmpeg. Jeder Block wird gleich resampelt und
+    weitergegeben. Mit target_sample_rate=None bleibt die Rate der Datei.
+    """
+    with wave.open(io.BytesIO(wav_bytes), 'rb') as wav_file:
+        channels = wav_file.getnchannels()
+        sample_width = wav_file.getsampwidth()
+        source_sample_rate = wav_file.getframerate()
+        if sample_width not in WAV_SAMPLE_FORMATS:
+            raise ValueError(f"WAV-Sample-Breite von {sample_width} Bytes wird nicht direkt unterstützt.")
+        dtype, offset, scale = WAV_SAMPLE_FORMATS[sample_width]
+
+        def blocks():
+            while True:
+                frames = wav_file.readframes(block_samples)
+                if not frames:
+                    return
+                audio_data = (np.frombuffer(frames, dtype=dtype).astype(np.float32) - offset) / scale
+                if channels > 1:
+                    audio_data = audio_data.reshape(-1, channels).mean(axis=1)
+                yield audio_data.astype(np.float32, copy=False)
+
+        if target_sample_rate is None:
+            yield from blocks()
+        else:
+            yield from resample_stream(blocks(), source_sample_rate, target_sample_rate)
+
+
+def decode_wav_bytes(wav_bytes, target_sample_rate):
+    """
+    Dekodiert eine PCM-WAV-Datei aus dem Speicher zu einem float32-Array
+    (mono, target_sample_rate). Gibt None zurück, wenn das Format nicht
+    unterstützt wird. Mit target_sample_rate=None bleibt die Rate der Datei.
+    """
+    try:
+        return collect_blocks(wav_decode_stream(wav_bytes, target_sample_rate), method='wav')
+    except (wave.Error, EOFError, ValueError) as e:
+        log(f"WARNUNG: WAV-Daten können nicht direkt dekodiert werden: {e}")
+        return None
+
+
+def _feed_pipe(pipe, chunks, errors):
+    """Schreibt alle Byte-Blöcke in die stdin-Pipe von FFmpeg (eigener Thread, damit nichts verklemmt)."""
+    try:
+        for chunk in chunks:
+            pipe.write(chunk)
+            pipe.flush()  # Sofort weiterreichen, auch wenn der nächste Block noch geladen wird
+    except Exception as e:
+        errors.append(e)
+    finally:
+        try:
+            pipe.close()
+        except OSError:
+            pass  # FFmpeg hat bereits beendet
+
+
+def _read_blocks(pipe, block_bytes):
+    """Liest float32-Blöcke fester Größe aus einer Pipe, bis sie geschlossen wird."""
+    while True:
+        data = pipe.read(block_bytes)
+        usable = len(data) // 4 * 4
+        if usable == 0:
+            return
+        yield np.frombuffer(data[:usable], dtype=np.float32)
+
+
+def ffmpeg_decode_stream(audio_source, target_sample_rate, block_samples=DECODE_BLOCK_SAMPLES):
+    """
+    Dekodiert beliebige Audiodaten (z.B. MP3 von gTTS) mit FFmpeg und gibt die
+    float32-Blöcke weiter, sobald FFmpeg sie ausgibt.
+
+    audio_source sind Bytes oder ein Iterator von Byte-Blöcken (z.B. die Teile einer
+    langen gTTS-Ansage, während die restlichen noch geladen werden). Die Daten gehen
+    über stdin hinein und in Blöcken von block_samples über stdout heraus, es werden
+    weder temporäre Dateien noch die komplette Ausgabe im Speicher gehalten. Ist die
+    Quellrate bekannt, dekodiert FFmpeg nur und das Resampling übernimmt resample_stream().
+    """
+    chunks = iter((audio_source,) if isinstance(audio_source, (bytes, bytearray)) else audio_source)
+    first_chunk = next(chunks, b'')
+    if not first_chunk:
+        raise ValueError("keine Audiodaten erhalten")
+    source_sample_rate = probe_sample_rate(first_chunk)
+    ffmpeg_command = [
+        'ffmpeg',
+        '-i', 'pipe:0',              # Eingabe von stdin, Format wird automatisch erkannt
+        '-f', 'f32le',               # Ausgabeformat: 32-bit float, little-endian
+        '-acodec', 'pcm_f32le',      # Audio-Codec: PCM 32-bit float, little-endian
+        '-ac', '1',                  # Audio-Kanäle (mono)
+        '-map_metadata', '-1',       # Keine Metadaten kopieren
+        '-loglevel', 'error',        # Nur Fehler ausgeben
+    ]
+    if source_sample_rate is None:
+        ffmpeg_command.extend(['-ar', str(target_sample_rate)])  # Unbekannte Quellrate: FFmpeg resampelt
+    ffmpeg_command.append('pipe:1')  # Ausgabe an stdout
+
+    process = subprocess.Popen(ffmpeg_command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    feed_errors, stderr_chunks = [], []
+    feeder = threading.Thread(target=_feed_pipe, args=(process.stdin, itertools.chain((first_chunk,), chunks), feed_errors),
+                              name="zeitansage-ffmpeg-feed", daemon=True)
+    stderr_reader = threading.Thread(target=lambda: stderr_chunks.append(process.stderr.read()),
+                                     name="zeitansage-ffmpeg-stderr", daemon=True)
+    watchdog = threading.Timer(FFMPEG_DECODE_TIMEOUT, process.kill)  # Hängender Dekoder: Prozess beenden
+    watchdog.daemon = True
+    feeder.start()
+    stderr_reader.start()
+    watchdog.start()
+    try:
+        blocks = _read_blocks(process.stdout, block_samples * 4)
+        if source_sample_rate is not None:
+            blocks = resample_stream(blocks, source_sample_rate, target_sample_rate)
+        yield from blocks
+        feeder.join()
+        stderr_reader.join()
+        if process.wait() != 0:
+            raise subprocess.CalledProcessError(process.returncode, ffmpeg_command, stderr=b''.join(stderr_chunks))
+        if feed_errors:
+            raise feed_errors[0]
+    finally:
+        watchdog.cancel()
+        if process.poll() is None:
+            process.kill()  # Der Verbraucher hat vorzeitig aufgehört
+        process.wait()
+        stderr_reader.join()
+        process.stdout.close()
+        process.stderr.close()
+
+
+def ffmpeg_decode_bytes(audio_source, target_sample_rate):
+    """
+    Dekodiert Audiodaten (Bytes oder Iterator von Byte-Blöcken) mit FFmpeg zu einem
+    float32-Array; siehe ffmpeg_decode_stream(). Gibt bei einem Fehler None zurück.
+    """
+    try:
+        return collect_blocks(ffmpeg_decode_stream(audio_source, target_sample_rate), method='ffmpeg')
+    except subprocess.CalledProcessError as e:
+        log("FEHLER: FFmpeg-Prozess fehlgeschlagen bei Konvertierung aus dem Speicher.")
+        log(f"FFmpeg stderr: {e.stderr.decode(errors='replace')}")
+        return None
+    except Exception as e:
+        log(f"Ein unerwarteter Fehler ist aufgetreten während der FFmpeg-Konvertierung: {e}")
+        return None
+
+
+def decode_audio_bytes(audio_bytes, target_sample_rate):
+    """
+    Wandelt Audiodaten aus dem Speicher in ein float32-Array (mono, target_sample_rate).
+    PCM-WAV wird direkt mit NumPy dekodiert und resampelt, alle anderen Formate
+    (MP3, AIFF, ...) über eine FFmpeg-Pipe.
+    """
+    if not audio_bytes:
+        return None
+    if audio_bytes[:4] == b'RIFF' and audio_bytes[8:12] == b'WAVE':
+        with DECODE_SECONDS.labels(method='wav').time():
+            audio_data = decode_wav_bytes(audio_bytes, target_sample_rate)
+        if audio_data is not None:
+            return audio_data
+    with DECODE_SECONDS.labels(method='ffmpeg').time():
+        return ffmpeg_decode_bytes(audio_bytes, target_sample_rate)
+
+
+# --- Nachbearbeitung ---
+
+def frame_rms(audio_data, frame_samples):
+    """RMS je Block von frame_samples Samples (der letzte Block wird mit Stille aufgefüllt)."""
+    num_frames = -(-len(audio_data) // frame_samples)
+    frames = np.zeros(num_frames * frame_samples, dtype=np.float32)
+    frames[:len(audio_data)] = audio_data
+    return np.sqrt(np.mean(np.square(frames.reshape(num_frames, frame_samples), dtype=np.float32), axis=1))
+
+
+def trim_silence(audio_data, sample_rate, threshold_db=TRIM_THRESHOLD_DB, pad_seconds=TRIM_PAD_SECONDS,
+                 frame_seconds=TRIM_FRAME_SECONDS):
+    """
+    Schneidet Stille am Anfang und Ende ab. Als Stille gelten Blöcke, deren Energie
+    mehr als threshold_db unter dem lautesten Block liegt (mindestens TRIM_FLOOR_DB);
+    pad_seconds bleiben auf jeder Seite stehen.
+    """
+    frame_samples = max(1, int(frame_seconds * sample_rate))
+    if len(audio_data) == 0:
+        return audio_data
+    rms = frame_rms(audio_data, frame_samples)
+    threshold = max(rms.max() * db_to_gain(threshold_db), db_to_gain(TRIM_FLOOR_DB))
+    active = np.flatnonzero(rms > threshold)
+    if len(active) == 0:
+        return audio_data[:0]
+    pad = int(pad_seconds * sample_rate)
+    start = max(0, active[0] * frame_samples - pad)
+    end = min(len(audio_data), (active[-1] + 1) * frame_samples + pad)
+    return audio_data[start:end]
+
+
+def normalize_loudness(audio_data, sample_rate, target_rms_db=CLIP_TARGET_RMS_DB, peak_limit_db=CLIP_PEAK_LIMIT_DB,
+                       frame_seconds=TRIM_FRAME_SECONDS):
+    """
+    Bringt einen Clip auf target_rms_db, gemessen nur über die Sprachanteile (Pausen
+    zählen nicht mit). Die Verstärkung wird so begrenzt, dass die Spitze
+    peak_limit_db nicht überschreitet.
+    """
+    if len(audio_data) == 0:
+        return audio_data
+    frame_samples = max(1, int(frame_seconds * sample_rate))
+    rms = frame_rms(audio_data, frame_samples)
+    active = rms[rms > max(rms.max() * db_to_gain(TRIM_THRESHOLD_DB), db_to_gain(TRIM_FLOOR_DB))]
+    peak = float(np.abs(audio_data).max())
+    if len(active) == 0 or peak == 0.0:
+        return audio_data
+    speech_rms = float(np.sqrt(np.mean(np.square(active))))
+    gain = min(db_to_gain(target_rms_db) / speech_rms, db_to_gain(peak_limit_db) / peak)
+    return (audio_data * np.float32(gain)).astype(np.float32)
+
+
+class ClipProcessor:
+    """
+    Einheitliche Nachbearbeitung neu erzeugter TTS-Clips: Stille an den Rändern
+    abschneiden, auf einen gemeinsamen Pegel normalisieren und die Anpassung der
+    Sprache (gains_db, lang_code -> dB) aufschlagen. Läuft einmal pro Clip; die
+    Parameter gehen über cache_params() in den ClipCache-Schlüssel ein.
+    """
+
+    def __init__(self, sample_rate, target_rms_db=CLIP_TARGET_RMS_DB, peak_limit_db=CLIP_PEAK_LIMIT_DB,
+                 trim_threshold_db=TRIM_THRESHOLD_DB, trim_pad_seconds=TRIM_PAD_SECONDS, gains_db=None):
+        self.sample_rate = sample_rate
+        self.target_rms_db = target_rms_db
+        self.peak_limit_db = peak_limit_db
+        self.trim_threshold_db = trim_threshold_db
+        self.trim_pad_seconds = trim_pad_seconds
+        self.gains_db = gains_db or {}
+
+    def cache_params(self, lang_code):
+        return dict(target_rms_db=self.target_rms_db, peak_limit_db=self.peak_limit_db,
+                    trim_threshold_db=self.trim_threshold_db, trim_pad_seconds=self.trim_pad_seconds,
+                    gain_db=self.gains_db.get(lang_code, 0.0))
+
+    def process(self, audio_data, lang_code):
+        audio_data = trim_silence(np.asarray(audio_data, dtype=np.float32), self.sample_rate,
+                                  self.trim_threshold_db, self.trim_pad_seconds)
+        return normalize_loudness(audio_data, self.sample_rate, self.target_rms_db + self.gains_db.get(lang_code, 0.0),
+                                  self.peak_limit_db)
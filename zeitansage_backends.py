@@ -0,0 +1,396 @@
+import time
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from zeitansage_audio import CLIP_TARGET_RMS_DB, ClipProcessor, decode_audio_bytes, ffmpeg_decode_bytes
+from zeitansage_gtts import GttsClient
+from zeitansage_log import log
+from zeitansage_metrics import METRICS
+from zeitansage_tts import Pyttsx3EngineManager
+
+# --- Konfiguration ---
+DEFAULT_LATENCY_BUDGET_SECONDS = 5.0  # Zeit, die ein Backend pro Anfrage höchstens bekommt
+TTS_WORKERS = 8                       # Threads für Synthese-Anfragen (auch abgelaufene laufen dort zu Ende)
+ESPEAK_COMMANDS = ('espeak-ng', 'espeak')
+ESPEAK_TIMEOUT = 10
+
+# --- Metriken ---
+TTS_SECONDS = METRICS.histogram('zeitansage_tts_seconds', "Dauer einer Synthese inklusive Dekodierung", ('backend',))
+TTS_FAILURES = METRICS.counter('zeitansage_tts_failures_total', "Fehlgeschlagene Synthesen", ('backend',))
+TTS_TIMEOUTS = METRICS.counter('zeitansage_tts_timeouts_total', "Zeitbudget oder Zyklus-Deadline überschritten", ('backend',))
+TTS_UNAVAILABLE = METRICS.counter('zeitansage_tts_unavailable_total', "Texte, die kein Backend rechtzeitig liefern konnte")
+
+
+# --- Hilfsfunktionen ---
+
+def clip_cache_key(clip_cache, backend, text, lang_code, processor=None):
+    """ClipCache-Schlüssel eines Backend-Clips, inklusive der Parameter der Nachbearbeitung."""
+    key_params = backend.cache_params(text, lang_code)
+    if processor is not None:
+        key_params.update(processor.cache_params(lang_code))
+    return clip_cache.key(**key_params)
+
+
+# --- TTS-Backends ---
+
+class TtsBackend:
+    """
+    Basisklasse eines TTS-Backends. synthesize(text, lang_code, deadline) gibt ein
+    float32-Array (mono, sample_rate) oder None zurück; deadline (time.time() oder
+    None) ist der Zeitpunkt, bis zu dem die Engine höchstens wartet. cache_params() beschreibt alle klangrelevanten
+    Parameter für den ClipCache-Schlüssel; Backends mit cacheable = False werden nicht
+    im Cache abgelegt. Backends mit inline = True sind so schnell, dass sie ohne
+    Zeitbudget direkt im aufrufenden Thread laufen. Die Ausgabe wird anschließend
+    vom ClipProcessor der Engine nachbearbeitet, außer bei postprocess = False.
+    Backends mit serial = True können nur eine Synthese zur Zeit ausführen und
+    bekommen in der Engine einen eigenen Thread mit Warteschlange.
+    """
+
+    name = "?"
+    cacheable = True
+    inline = False
+    postprocess = True
+    serial = False
+
+    def __init__(self, sample_rate, latency_budget=DEFAULT_LATENCY_BUDGET_SECONDS):
+        self.sample_rate = sample_rate
+        self.latency_budget = latency_budget
+        self.requests = 0        # Abgeschlossene Synthesen (auch nach Ablauf des Budgets)
+        self.failures = 0
+        self.timeouts = 0        # Budget oder Zyklus-Deadline überschritten
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self._stats_lock = threading.Lock()
+
+    def cache_params(self, text, lang_code):
+        raise NotImplementedError
+
+    def synthesize(self, text, lang_code, deadline=None):
+        raise NotImplementedError
+
+    def warm_up(self):
+        """Lädt Bibliotheken und Engines vorab, damit die erste Synthese nicht darauf wartet."""
+
+    def record(self, seconds, success):
+        """Vermerkt die Dauer einer Synthese."""
+        with self._stats_lock:
+            self.requests += 1
+            self.failures += 0 if success else 1
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+        TTS_SECONDS.labels(backend=self.name).observe(seconds)
+        if not success:
+            TTS_FAILURES.labels(backend=self.name).inc()
+
+    def record_timeout(self):
+        """Vermerkt eine Überschreitung des Zeitbudgets oder der Deadline."""
+        with self._stats_lock:
+            self.timeouts += 1
+        TTS_TIMEOUTS.labels(backend=self.name).inc()
+
+    def stats(self):
+        """Zusammenfassung der gemessenen Latenzen."""
+        with self._stats_lock:
+            average = self.total_seconds / self.requests if self.requests else 0.0
+            return {'requests': self.requests, 'failures': self.failures, 'timeouts': self.timeouts,
+                    'average_seconds': average, 'max_seconds': self.max_seconds}
+
+
+class Pyttsx3Backend(TtsBackend):
+    """Lokale Synthese mit pyttsx3 (eine langlebige Engine pro Prozess)."""
+
+    name = "pyttsx3"
+    serial = True  # Eine Engine pro Prozess, die Synthesen laufen nacheinander
+
+    def __init__(self, sample_rate, volume, speech_rates, latency_budget=DEFAULT_LATENCY_BUDGET_SECONDS):
+        super().__init__(sample_rate, latency_budget)
+        self.volume = volume
+        self.speech_rates = speech_rates  # lang_code -> Wörter pro Minute
+        self.engine = Pyttsx3EngineManager()
+
+    def cache_params(self, text, lang_code):
+        return dict(text=text, lang=lang_code, backend='pyttsx3', speech_rate=self.speech_rates.get(lang_code),
+                    volume=self.volume, sample_rate=self.sample_rate)
+
+    def warm_up(self):
+        self.engine.warm_up()
+
+    def synthesize(self, text, lang_code, deadline=None):
+        wav_bytes = self.engine.synthesize_wav_bytes(text, self.volume, self.speech_rates.get(lang_code),
+                                                     lang_code_prefix=lang_code)
+        if wav_bytes is None:
+            return None
+        # WAV wird direkt im Prozess dekodiert und resampelt, ohne FFmpeg-Aufruf pro Clip
+        return decode_audio_bytes(wav_bytes, self.sample_rate)
+
+
+class GttsBackend(TtsBackend):
+    """
+    Online-Synthese über den GttsClient (Keep-Alive, Ratenlimit, Wiederholungen bis
+    zur Deadline); das MP3 wird noch während des Ladens über eine FFmpeg-Pipe dekodiert.
+    """
+
+    name = "gtts"
+
+    def __init__(self, sample_rate, slow=False, latency_budget=DEFAULT_LATENCY_BUDGET_SECONDS, client=None):
+        super().__init__(sample_rate, latency_budget)
+        self.slow = slow
+        self.client = client or GttsClient()
+
+    def cache_params(self, text, lang_code):
+        return dict(text=text, lang=lang_code, backend='gtts', slow=self.slow, sample_rate=self.sample_rate)
+
+    def warm_up(self):
+        self.client.warm_up()
+
+    def synthesize(self, text, lang_code, deadline=None):
+        return ffmpeg_decode_bytes(self.client.stream(text, lang_code, self.slow, deadline), self.sample_rate)
+
+
+class EspeakBackend(TtsBackend):
+    """Lokale Rückfallebene über espeak-ng/espeak (WAV auf stdout, ohne temporäre Datei)."""
+
+    name = "espeak"
+
+    def __init__(self, sample_rate, volume=1.0, speech_rates=None, latency_budget=DEFAULT_LATENCY_BUDGET_SECONDS):
+        super().__init__(sample_rate, latency_budget)
+        self.volume = volume
+        self.speech_rates = speech_rates or {}
+        self.command = next((command for command in ESPEAK_COMMANDS if shutil.which(command)), None)
+        if self.command is None:
+            log("WARNUNG: espeak-ng/espeak nicht gefunden, das espeak-Backend steht nicht zur Verfügung.")
+
+    def cache_params(self, text, lang_code):
+        return dict(text=text, lang=lang_code, backend='espeak', speech_rate=self.speech_rates.get(lang_code),
+                    volume=self.volume, sample_rate=self.sample_rate)
+
+    def synthesize(self, text, lang_code, deadline=None):
+        if self.command is None:
+            return None
+        args = [self.command, '--stdout', '-v', lang_code, '-a', str(int(self.volume * 100))]
+        if self.speech_rates.get(lang_code):
+            args += ['-s', str(self.speech_rates[lang_code])]
+        try:
+            result = subprocess.run(args + [text], capture_output=True, check=True, timeout=ESPEAK_TIMEOUT)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError) as e:
+            log(f"FEHLER: {self.command} konnte '{text[:50]}' nicht synthetisieren: {e}")
+            return None
+        return decode_audio_bytes(result.stdout, self.sample_rate)
+
+
+class CachedClipsBackend(TtsBackend):
+    """
+    Letzte Rückfallebene ohne jede Synthese: liefert einen Clip, den eines der
+    übergebenen Backends früher schon (nachbearbeitet) in den ClipCache gelegt hat.
+    """
+
+    name = "cache"
+    cacheable = False
+    inline = True
+    postprocess = False
+
+    def __init__(self, clip_cache, backends, processor=None):
+        super().__init__(backends[0].sample_rate if backends else None, latency_budget=0.0)
+        self.clip_cache = clip_cache
+        self.backends = [backend for backend in backends if backend.cacheable]
+        self.processor = processor
+
+    def synthesize(self, text, lang_code, deadline=None):
+        for backend in self.backends:
+            audio_data = self.clip_cache.get(clip_cache_key(self.clip_cache, backend, text, lang_code, self.processor))
+            if audio_data is not None:
+                return audio_data
+        return None
+
+
+# --- TTS-Engine mit Rückfallebenen ---
+
+class FallbackTtsEngine:
+    """
+    Gemeinsame TTS-Schicht für beide Skripte: fragt die Backends der Reihe nach
+    (zuerst deren Clip im ClipCache, dann die Synthese) und weicht auf das
+    nächste aus, sobald eines fehlschlägt, sein Zeitbudget oder die Deadline des
+    laufenden Zyklus überschreitet. Ein hängender gTTS-Abruf verzögert die Ansage
+    so nie über den Ton hinaus.
+
+    Abgelaufene Synthesen laufen im Hintergrund zu Ende; ihr Ergebnis landet im
+    ClipCache und wird an on_late_result(text, lang_code, clip) gemeldet, damit
+    ein vorübergehend verwendeter Ersatz-Clip ausgetauscht werden kann.
+
+    Jeder neu synthetisierte Clip läuft genau einmal durch den ClipProcessor
+    (Stille abschneiden, Pegel normalisieren); im Cache liegt das Ergebnis.
+    """
+
+    def __init__(self, backends, clip_cache=None, max_workers=TTS_WORKERS, processor=None):
+        self.backends = list(backends)
+        self.clip_cache = clip_cache
+        self.processor = processor
+        self.cycle_deadline = None  # Wanduhrzeit, bis zu der die Clips des laufenden Zyklus fertig sein müssen
+        self.on_late_result = None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="zeitansage-tts")
+        # Serielle Backends stehen in ihrer eigenen Warteschlange an, statt Threads des gemeinsamen Pools zu blockieren
+        self._serial_executors = {
+            backend: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"zeitansage-tts-{backend.name}")
+            for backend in self.backends if backend.serial}
+        # Die Clips vorangehender Backends sucht render() bereits selbst im ClipCache; ein Cache-Backend auf
+        # demselben Cache prüft nur noch die übrigen, statt jeden Fehlversuch ein zweites Mal zu suchen
+        for position, backend in enumerate(self.backends):
+            if (isinstance(backend, CachedClipsBackend) and clip_cache is not None
+                    and backend.clip_cache is clip_cache and backend.processor is processor):
+                backend.backends = [earlier for earlier in backend.backends if earlier not in self.backends[:position]]
+
+    def begin_cycle(self, deadline):
+        """Setzt die Deadline (time.time()) für alle Anfragen des nächsten Zyklus."""
+        self.cycle_deadline = deadline
+
+    def _cache_key(self, backend, text, lang_code):
+        if self.clip_cache is None or not backend.cacheable:
+            return None
+        return clip_cache_key(self.clip_cache, backend, text, lang_code, self.processor)
+
+    def _synthesize(self, backend, text, lang_code, deadline=None, started=None):
+        """
+        Synthetisiert mit einem Backend und legt den Clip im Cache ab. Auf dem Pool
+        wird 'started' gesetzt, sobald der Aufruf tatsächlich beginnt; erst ab dann
+        läuft das Zeitbudget des Backends (die Wartezeit in der Warteschlange zählt nur
+        zur Deadline des Zyklus).
+        """
+        if started is not None:
+            started.set()
+            budget_deadline = time.time() + backend.latency_budget
+            deadline = budget_deadline if deadline is None else min(deadline, budget_deadline)
+        start = time.monotonic()
+        try:
+            audio_data = backend.synthesize(text, lang_code, deadline)
+            if audio_data is not None and self.processor is not None and backend.postprocess:
+                audio_data = self.processor.process(audio_data, lang_code)
+        except Exception as e:
+            log(f"FEHLER: TTS-Backend '{backend.name}' fehlgeschlagen: {e}")
+            audio_data = None
+        backend.record(time.monotonic() - start, audio_data is not None)
+        key = self._cache_key(backend, text, lang_code)
+        if audio_data is not None and key is not None:
+            self.clip_cache.put(key, audio_data)
+        return audio_data
+
+    def _late_result(self, text, lang_code, future):
+        audio_data = future.result()
+        if audio_data is not None and self.on_late_result is not None:
+            self.on_late_result(text, lang_code, audio_data)
+
+    def _render_pooled(self, backend, text, lang_code, deadline):
+        """
+        Fragt ein Backend über den Pool (bzw. seine serielle Warteschlange) an und wartet
+        höchstens bis zu seinem Zeitbudget und der Deadline. None bei Fehler oder Zeitüberschreitung;
+        ein verspätetes Ergebnis geht an on_late_result.
+        """
+        if deadline is not None and deadline <= time.time():
+            backend.record_timeout()
+            return None
+        started = threading.Event()
+        executor = self._serial_executors.get(backend, self._executor)
+        future = executor.submit(self._synthesize, backend, text, lang_code, deadline, started)
+        # Solange die Anfrage ansteht (z.B. hinter der seriellen pyttsx3-Engine), gilt nur die Deadline des Zyklus
+        if not started.wait(None if deadline is None else max(0.0, deadline - time.time())) and future.cancel():
+            backend.record_timeout()
+            log(f"WARNUNG: TTS-Backend '{backend.name}' kam für '{text[:50]}' vor der Deadline nicht an die Reihe, "
+                f"weiche auf das nächste Backend aus.")
+            return None
+        timeout = backend.latency_budget
+        if deadline is not None:
+            timeout = max(0.0, min(timeout, deadline - time.time()))
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            backend.record_timeout()
+            log(f"WARNUNG: TTS-Backend '{backend.name}' hat '{text[:50]}' nicht innerhalb von "
+                f"{timeout:.2f} Sekunden geliefert, weiche auf das nächste Backend aus.")
+            future.add_done_callback(lambda f: self._late_result(text, lang_code, f))
+            return None
+
+    def render(self, text, lang_code, deadline=None):
+        """
+        Liefert den Clip für 'text' vom ersten Backend, das rechtzeitig antwortet
+        (oder None). 'deadline' (time.time()) begrenzt die Gesamtwartezeit zusätzlich
+        zu den Zeitbudgets der einzelnen Backends.
+        """
+        for backend in self.backends:
+            key = self._cache_key(backend, text, lang_code)
+            if key is not None:
+                audio_data = self.clip_cache.get(key)
+                if audio_data is not None:
+                    return audio_data
+
+            if backend.inline:
+                audio_data = self._synthesize(backend, text, lang_code)
+                if audio_data is not None:
+                    return audio_data
+                continue
+
+            audio_data = self._render_pooled(backend, text, lang_code, deadline)
+            if audio_data is not None:
+                return audio_data
+
+        TTS_UNAVAILABLE.inc()
+        log(f"FEHLER: Kein TTS-Backend konnte '{text[:50]}' für '{lang_code}' rechtzeitig liefern.")
+        return None
+
+    def warm_up(self):
+        """
+        Initialisiert alle Backends vorab (z.B. beim Start im Hintergrund);
+        Fehler zeigen sich sonst bei der ersten Synthese. Serielle Backends werden
+        in ihrem Synthese-Thread initialisiert, da z.B. die espeak- und sapi5-Treiber
+        von pyttsx3 an den Thread gebunden sind, der die Engine erzeugt hat.
+        """
+        for backend in self.backends:
+            try:
+                if backend in self._serial_executors:
+                    self._serial_executors[backend].submit(backend.warm_up).result()
+                else:
+                    backend.warm_up()
+            except Exception as e:
+                log(f"WARNUNG: TTS-Backend '{backend.name}' konnte nicht vorab initialisiert werden: {e}")
+
+    def render_for_cycle(self, text, lang_code):
+        """Wie render(), mit der Deadline des laufenden Zyklus (render_func für die PhraseClipEngine)."""
+        return self.render(text, lang_code, self.cycle_deadline)
+
+    def report(self):
+        """Gibt die Latenzstatistik aller Backends aus."""
+        for backend in self.backends:
+            stats = backend.stats()
+            log(f"INFO: TTS-Backend '{backend.name}': {stats['requests']} Synthesen, {stats['failures']} Fehler, "
+                f"{stats['timeouts']} Zeitüberschreitungen, im Mittel {stats['average_seconds']:.2f} s "
+                f"(max. {stats['max_seconds']:.2f} s).")
+
+
+def create_tts_engine(backend_names, sample_rate, clip_cache=None, latency_budgets=None,
+                      volume=1.0, speech_rates=None, gains_db=None, target_rms_db=CLIP_TARGET_RMS_DB, gtts_client=None):
+    """
+    Baut die FallbackTtsEngine aus einer Liste von Backend-Namen in Rückfall-Reihenfolge
+    ('pyttsx3', 'gtts', 'espeak', 'cache'); latency_budgets ordnet Namen ein Zeitbudget zu.
+    Alle Clips werden auf target_rms_db normalisiert, gains_db (lang_code -> dB) wird
+    darauf aufgeschlagen; volume der lokalen Engines wirkt daher nur vor der
+    Normalisierung und bleibt am besten bei 1.0. gtts_client ersetzt den GttsClient mit Standardeinstellungen.
+    """
+    latency_budgets = latency_budgets or {}
+    processor = ClipProcessor(sample_rate, target_rms_db=target_rms_db, gains_db=gains_db)
+    backends = []
+    for name in backend_names:
+        budget = latency_budgets.get(name, DEFAULT_LATENCY_BUDGET_SECONDS)
+        if name == 'pyttsx3':
+            backends.append(Pyttsx3Backend(sample_rate, volume, speech_rates or {}, latency_budget=budget))
+        elif name == 'gtts':
+            backends.append(GttsBackend(sample_rate, latency_budget=budget, client=gtts_client))
+        elif name == 'espeak':
+            backends.append(EspeakBackend(sample_rate, volume, speech_rates, latency_budget=budget))
+        elif name == 'cache':
+            if clip_cache is None:
+                log("WARNUNG: Das Backend 'cache' benötigt einen ClipCache und wird übersprungen.")
+                continue
+            backends.append(CachedClipsBackend(clip_cache, backends, processor))
+        else:
+            raise ValueError(f"Unbekanntes TTS-Backend: {name}")
+    return FallbackTtsEngine(backends, clip_cache, processor=processor)
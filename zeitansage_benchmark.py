@@ -0,0 +1,401 @@
+import os
+import gc
+import sys
+import json
+import time
+import argparse
+import functools
+import platform
+import importlib
+import tempfile
+import threading
+import subprocess
+import tracemalloc
+import numpy as np
+
+import zeitansage_runtime
+from zeitansage_audio import CLIP_TARGET_RMS_DB, ClipProcessor
+from zeitansage_backends import GttsBackend, FallbackTtsEngine
+from zeitansage_clips import PhraseClipEngine
+from zeitansage_fakes import FAKE_TTS_BUDGET_SECONDS, FAKE_TTS_LATENCY_SECONDS, FakeTtsBackend, install_fake_ffmpeg, \
+    start_fake_gtts_server, start_fake_weather_server
+from zeitansage_gtts import GTTS_BURST, GTTS_MAX_RETRIES, GTTS_REQUESTS_PER_SECOND, GttsClient
+from zeitansage_log import flush
+from zeitansage_output import PcmStreamWriter
+from zeitansage_pipeline import LookAheadRenderer
+from zeitansage_ringbuffer import FifoSink
+from zeitansage_scheduler import SampleScheduler
+from zeitansage_startup import READY
+
+# --- Konfiguration ---
+BENCHMARK_SCRIPTS = ['zeitansage', 'zeitansage2']
+BENCHMARK_SAMPLE_RATES = [10000, 20000]
+BENCHMARK_CYCLES = 3
+BENCHMARK_STARTUP_TIMEOUT = 60   # Sekunden bis Bereitschaft und FIFO, danach gilt der Lauf als fehlgeschlagen
+READ_CHUNK_BYTES = 64 * 1024
+PACED_READ_LEAD_SECONDS = 0.05
+PACED_READ_CHUNK_SECONDS = 0.01  # Im Echtzeitmodus kleine Lesevorgänge wie eine Soundkarte
+SILENCE_THRESHOLD = 1e-6
+RUN_MERGE_SECONDS = 0.01          # Lücken kürzer als das gehören noch zum selben Sprachsegment
+
+
+# --- Messung ---
+
+class StageTimer:
+    """
+    Sammelt die Dauer einzelner Verarbeitungsstufen (threadsicher durch list.append).
+    Stufen derselben Gruppe werden nicht doppelt gezählt, wenn sie sich gegenseitig
+    aufrufen (z.B. write_samples -> write_segments).
+    """
+
+    def __init__(self):
+        self.samples = {}
+        self._active = threading.local()
+
+    def wrap(self, stage, func, group=None):
+        durations = self.samples.setdefault(stage, [])
+
+        def timed(*args, **kwargs):
+            if group is not None and getattr(self._active, group, False):
+                return func(*args, **kwargs)
+            if group is not None:
+                setattr(self._active, group, True)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                durations.append(time.perf_counter() - start)
+                if group is not None:
+                    setattr(self._active, group, False)
+        return timed
+
+    def patch(self, owner, attribute, stage, group=None):
+        setattr(owner, attribute, self.wrap(stage, getattr(owner, attribute), group))
+
+    def summary(self):
+        return {stage: summarize_ms(durations) for stage, durations in self.samples.items() if durations}
+
+
+def summarize_ms(durations):
+    """Anzahl, Mittelwert, Median, p95 und Maximum in Millisekunden."""
+    values = np.asarray(durations, dtype=np.float64) * 1000.0
+    return {'count': int(len(values)), 'mean_ms': float(values.mean()), 'p50_ms': float(np.percentile(values, 50)),
+            'p95_ms': float(np.percentile(values, 95)), 'max_ms': float(values.max())}
+
+
+def find_runs(audio_data, sample_rate):
+    """Liefert (Start, Ende) aller nicht-stillen Abschnitte; sehr kurze Lücken werden überbrückt."""
+    active = np.abs(audio_data) > SILENCE_THRESHOLD
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], active, [False])).astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+    if len(starts) == 0:
+        return []
+    merge_gap = int(RUN_MERGE_SECONDS * sample_rate)
+    keep = np.concatenate(([True], starts[1:] - ends[:-1] > merge_gap))
+    return list(zip(starts[keep], np.concatenate((ends[:-1][keep[1:]], [ends[-1]]))))
+
+
+def analyze_stream(audio_data, sample_rate, beep_seconds, beep_volume, countdown_beats):
+    """
+    Sucht im aufgezeichneten Stream die Countdowns (countdown_beats Beeps) und die
+    jeweils folgende Ansage. Gibt eine Liste von (letztes Beep-Ende, Ansagebeginn)
+    in Samples zurück.
+    """
+    runs = find_runs(audio_data, sample_rate)
+    beep_samples = int(beep_seconds * sample_rate)
+    cycles = []
+    beeps_in_row = 0
+    last_beep_end = None
+    for start, end in runs:
+        peak = float(np.abs(audio_data[start:end]).max())
+        if abs((end - start) - beep_samples) <= 0.05 * beep_samples and abs(peak - beep_volume) <= 0.1 * beep_volume:
+            beeps_in_row += 1
+            last_beep_end = end
+            continue
+        if beeps_in_row >= countdown_beats:
+            cycles.append((int(last_beep_end), int(start)))
+        beeps_in_row = 0
+    return cycles
+
+
+def allocation_summary(allocations_start, announcements):
+    """Speicher- und GC-Bilanz pro Zyklus seit allocations_start (Snapshot, GC-Zähler, bis dahin gesendete Ansagen)."""
+    snapshot, collections, cycles_before = allocations_start
+    steady_cycles = max(1, announcements - cycles_before)
+    differences = tracemalloc.take_snapshot().compare_to(snapshot, 'filename')
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    return {
+        'cycles': steady_cycles,
+        'net_blocks_per_cycle': sum(d.count_diff for d in differences) / steady_cycles,
+        'net_bytes_per_cycle': sum(d.size_diff for d in differences) / steady_cycles,
+        'gc_gen0_collections_per_cycle': (gc.get_stats()[0]['collections'] - collections) / steady_cycles,
+        'peak_traced_bytes': peak_bytes,
+    }
+
+
+# --- Einzelner Lauf (Kindprozess) ---
+
+def wait_until(condition, main_thread, deadline, what):
+    """Wartet, bis condition() wahr ist. RuntimeError, wenn main_thread vorher endet oder deadline (monotonic) verstreicht."""
+    while not condition():
+        if not main_thread.is_alive():
+            raise RuntimeError(f"main() hat sich beendet, bevor {what}")
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Zeitüberschreitung, noch nicht {what}")
+        time.sleep(0.01)
+
+
+def read_stream(fd, target_bytes, read_chunk_bytes, paced_sample_rate=None, on_read=None):
+    """
+    Zeitstempel-Reader: liest bis zu target_bytes float32-Samples aus fd und merkt sich zu jedem
+    Lesevorgang Wanduhrzeit und Byte-Position. Mit paced_sample_rate wird im Echtzeit-Takt gelesen.
+    on_read(Bytes bisher) wird nach jedem Lesevorgang aufgerufen.
+    Gibt (Daten, Lesezeiten, Byte-Positionen, Lesedauer in Sekunden) zurück.
+    """
+    data = bytearray()
+    read_times, read_offsets = [], []
+    read_start = None
+    while len(data) < target_bytes:
+        chunk = os.read(fd, read_chunk_bytes)
+        if not chunk:
+            break
+        now = time.perf_counter()
+        if read_start is None:
+            read_start = now
+        data += chunk
+        read_times.append(now)
+        read_offsets.append(len(data))
+        if on_read is not None:
+            on_read(len(data))
+        if paced_sample_rate:
+            due = read_start + len(data) / 4 / paced_sample_rate - PACED_READ_LEAD_SECONDS
+            time.sleep(max(0.0, due - time.perf_counter()))
+    return data, read_times, read_offsets, time.perf_counter() - read_start
+
+
+def tts_backend_factory(script, tts_latency, use_ffmpeg, gtts_mock, gtts_mock_errors):
+    """
+    Liefert (create_backend(sample_rate), gtts_stats): Fake-TTS oder, mit gtts_mock, das echte
+    gTTS-Backend gegen einen lokalen Mock-Server (gtts_stats zählt dessen Anfragen, sonst None).
+    """
+    if not gtts_mock:
+        def create_fake_backend(sample_rate):
+            return FakeTtsBackend(sample_rate, tts_latency, use_ffmpeg)
+        return create_fake_backend, None
+
+    gtts_server = start_fake_gtts_server(tts_latency, gtts_mock_errors)
+    gtts_client = GttsClient(gtts_server.url, getattr(script, 'GTTS_REQUESTS_PER_SECOND', GTTS_REQUESTS_PER_SECOND),
+                             getattr(script, 'GTTS_BURST', GTTS_BURST), getattr(script, 'GTTS_MAX_RETRIES', GTTS_MAX_RETRIES))
+
+    def create_gtts_backend(sample_rate):
+        return GttsBackend(sample_rate, latency_budget=FAKE_TTS_BUDGET_SECONDS, client=gtts_client)
+    return create_gtts_backend, gtts_server.stats
+
+
+def prepare_script(script_name, work_dir, sample_rate, fake_ffmpeg):
+    """
+    Importiert das Skript und leitet FIFO, Cache und Wetter in work_dir bzw. auf lokale Ersatzdienste um.
+    Ohne installiertes ffmpeg (oder mit fake_ffmpeg) kommt das Ersatzskript in den PATH.
+    Gibt (Skriptmodul, 'real' oder 'fake') zurück.
+    """
+    ffmpeg_kind = 'real'
+    if fake_ffmpeg or subprocess.run(['sh', '-c', 'command -v ffmpeg'], capture_output=True).returncode != 0:
+        install_fake_ffmpeg(work_dir)
+        ffmpeg_kind = 'fake'
+
+    script = importlib.import_module(script_name)
+    script.FIFO_PATH = os.path.join(work_dir, 'fifo')
+    script.ENABLE_FIFO_OUTPUT = True
+    script.CLIP_CACHE_DIR = os.path.join(work_dir, 'cache')
+    script.ANNOUNCEMENT_ARCHIVE_PATH = None
+    script.SAMPLE_RATE = sample_rate
+    script.STREAM_TCP_PORT = script.STREAM_HTTP_PORT = script.STREAM_UDP_PORT = None
+    script.STREAM_UDP_TARGETS = []
+    # Die TTS-Engine ersetzt run_benchmark(); ohne 'gtts' entfällt die Prüfung auf requests/gTTS
+    script.TTS_BACKENDS = ['fake']
+    if hasattr(script, 'WEATHER_API_URL'):
+        script.WEATHER_API_URL = start_fake_weather_server().url
+    return script, ffmpeg_kind
+
+
+def run_benchmark(script_name, sample_rate, cycles, paced, tts_latency, fake_ffmpeg, trace_allocations, result_path,
+                  gtts_mock=False, gtts_mock_errors=0):
+    """
+    Startet main() des Skripts mit Fake-TTS und misst den Stream über einen Zeitstempel-Reader an der FIFO.
+    Mit gtts_mock läuft stattdessen das echte gTTS-Backend gegen einen lokalen Mock-Server.
+    """
+    work_dir = tempfile.mkdtemp(prefix="zeitansage_bench_")
+    log_path = os.path.join(work_dir, 'run.log')
+    sys.stdout = open(log_path, 'w', buffering=1)  # Ausgaben von main() nicht mit dem Ergebnis mischen
+
+    script, ffmpeg_kind = prepare_script(script_name, work_dir, sample_rate, fake_ffmpeg)
+    use_ffmpeg = script_name == 'zeitansage2'  # gTTS liefert MP3, das über FFmpeg dekodiert wird
+    create_backend, gtts_stats = tts_backend_factory(script, tts_latency, use_ffmpeg, gtts_mock, gtts_mock_errors)
+    script.create_tts_engine = lambda backend_names, sample_rate, clip_cache=None, *args, **kwargs: FallbackTtsEngine(
+        [create_backend(sample_rate)], clip_cache,
+        processor=ClipProcessor(sample_rate, kwargs.get('target_rms_db', CLIP_TARGET_RMS_DB), gains_db=kwargs.get('gains_db')))
+
+    timer = StageTimer()
+    timer.patch(script, 'render_announcement_segments', 'cycle_render')
+    timer.patch(script, 'render_time_announcement', 'time_announcement')
+    timer.patch(PhraseClipEngine, 'warm_up', 'warm_up')
+    timer.patch(PhraseClipEngine, 'assemble', 'assemble')
+    timer.patch(FallbackTtsEngine, 'render', 'tts')
+    timer.patch(LookAheadRenderer, 'collect', 'collect_wait')
+    timer.patch(PcmStreamWriter, 'write_silence', 'write_silence', group='write')
+    timer.patch(PcmStreamWriter, 'write_samples', 'write_countdown', group='write')
+    timer.patch(PcmStreamWriter, 'write_segments', 'write_announcement', group='write')
+
+    # Ohne Echtzeit-Reader läuft der Zeitplan auf der Stream-Uhr des Readers statt auf der Wanduhr,
+    # damit die Zyklen im Stream ihren Abstand behalten, obwohl viel schneller gelesen wird
+    stream_position = [0]  # Vom Reader gelesene Bytes
+    stream_start = time.time()
+    if not paced:
+        zeitansage_runtime.SampleScheduler = functools.partial(
+            SampleScheduler, clock=lambda: stream_start + stream_position[0] / 4 / sample_rate)
+        # Der Ringpuffer wartet auf den Reader, statt in Echtzeit zu produzieren und zu überschreiben
+        zeitansage_runtime.FifoSink = functools.partial(FifoSink, backpressure=True)
+
+    if trace_allocations:
+        tracemalloc.start()
+    main_start = time.perf_counter()
+    main_thread = threading.Thread(target=script.main, name="benchmark-main", daemon=True)
+    main_thread.start()
+    deadline = time.monotonic() + BENCHMARK_STARTUP_TIMEOUT
+    try:
+        # Gemessen wird der eingeschwungene Betrieb: bis zur Bereitschaft sendet main() nur Stille
+        wait_until(lambda: READY.labels().value == 1, main_thread, deadline, "die Zeitansage bereit war")
+        ready_seconds = time.perf_counter() - main_start
+        # Der Reader öffnet die FIFO, sobald main() sie angelegt hat
+        wait_until(lambda: os.path.exists(script.FIFO_PATH), main_thread, deadline, "die FIFO angelegt war")
+    except RuntimeError as e:
+        flush()
+        sys.stdout.flush()
+        print(f"FEHLER: {script_name} mit {sample_rate} Hz: {e} (Ausgaben in '{log_path}')", file=sys.stderr)
+        os._exit(1)
+    fd = os.open(script.FIFO_PATH, os.O_RDONLY)
+    # Erster Zyklus nach höchstens einem Intervall, danach ein Zyklus pro Intervall (einer extra zum Einschwingen)
+    target_bytes = (cycles + 2) * script.UPDATE_INTERVAL_SECONDS * sample_rate * 4
+    read_chunk_bytes = max(4, int(PACED_READ_CHUNK_SECONDS * sample_rate) * 4) if paced else READ_CHUNK_BYTES
+    allocations_start = None
+
+    def on_read(num_bytes):
+        nonlocal allocations_start
+        stream_position[0] = num_bytes
+        if trace_allocations and allocations_start is None and timer.samples.get('write_announcement'):
+            # Ab der ersten gesendeten Ansage gilt die Schleife als eingeschwungen
+            allocations_start = (tracemalloc.take_snapshot(), gc.get_stats()[0]['collections'],
+                                 len(timer.samples['write_announcement']))
+    data, read_times, read_offsets, read_seconds = read_stream(fd, target_bytes, read_chunk_bytes,
+                                                               sample_rate if paced else None, on_read)
+
+    allocations = None
+    if allocations_start is not None:
+        allocations = allocation_summary(allocations_start, len(timer.samples['write_announcement']))
+
+    audio_data = np.frombuffer(bytes(data[:len(data) // 4 * 4]), dtype='<f4')
+    found = analyze_stream(audio_data, sample_rate, script.BEEP_DURATION_SECONDS, script.BEEP_VOLUME, script.COUNTDOWN_BEATS)
+    offsets = np.asarray(read_offsets)
+
+    def arrival(sample):
+        return read_times[min(int(np.searchsorted(offsets, sample * 4, side='right')), len(read_times) - 1)]
+
+    result = {
+        'script': script_name,
+        'sample_rate': sample_rate,
+        'mode': 'paced' if paced else 'fast',
+        'ffmpeg': ffmpeg_kind,
+        'tts_latency_seconds': tts_latency,
+        'gtts_mock': {key: value for key, value in gtts_stats.items() if key != 'texts'} if gtts_stats is not None else None,
+        'ready_seconds': ready_seconds,  # Vom Aufruf von main() bis zur Bereitschaft (Aufwärmen im Hintergrund)
+        'cycles_found': len(found),
+        'audio_seconds': len(audio_data) / sample_rate,
+        'wall_seconds': read_seconds,
+        'bytes_per_second': len(data) / read_seconds if read_seconds > 0 else None,
+        'realtime_factor': (len(audio_data) / sample_rate) / read_seconds if read_seconds > 0 else None,
+        'beep_to_speech_gap_seconds': [(speech - beep_end) / sample_rate for beep_end, speech in found],
+        # Wanduhrzeit zwischen dem Eintreffen des letzten Beeps und der Ansage; > Lücke = Stau im Renderpfad
+        'beep_to_speech_arrival_seconds': [arrival(speech) - arrival(beep_end - 1) for beep_end, speech in found],
+        'stages': timer.summary(),
+        'allocations': allocations,
+    }
+    with open(result_path, 'w') as result_file:
+        json.dump(result, result_file)
+    os.close(fd)
+    sys.stdout.flush()
+    os._exit(0)  # main() läuft endlos in einem Daemon-Thread weiter
+
+
+# --- Benchmark-Matrix (Elternprozess) ---
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="End-to-End-Benchmark der Zeitansage mit Fake-TTS und Zeitstempel-Reader an der FIFO. "
+                    "Gibt die Ergebnisse als JSON aus.")
+    parser.add_argument('--scripts', nargs='+', default=BENCHMARK_SCRIPTS, choices=BENCHMARK_SCRIPTS)
+    parser.add_argument('--rates', nargs='+', type=int, default=BENCHMARK_SAMPLE_RATES, help="Abtastraten in Hz")
+    parser.add_argument('--cycles', type=int, default=BENCHMARK_CYCLES, help="Gemessene Ansage-Zyklen pro Lauf")
+    parser.add_argument('--paced', action='store_true', help="Reader liest in Echtzeit statt so schnell wie möglich")
+    parser.add_argument('--tts-latency', type=float, default=FAKE_TTS_LATENCY_SECONDS, help="Simulierte Synthesezeit pro Clip")
+    parser.add_argument('--fake-ffmpeg', action='store_true', help="Ersatz-ffmpeg auch verwenden, wenn ffmpeg installiert ist")
+    parser.add_argument('--gtts-mock', action='store_true',
+                        help="echtes gTTS-Backend gegen einen lokalen Mock-Server statt Fake-TTS")
+    parser.add_argument('--gtts-mock-errors', type=int, default=0, metavar='N',
+                        help="der Mock-Server beantwortet jede N-te Anfrage mit 503 (0 = nie)")
+    parser.add_argument('--no-allocations', action='store_true', help="Ohne tracemalloc (unverfälschte Zeiten)")
+    parser.add_argument('--output', help="JSON-Datei für die Ergebnisse (Standard: stdout)")
+    parser.add_argument('--run', nargs=3, metavar=('SCRIPT', 'RATE', 'RESULT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        script_name, sample_rate, result_path = args.run
+        run_benchmark(script_name, int(sample_rate), args.cycles, args.paced, args.tts_latency,
+                      args.fake_ffmpeg, not args.no_allocations, result_path, args.gtts_mock, args.gtts_mock_errors)
+        return 0
+
+    runs = []
+    failed = False
+    for script_name in args.scripts:
+        for sample_rate in args.rates:
+            print(f"INFO: Benchmark {script_name} mit {sample_rate} Hz...", file=sys.stderr)
+            with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as result_file:
+                result_path = result_file.name
+            command = [sys.executable, os.path.abspath(__file__), '--run', script_name, str(sample_rate), result_path,
+                       '--cycles', str(args.cycles), '--tts-latency', str(args.tts_latency)]
+            command += ['--paced'] if args.paced else []
+            command += ['--fake-ffmpeg'] if args.fake_ffmpeg else []
+            command += ['--no-allocations'] if args.no_allocations else []
+            command += ['--gtts-mock', '--gtts-mock-errors', str(args.gtts_mock_errors)] if args.gtts_mock else []
+            # Im Echtzeitmodus dauert ein Lauf ungefähr (cycles + 1) Intervalle
+            timeout = 120 + (args.cycles + 2) * 60 * (1 if args.paced else 0)
+            try:
+                subprocess.run(command, check=True, timeout=timeout)
+                with open(result_path) as result_file:
+                    runs.append(json.load(result_file))
+            except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError, ValueError) as e:
+                print(f"FEHLER: Benchmark {script_name} mit {sample_rate} Hz fehlgeschlagen: {e}", file=sys.stderr)
+                runs.append({'script': script_name, 'sample_rate': sample_rate, 'error': str(e)})
+                failed = True
+            finally:
+                os.remove(result_path)
+
+    report = {
+        'benchmark': 'zeitansage',
+        'version': 1,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'runs': runs,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + "\n")
+    else:
+        print(output)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+
+from zeitansage_log import log
+from zeitansage_metrics import METRICS
+
+# --- Konfiguration ---
+CLIP_FILE_SUFFIX = ".f32"          # Rohe float32-Samples (little-endian, mono)
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+# --- Metriken ---
+CACHE_HITS = METRICS.counter('zeitansage_clip_cache_hits_total', "Clips, die aus dem Festplatten-Cache geladen wurden")
+CACHE_MISSES = METRICS.counter('zeitansage_clip_cache_misses_total', "Clips, die nicht im Festplatten-Cache lagen")
+CACHE_EVICTIONS = METRICS.counter('zeitansage_clip_cache_evictions_total', "Wegen der Größengrenze gelöschte Clips")
+
+
+# --- Clip-Cache ---
+
+class ClipCache:
+    """
+    Inhaltsadressierter Festplatten-Cache für gerenderte float32-Clips.
+
+    Der Schlüssel ist ein Hash über alle Parameter, die das Audio beeinflussen
+    (Text, Sprache, Backend, Rate/Gain, Abtastrate). Clips liegen als rohe Arrays
+    vor und werden per np.memmap geladen, ein Neustart beginnt also warm und ein
+    Treffer kostet keine Dekodierung. Die Gesamtgröße ist begrenzt; verdrängt wird
+    der am längsten nicht benutzte Clip (Zugriffszeit = mtime der Datei).
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._total_bytes = sum(size for _, size, _ in self._entries())
+
+    @staticmethod
+    def key(**key_params):
+        """Bildet den Cache-Schlüssel aus allen klangrelevanten Parametern."""
+        encoded = json.dumps(key_params, sort_keys=True, ensure_ascii=False).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + CLIP_FILE_SUFFIX)
+
+    def _entries(self):
+        """Liefert (Pfad, Größe, mtime) aller Clips im Cache-Verzeichnis."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(CLIP_FILE_SUFFIX):
+                path = os.path.join(self.directory, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((path, st.st_size, st.st_mtime))
+        return entries
+
+    def get(self, key):
+        """Lädt einen Clip per memmap (oder None, wenn er nicht im Cache liegt)."""
+        path = self._path(key)
+        try:
+            size = os.path.getsize(path)
+            os.utime(path)  # Zugriff für die LRU-Verdrängung vermerken
+        except FileNotFoundError:
+            self.misses += 1
+            CACHE_MISSES.inc()
+            return None
+        self.hits += 1
+        CACHE_HITS.inc()
+        if size == 0:
+            return np.zeros(0, dtype=np.float32)
+        return np.memmap(path, dtype='<f4', mode='r')
+
+    def put(self, key, audio_data):
+        """Speichert einen Clip atomar und verdrängt bei Bedarf alte Clips."""
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        data = np.ascontiguousarray(audio_data, dtype='<f4')
+        try:
+            data.tofile(temp_path)
+            with self._lock:
+                try:
+                    replaced_bytes = os.path.getsize(path)  # Überschreiben ersetzt die Größe des alten Clips
+                except FileNotFoundError:
+                    replaced_bytes = 0
+                os.replace(temp_path, path)
+                self._total_bytes += data.nbytes - replaced_bytes
+        except OSError as e:
+            log(f"WARNUNG: Clip konnte nicht im Cache gespeichert werden: {e}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Löscht die am längsten nicht benutzten Clips, bis die Größengrenze eingehalten ist."""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        self._total_bytes = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self._total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)  # Bereits gemappte Clips bleiben bis zur Freigabe lesbar
+                CACHE_EVICTIONS.inc()
+            except FileNotFoundError:
+                pass
+            self._total_bytes -= size
+
+    def get_or_render(self, render, **key_params):
+        """Liefert den Clip aus dem Cache oder rendert ihn mit render() und legt ihn ab."""
+        key = self.key(**key_params)
+        audio_data = self.get(key)
+        if audio_data is None:
+            audio_data = render()
+            if audio_data is not None:
+                self.put(key, audio_data)
+        return audio_data
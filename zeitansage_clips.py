@@ -0,0 +1,193 @@
+import re
+import datetime
+import numpy as np
+
+from zeitansage_log import log
+
+# --- Konfiguration ---
+CROSSFADE_SECONDS = 0.01  # Länge der Überblendung zwischen zwei Phrasen-Clips
+
+# Platzhalter, die in einem strftime-Format einer Zeitansage vorkommen dürfen
+TIME_DIRECTIVE_PATTERN = re.compile(r'(%[HIMSp])')
+
+
+# --- Hilfsfunktionen ---
+
+def directive_values(directive):
+    """Liefert alle Texte, die ein strftime-Platzhalter annehmen kann."""
+    if directive == '%H':
+        return [f"{h:02d}" for h in range(24)]
+    if directive == '%I':
+        return [f"{h:02d}" for h in range(1, 13)]
+    if directive in ('%M', '%S'):
+        return [f"{m:02d}" for m in range(60)]
+    if directive == '%p':
+        # AM/PM ist locale-abhängig, daher über strftime selbst ermitteln
+        return sorted({datetime.time(0).strftime('%p'), datetime.time(12).strftime('%p')})
+    raise ValueError(f"Nicht unterstützter Platzhalter: {directive}")
+
+
+def split_time_format(time_format):
+    """
+    Zerlegt ein strftime-Format wie "Es ist %H Uhr %M Minuten." in Tokens.
+    Feste Textteile bleiben als Text erhalten, Platzhalter als '%X'.
+    Teile ohne Buchstaben oder Ziffern (z.B. ein einzelner Punkt) entfallen.
+    """
+    tokens = []
+    for part in TIME_DIRECTIVE_PATTERN.split(time_format):
+        if TIME_DIRECTIVE_PATTERN.fullmatch(part):
+            tokens.append(part)
+        elif any(c.isalnum() for c in part):
+            tokens.append(part.strip())
+    return tokens
+
+
+def concatenate_with_crossfade(clips, crossfade_samples):
+    """Hängt float32-Clips aneinander und blendet an den Übergängen linear über."""
+    clips = [c for c in clips if len(c) > 0]
+    if not clips:
+        return np.zeros(0, dtype=np.float32)
+
+    overlaps = [min(crossfade_samples, len(a), len(b)) for a, b in zip(clips, clips[1:])]
+    output = np.empty(sum(len(c) for c in clips) - sum(overlaps), dtype=np.float32)
+
+    output[:len(clips[0])] = clips[0]
+    position = len(clips[0])
+    for clip, overlap in zip(clips[1:], overlaps):
+        start = position - overlap
+        if overlap > 0:
+            fade_in = np.linspace(0.0, 1.0, overlap, endpoint=False, dtype=np.float32)
+            output[start:position] *= 1.0 - fade_in
+            output[start:position] += clip[:overlap] * fade_in
+        output[position:start + len(clip)] = clip[overlap:]
+        position = start + len(clip)
+    return output
+
+
+# --- Phrasen-Clip-Engine ---
+
+class PhraseClipEngine:
+    """
+    Rendert die festen Wörter und Zahlen-Tokens jeder Sprache einmalig und
+    setzt daraus die Zeitansagen per NumPy-Konkatenation zusammen.
+
+    render_func(text, lang_code) muss ein float32-Array (mono, sample_rate)
+    oder None zurückgeben, z.B. TTS-Synthese plus FFmpeg-Konvertierung.
+    """
+
+    def __init__(self, render_func, sample_rate, crossfade_seconds=CROSSFADE_SECONDS):
+        self.render_func = render_func
+        self.sample_rate = sample_rate
+        self.crossfade_samples = int(crossfade_seconds * sample_rate)
+        self.templates = {}  # lang_code -> Token-Liste
+        self.clips = {}      # (lang_code, text) -> float32-Array
+
+    def add_language(self, lang_code, time_format):
+        """Registriert eine Sprache mit ihrem strftime-Format für die Zeitansage."""
+        self.templates[lang_code] = split_time_format(time_format)
+
+    def remove_language(self, lang_code):
+        """Nimmt eine Sprache samt ihren Clips heraus."""
+        self.templates.pop(lang_code, None)
+        self.clips = {key: clip for key, clip in self.clips.items() if key[0] != lang_code}
+
+    def required_texts(self, lang_code, tokens=None):
+        """Alle Texte, die für beliebige Uhrzeiten in dieser Sprache (bzw. für 'tokens') benötigt werden."""
+        texts = []
+        for token in self.templates[lang_code] if tokens is None else tokens:
+            if TIME_DIRECTIVE_PATTERN.fullmatch(token):
+                texts.extend(directive_values(token))
+            else:
+                texts.append(token)
+        return list(dict.fromkeys(texts))  # Duplikate entfernen, Reihenfolge beibehalten
+
+    def render_token(self, lang_code, text):
+        """Rendert einen einzelnen Token, falls er noch nicht im Speicher liegt."""
+        key = (lang_code, text)
+        clip = self.clips.get(key)
+        if clip is None:
+            clip = self.render_func(text, lang_code)
+            if clip is not None:
+                clip = np.ascontiguousarray(clip, dtype=np.float32)
+                self.clips[key] = clip
+        return clip
+
+    def replace_token(self, lang_code, text, clip):
+        """Ersetzt einen bereits gerenderten Token, z.B. einen Ersatz-Clip durch das verspätete Original."""
+        key = (lang_code, text)
+        if key in self.clips:
+            self.clips[key] = np.ascontiguousarray(clip, dtype=np.float32)
+
+    def warm_up(self, executor=None):
+        """
+        Rendert alle Tokens aller Sprachen vorab, mit 'executor' (z.B. ThreadPoolExecutor)
+        parallel. Gibt die Anzahl fehlgeschlagener Tokens zurück.
+        """
+        jobs = []
+        for lang_code in self.templates:
+            texts = self.required_texts(lang_code)
+            log(f"INFO: Rendere {len(texts)} Phrasen-Clips für '{lang_code}'...")
+            jobs.extend((lang_code, text) for text in texts)
+
+        if executor is None:
+            results = [self.render_token(lang_code, text) for lang_code, text in jobs]
+        else:
+            results = list(executor.map(lambda job: self.render_token(*job), jobs))
+
+        failed = 0
+        for (lang_code, text), clip in zip(jobs, results):
+            if clip is None:
+                log(f"WARNUNG: Phrasen-Clip '{text}' für '{lang_code}' konnte nicht gerendert werden.")
+                failed += 1
+        return failed
+
+    def prepare_languages(self, time_formats, executor=None, render_func=None):
+        """
+        Rendert alle Clips der Sprachen in time_formats (lang_code -> strftime-Format)
+        neu, ohne die laufenden Ansagen anzutasten, z.B. nach einer geänderten
+        Lautstärke. render_func ersetzt dabei self.render_func (etwa ohne Zyklus-Deadline).
+        Das Ergebnis übernimmt install() an einer Zyklusgrenze.
+        """
+        render_func = render_func or self.render_func
+        templates = {lang_code: split_time_format(time_format) for lang_code, time_format in time_formats.items()}
+        jobs = [(lang_code, text) for lang_code, tokens in templates.items()
+                for text in self.required_texts(lang_code, tokens)]
+
+        def render(job):
+            return render_func(job[1], job[0])
+        results = list(executor.map(render, jobs)) if executor is not None else [render(job) for job in jobs]
+        clips = {}
+        for job, clip in zip(jobs, results):
+            if clip is None:
+                log(f"WARNUNG: Phrasen-Clip '{job[1]}' für '{job[0]}' konnte nicht gerendert werden.")
+            else:
+                clips[job] = np.ascontiguousarray(clip, dtype=np.float32)
+        return templates, clips
+
+    def install(self, prepared):
+        """
+        Übernimmt die Sprachen aus prepare_languages() auf einen Schlag; ihre bisherigen
+        Clips entfallen. Fehlende Tokens werden wie gewohnt bei Bedarf nachgerendert.
+        """
+        templates, clips = prepared
+        retained = {key: clip for key, clip in self.clips.items() if key[0] not in templates}
+        self.clips = {**retained, **clips}
+        self.templates.update(templates)
+
+    def tokens_for(self, lang_code, when):
+        """Setzt die Token-Texte für einen Zeitpunkt ein."""
+        return [when.strftime(token) if TIME_DIRECTIVE_PATTERN.fullmatch(token) else token
+                for token in self.templates[lang_code]]
+
+    def assemble(self, lang_code, when):
+        """
+        Baut die Zeitansage für 'when' aus den gecachten Clips zusammen.
+        Fehlende Tokens werden nachgerendert; gelingt das nicht, wird None zurückgegeben.
+        """
+        clips = []
+        for text in self.tokens_for(lang_code, when):
+            clip = self.render_token(lang_code, text)
+            if clip is None:
+                return None
+            clips.append(clip)
+        return concatenate_with_crossfade(clips, self.crossfade_samples)
@@ -0,0 +1,168 @@
+import os
+import json
+import signal
+import threading
+
+try:
+    import tomllib  # Ab Python 3.11
+except ModuleNotFoundError:
+    try:
+        import tomli as tomllib
+    except ModuleNotFoundError:
+        tomllib = None
+
+from zeitansage_log import log
+
+# --- Konfiguration ---
+CONFIG_POLL_SECONDS = 2.0  # So oft wird die Konfigurationsdatei auf Änderungen geprüft (zusätzlich zu SIGHUP)
+
+
+# --- Hilfsfunktionen ---
+
+def load_config_file(path):
+    """
+    Liest eine Konfigurationsdatei als dict: TOML bei der Endung .toml (ab Python 3.11
+    oder mit dem Paket tomli), sonst JSON.
+    """
+    is_toml = path.endswith('.toml')
+    if is_toml and tomllib is None:
+        raise ValueError("TOML benötigt Python 3.11 oder das Paket tomli ('pip install tomli'), alternativ eine JSON-Datei")
+    with open(path, 'rb') as config_file:
+        data = config_file.read()
+    try:
+        if is_toml:
+            return tomllib.loads(data.decode('utf-8'))
+        return json.loads(data)
+    except ValueError as e:  # TOMLDecodeError, JSONDecodeError und UnicodeDecodeError
+        raise ValueError(f"ungültige Syntax: {e}") from e
+
+
+def module_settings(module, exclude=()):
+    """Alle Einstellungen (Konstanten in Großbuchstaben) eines Moduls mit ihren aktuellen Werten."""
+    return {name: value for name, value in vars(module).items()
+            if name.isupper() and not name.startswith('_') and not callable(value) and name not in exclude}
+
+
+def _compatible(current, value):
+    """Passt value zum Typ der bisherigen Einstellung? int und float sind austauschbar, None immer erlaubt."""
+    if current is None or value is None:
+        return True
+    if isinstance(current, bool) or isinstance(value, bool):
+        return isinstance(current, bool) and isinstance(value, bool)
+    if isinstance(current, (int, float)):
+        return isinstance(value, (int, float))
+    if isinstance(current, (list, tuple)):
+        return isinstance(value, (list, tuple))
+    return isinstance(value, type(current))
+
+
+def read_settings(path, defaults):
+    """
+    Liest die Einstellungen aus path. Schlüssel sind die Namen der Konstanten
+    (z.B. UPDATE_INTERVAL_SECONDS = 30), der Typ muss zum Wert in defaults passen.
+    Unbekannte oder falsch getypte Einträge werden mit WARNUNG übergangen.
+    Gibt {Name: Wert} zurück, oder None, wenn die Datei nicht lesbar ist.
+    """
+    try:
+        data = load_config_file(path)
+    except (OSError, ValueError) as e:
+        log(f"FEHLER: Konfiguration '{path}' konnte nicht gelesen werden: {e}")
+        return None
+    if not isinstance(data, dict):
+        log(f"FEHLER: Konfiguration '{path}' muss aus Schlüssel-Wert-Paaren bestehen.")
+        return None
+    settings = {}
+    for name, value in data.items():
+        if name not in defaults:
+            log(f"WARNUNG: Unbekannte Einstellung '{name}' in '{path}' wird ignoriert.")
+        elif not _compatible(defaults[name], value):
+            log(f"WARNUNG: Einstellung '{name}' in '{path}' hat den falschen Typ ({type(value).__name__}) und wird ignoriert.")
+        else:
+            settings[name] = value
+    return settings
+
+
+def settings_languages(names, lang_codes):
+    """Die Sprachen, die eine der Einstellungen betrifft (Sprachcode als Namensteil, z.B. VOLUME_GAIN_DE_DB)."""
+    return [lang_code for lang_code in lang_codes if any(lang_code.upper() in name.split('_') for name in names)]
+
+
+# --- Beobachtung zur Laufzeit ---
+
+class ConfigWatcher:
+    """
+    Beobachtet die Konfigurationsdatei einer laufenden Instanz. load() liest sie beim
+    Start; neu geladen wird nach SIGHUP oder wenn sich Änderungszeit oder Größe der
+    Datei seitdem ändern (geprüft alle poll_seconds). changes() liefert die
+    Einstellungen, die sich dadurch gegenüber dem zuletzt gelesenen Stand der Datei
+    ändern, jeden neuen Wert also nur einmal; der Aufrufer wendet sie an der nächsten
+    Zyklusgrenze an (oder meldet, dass sie einen Neustart brauchen). Aus der Datei
+    entfernte Einträge fallen auf defaults zurück.
+    """
+
+    def __init__(self, path, module, defaults, poll_seconds=CONFIG_POLL_SECONDS):
+        self.path = path
+        self.module = module
+        self.defaults = defaults  # Werte vor dem Laden der Datei
+        self.poll_seconds = poll_seconds
+        self._signature = None
+        self._settings = None  # Zuletzt gelesener Stand der Datei, ergänzt um defaults
+        self._pending = threading.Event()
+        self._stop = threading.Event()
+
+    def _stat(self):
+        try:
+            status = os.stat(self.path)
+        except OSError:
+            return None
+        return status.st_mtime_ns, status.st_size
+
+    def load(self):
+        """Liest die Datei beim Start (siehe read_settings); spätere Änderungen erkennt die Beobachtung."""
+        self._signature = self._stat()
+        settings = read_settings(self.path, self.defaults)
+        if settings is not None:
+            self._settings = dict(self.defaults, **settings)
+        return settings
+
+    def start(self):
+        """Startet die Dateiprüfung und richtet SIGHUP ein (nur im Haupt-Thread möglich)."""
+        if hasattr(signal, 'SIGHUP') and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.request_reload())
+        threading.Thread(target=self._run, name="zeitansage-config", daemon=True).start()
+        log(f"INFO: Beobachte Konfiguration '{self.path}' (neu laden mit SIGHUP oder durch Speichern).")
+
+    def stop(self):
+        self._stop.set()
+
+    def request_reload(self):
+        """Merkt ein Neuladen für die nächste Zyklusgrenze vor."""
+        self._pending.set()
+
+    def _run(self):
+        while not self._stop.wait(self.poll_seconds):
+            signature = self._stat()
+            if signature != self._signature:
+                self._signature = signature
+                if signature is not None:  # Beim Ersetzen der Datei kurz nicht vorhanden
+                    self.request_reload()
+
+    def changes(self):
+        """
+        Lädt die Datei, falls ein Neuladen vorgemerkt ist, und gibt {Name: neuer Wert}
+        der seit dem letzten Lesen geänderten Einstellungen zurück ({} ohne Änderung,
+        auch bei Lesefehlern). Auch nicht übernommene Werte gelten danach als bekannt.
+        """
+        if not self._pending.is_set():
+            return {}
+        self._pending.clear()
+        settings = read_settings(self.path, self.defaults)
+        if settings is None:
+            log("WARNUNG: Die bisherige Konfiguration bleibt in Kraft.")
+            return {}
+        if self._settings is None:  # Ohne load(): Ausgangspunkt ist das laufende Modul
+            self._settings = {name: getattr(self.module, name) for name in self.defaults}
+        target = dict(self.defaults, **settings)
+        changed = {name: value for name, value in target.items() if self._settings.get(name) != value}
+        self._settings = target
+        return changed
@@ -0,0 +1,194 @@
+import io
+import os
+import re
+import sys
+import json
+import time
+import wave
+import base64
+import threading
+import urllib.parse
+import numpy as np
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from zeitansage_audio import decode_audio_bytes, ffmpeg_decode_bytes
+from zeitansage_backends import TtsBackend
+from zeitansage_gtts import GTTS_RPC_PATH
+
+# Lokale Ersatzdienste für Benchmark und Tests: Fake-TTS, Wetter- und gTTS-Server, ffmpeg.
+
+# --- Konfiguration ---
+FAKE_TTS_LATENCY_SECONDS = 0.02   # Simulierte Synthesezeit pro Clip
+FAKE_TTS_SECONDS_PER_CHAR = 0.06  # Länge des Fake-Sprachclips pro Zeichen
+FAKE_TTS_SAMPLE_RATE = 22050      # Abtastrate der Fake-WAV-Ausgabe (wie pyttsx3/espeak)
+FAKE_TTS_BUDGET_SECONDS = 60.0
+FAKE_TTS_AMPLITUDE = 0.3          # Deutlich vom Beep (BEEP_VOLUME) unterscheidbar
+FAKE_WEATHER = {"temperatureC": 21.4, "temperatureF": 70.5, "humidity": 48.0, "pressure": 1013.0, "windSpeed": 2.3}
+
+# Ersetzt ffmpeg, wenn es nicht installiert ist: WAV von stdin, f32le auf stdout
+FAKE_FFMPEG_SOURCE = """#!{python}
+import sys
+sys.path.insert(0, {package_dir!r})
+if '-version' in sys.argv:
+    print('ffmpeg version 0.0-zeitansage-fake')
+    sys.exit(0)
+from zeitansage_audio import wav_decode_stream
+rate = int(sys.argv[sys.argv.index('-ar') + 1]) if '-ar' in sys.argv else None  # Ohne -ar: Rate der Quelle
+try:
+    for block in wav_decode_stream(sys.stdin.buffer.read(), rate):
+        sys.stdout.buffer.write(block.astype('<f4').tobytes())  # Blockweise wie FFmpeg
+except Exception as e:
+    sys.exit(str(e))  # Meldung auf stderr, Exit-Code 1
+"""
+
+
+# --- Fake-TTS ---
+
+class FakeTtsBackend(TtsBackend):
+    """
+    Deterministisches TTS ohne Sprachsynthese: erzeugt nach einer festen Wartezeit
+    ein WAV mit einem Sweep, dessen Länge von der Textlänge abhängt. Mit
+    use_ffmpeg = True wird es wie das MP3 von gTTS über die FFmpeg-Pipe dekodiert.
+    """
+
+    name = "fake"
+
+    def __init__(self, sample_rate, latency_seconds=FAKE_TTS_LATENCY_SECONDS, use_ffmpeg=False,
+                 latency_budget=FAKE_TTS_BUDGET_SECONDS):
+        super().__init__(sample_rate, latency_budget=latency_budget)
+        self.latency_seconds = latency_seconds
+        self.use_ffmpeg = use_ffmpeg
+
+    def cache_params(self, text, lang_code):
+        return dict(text=text, lang=lang_code, backend='fake', sample_rate=self.sample_rate)
+
+    def synthesize(self, text, lang_code, deadline=None):
+        time.sleep(self.latency_seconds)
+        if self.use_ffmpeg:
+            return ffmpeg_decode_bytes(fake_wav_bytes(text), self.sample_rate)
+        return decode_audio_bytes(fake_wav_bytes(text), self.sample_rate)
+
+
+def fake_wav_bytes(text):
+    """WAV mit einem Sweep, dessen Länge von der Textlänge abhängt."""
+    num_samples = max(1, int(len(text) * FAKE_TTS_SECONDS_PER_CHAR * FAKE_TTS_SAMPLE_RATE))
+    t = np.arange(num_samples) / FAKE_TTS_SAMPLE_RATE
+    sweep = FAKE_TTS_AMPLITUDE * np.sin(2 * np.pi * (200 + 300 * t) * t + 0.5)
+    wav_buffer = io.BytesIO()
+    with wave.open(wav_buffer, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(FAKE_TTS_SAMPLE_RATE)
+        wav_file.writeframes((sweep * 32767).astype('<i2').tobytes())
+    return wav_buffer.getvalue()
+
+
+# --- Fake-ffmpeg ---
+
+def install_fake_ffmpeg(directory):
+    """Legt ein ffmpeg-Ersatzskript an und stellt es im PATH voran. Gibt den Pfad des Skripts zurück."""
+    path = os.path.join(directory, 'ffmpeg')
+    with open(path, 'w') as script_file:
+        script_file.write(FAKE_FFMPEG_SOURCE.format(python=sys.executable,
+                                                    package_dir=os.path.dirname(os.path.abspath(__file__))))
+    os.chmod(path, 0o755)
+    os.environ['PATH'] = directory + os.pathsep + os.environ.get('PATH', '')
+    return path
+
+
+# --- Fake-Server ---
+
+def _serve(server, name):
+    """Startet den Server im Hintergrund; stop() beendet ihn wieder."""
+    server.daemon_threads = True
+    # Kurzes Abfrageintervall, damit stop() schnell zurückkehrt
+    threading.Thread(target=server.serve_forever, args=(0.05,), name=name, daemon=True).start()
+
+    def stop():
+        server.shutdown()
+        server.server_close()
+    server.stop = stop
+    return server
+
+
+def start_fake_weather_server(data=FAKE_WEATHER):
+    """
+    Liefert Wetterdaten lokal aus, damit der Wetter-Poller kein Netz braucht.
+    Gibt den Server zurück: server.url ist die Abruf-URL, über server.state lassen
+    sich die Antwort ('data', 'status', 'body') zur Laufzeit ändern und die Anfragen
+    ('requests') zählen. 'body' (Bytes) ersetzt das JSON, z.B. für kaputte Antworten.
+    """
+    state = {'data': data, 'status': 200, 'body': None, 'requests': 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            state['requests'] += 1
+            body = state['body'] if state['body'] is not None else json.dumps(state['data']).encode('utf-8')
+            self.send_response(state['status'])
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = _serve(ThreadingHTTPServer(('127.0.0.1', 0), Handler), "fake-weather")
+    server.state = state
+    server.url = f"http://127.0.0.1:{server.server_port}/data"
+    return server
+
+
+def start_fake_gtts_server(latency_seconds=0.0, error_every=0, fail_first=0, retry_after=None):
+    """
+    Lokaler Ersatz für die gTTS-Schnittstelle (batchexecute): antwortet nach
+    latency_seconds mit fake_wav_bytes() des angefragten Texts im Antwortformat von
+    Google, die ersten fail_first und jede error_every-te Anfrage mit 503 (samt
+    Retry-After, falls angegeben). Hält Verbindungen offen (HTTP/1.1).
+    Gibt den Server zurück: server.url ist die Basis-URL, server.stats zählt
+    Anfragen, Verbindungen, Fehler und hält die angefragten Texte.
+    """
+    stats = {'requests': 0, 'connections': 0, 'errors': 0, 'texts': []}
+    stats_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # Keep-Alive
+
+        def setup(self):
+            super().setup()
+            with stats_lock:
+                stats['connections'] += 1
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode('ascii')
+            with stats_lock:
+                stats['requests'] += 1
+                failing = stats['requests'] <= fail_first or (error_every and stats['requests'] % error_every == 0)
+                stats['errors'] += 1 if failing else 0
+            time.sleep(latency_seconds)
+            if self.path.split('?')[0] != GTTS_RPC_PATH or failing:
+                self.send_response(404 if not failing else 503)
+                if failing and retry_after is not None:
+                    self.send_header('Retry-After', str(retry_after))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            rpc = json.loads(urllib.parse.unquote(re.match(r'f\.req=([^&]*)', body).group(1)))
+            text = json.loads(rpc[0][0][1])[0]
+            with stats_lock:
+                stats['texts'].append(text)
+            audio = base64.b64encode(fake_wav_bytes(text)).decode('ascii')
+            response = f')]}}\'\n\n123\n[["wrb.fr","jQ1olc","[\\"{audio}\\"]",null,null,null,"generic"]]\n'.encode('ascii')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+
+        def log_message(self, *args):
+            pass
+
+    server = _serve(ThreadingHTTPServer(('127.0.0.1', 0), Handler), "fake-gtts")
+    server.stats = stats
+    server.url = f"http://127.0.0.1:{server.server_port}"
+    return server
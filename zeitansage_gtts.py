@@ -0,0 +1,239 @@
+import re
+import time
+import base64
+import random
+import threading
+import importlib
+
+from zeitansage_log import log
+from zeitansage_metrics import METRICS
+
+# --- Konfiguration ---
+GTTS_BASE_URL = "https://translate.google.com"          # Lokaler Mock-Server z.B. "http://127.0.0.1:8099"
+GTTS_RPC_PATH = "/_/TranslateWebserverUi/data/batchexecute"
+GTTS_POOL_SIZE = 4                  # Keep-Alive-Verbindungen, die gleichzeitig offen bleiben
+GTTS_REQUESTS_PER_SECOND = 3.0      # Token-Bucket: Anfragen pro Sekunde im Mittel...
+GTTS_BURST = 6                      # ...und so viele am Stück (z.B. beim Vorab-Rendern der Wetteransage)
+GTTS_MAX_RETRIES = 2                # Weitere Versuche pro Anfrage nach Verbindungsfehlern, 429 oder 5xx
+GTTS_RETRY_BASE_SECONDS = 0.2       # Wartezeit vor dem ersten neuen Versuch, verdoppelt sich je Versuch (±50 % Jitter)
+GTTS_REQUEST_TIMEOUT = 4.0          # Sekunden pro HTTP-Anfrage (kürzer, wenn die Deadline näher ist)
+GTTS_RETRY_STATUS = (429, 500, 502, 503, 504)
+
+# --- Metriken ---
+GTTS_REQUESTS = METRICS.counter('zeitansage_gtts_requests_total', "HTTP-Anfragen an gTTS nach Ergebnis", ('status',))
+GTTS_RETRIES = METRICS.counter('zeitansage_gtts_retries_total', "Wiederholte gTTS-Anfragen")
+GTTS_COALESCED = METRICS.counter('zeitansage_gtts_coalesced_total',
+                                 "Texte, die an eine laufende gleiche Anfrage angehängt wurden")
+GTTS_THROTTLE_SECONDS = METRICS.histogram('zeitansage_gtts_throttle_seconds', "Wartezeit auf das Ratenlimit pro Anfrage")
+
+
+# --- Hilfsfunktionen ---
+
+def parse_gtts_response(response_text):
+    """Holt das MP3 aus der batchexecute-Antwort (wie gTTS: base64 in der 'jQ1olc'-Zeile)."""
+    for line in response_text.splitlines():
+        if 'jQ1olc' in line:
+            match = re.search(r'jQ1olc","\[\\"(.*)\\"]', line)
+            if match:
+                return base64.b64decode(match.group(1).encode('ascii'))
+            break
+    raise ValueError("keine Audiodaten in der gTTS-Antwort")
+
+
+class TokenBucket:
+    """
+    Ratenlimit für alle Threads: rate Anfragen pro Sekunde, bis zu burst am Stück.
+    acquire() reserviert einen Token und wartet außerhalb der Sperre, bis er fällig
+    ist; lässt sich die Deadline (time.time()) so nicht einhalten, wird gar nicht
+    erst reserviert.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)  # Negativ: bereits reservierte, noch nicht fällige Tokens
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline=None):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if deadline is not None and time.time() + wait > deadline:
+                return False
+            self._tokens -= 1
+        GTTS_THROTTLE_SECONDS.observe(wait)
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+
+class _SharedStream:
+    """Teile einer laufenden Anfrage, die weitere Aufrufer mit demselben Text mitlesen."""
+
+    def __init__(self):
+        self.parts = []
+        self.done = False
+        self.error = None
+        self._condition = threading.Condition()
+
+    def append(self, part):
+        with self._condition:
+            self.parts.append(part)
+            self._condition.notify_all()
+
+    def finish(self, error=None):
+        with self._condition:
+            self.done, self.error = True, error
+            self._condition.notify_all()
+
+    def follow(self, deadline):
+        index = 0
+        while True:
+            with self._condition:
+                while index >= len(self.parts) and not self.done:
+                    timeout = None if deadline is None else deadline - time.time()
+                    if timeout is not None and timeout <= 0:
+                        raise TimeoutError("Deadline vor dem Ende der gemeinsamen gTTS-Anfrage erreicht")
+                    self._condition.wait(timeout)
+                if index >= len(self.parts):
+                    if self.error is not None:
+                        raise self.error
+                    return
+                part = self.parts[index]
+            index += 1
+            yield part
+
+
+# --- gTTS-Client ---
+
+class GttsClient:
+    """
+    Spricht die gTTS-Schnittstelle direkt an statt über gTTS.stream(), das für jede
+    Anfrage eine neue Session (und damit eine neue TLS-Verbindung) aufbaut. Die
+    Anfragen selbst (Aufteilung langer Texte, Parameter) erzeugt weiterhin gTTS.
+
+    - Eine Keep-Alive-Session mit bis zu pool_size Verbindungen für alle Threads.
+    - Gleiche Texte (Text, Sprache, slow), die gerade abgerufen werden, werden nur
+      einmal angefragt; weitere Aufrufer (andere Stationen) lesen die Teile mit.
+    - Ein Token-Bucket begrenzt die Anfragerate, damit gTTS nicht drosselt.
+    - Verbindungsfehler, 429 und 5xx werden bis zu max_retries Mal mit exponentieller
+      Wartezeit und Jitter wiederholt, aber nie über die Deadline hinaus.
+    """
+
+    def __init__(self, base_url=GTTS_BASE_URL, requests_per_second=GTTS_REQUESTS_PER_SECOND, burst=GTTS_BURST,
+                 max_retries=GTTS_MAX_RETRIES, timeout=GTTS_REQUEST_TIMEOUT, pool_size=GTTS_POOL_SIZE, session=None):
+        self.url = base_url.rstrip('/') + GTTS_RPC_PATH
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.bucket = TokenBucket(requests_per_second, burst)
+        self.pool_size = pool_size
+        self._session = session
+        self._in_flight = {}  # (text, lang_code, slow) -> _SharedStream
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """Die gemeinsame Keep-Alive-Session; requests wird erst beim ersten Zugriff geladen."""
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session = session
+            return self._session
+
+    def warm_up(self):
+        """Lädt gTTS und requests vorab (z.B. beim Start im Hintergrund), damit die erste Anfrage nicht darauf wartet."""
+        importlib.import_module('gtts')
+        return self.session
+
+    @staticmethod
+    def _request_bodies(text, lang_code, slow):
+        from gtts import gTTS
+        tts = gTTS(text=text, lang=lang_code, slow=slow)
+        return tts.get_bodies(), tts.GOOGLE_TTS_HEADERS
+
+    @staticmethod
+    def _retry_after(response):
+        try:
+            return float(response.headers.get('Retry-After', 0))
+        except ValueError:
+            return 0.0  # Datumsangabe statt Sekunden: eigene Wartezeit verwenden
+
+    def _fetch(self, body, headers, deadline):
+        """Eine Anfrage mit Ratenlimit und Wiederholungen; gibt die MP3-Bytes zurück."""
+        import requests
+        last_error = None
+        retry_after = 0.0
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                backoff = max(retry_after, GTTS_RETRY_BASE_SECONDS * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+                if deadline is not None and time.time() + backoff >= deadline:
+                    break
+                log(f"WARNUNG: gTTS-Anfrage fehlgeschlagen ({last_error}), neuer Versuch in {backoff:.2f} Sekunden.")
+                GTTS_RETRIES.inc()
+                time.sleep(backoff)
+            if not self.bucket.acquire(deadline):
+                last_error = last_error or TimeoutError("Ratenlimit lässt vor der Deadline keine Anfrage mehr zu")
+                break
+            timeout = self.timeout if deadline is None else min(self.timeout, deadline - time.time())
+            if timeout <= 0:
+                break
+            try:
+                response = self.session.post(self.url, data=body, headers=headers, timeout=timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                GTTS_REQUESTS.labels(status='error').inc()
+                last_error = e
+                continue
+            GTTS_REQUESTS.labels(status=response.status_code).inc()
+            if response.status_code in GTTS_RETRY_STATUS:
+                last_error = requests.exceptions.HTTPError(f"HTTP {response.status_code}", response=response)
+                retry_after = self._retry_after(response)
+                continue
+            response.raise_for_status()
+            return parse_gtts_response(response.text)
+        raise last_error or TimeoutError("Deadline vor der gTTS-Anfrage erreicht")
+
+    def stream(self, text, lang_code, slow=False, deadline=None):
+        """
+        Gibt das MP3 für 'text' Teil für Teil zurück, sobald die jeweilige Anfrage
+        beantwortet ist, damit die Dekodierung schon während des Ladens beginnen kann.
+        deadline (time.time()) begrenzt Ratenlimit-Wartezeit und Wiederholungen.
+        """
+        key = (text, lang_code, slow)
+        with self._lock:
+            shared = self._in_flight.get(key)
+            leader = shared is None
+            if leader:
+                shared = self._in_flight[key] = _SharedStream()
+        if not leader:
+            GTTS_COALESCED.inc()
+            yield from shared.follow(deadline)
+            return
+
+        error = None
+        total_bytes = 0
+        try:
+            bodies, headers = self._request_bodies(text, lang_code, slow)
+            for body in bodies:
+                part = self._fetch(body, headers, deadline)
+                total_bytes += len(part)
+                shared.append(part)
+                yield part
+        except GeneratorExit:
+            error = RuntimeError("gemeinsame gTTS-Anfrage wurde abgebrochen")
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            shared.finish(error)
+        log(f"INFO: gTTS-Audio für '{lang_code}' erfolgreich erzeugt ({total_bytes} Bytes).")
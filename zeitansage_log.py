@@ -0,0 +1,60 @@
+import time
+import atexit
+import queue
+import threading
+
+from zeitansage_metrics import METRICS
+
+# --- Konfiguration ---
+LOG_QUEUE_SIZE = 1000  # Meldungen, die höchstens auf die Ausgabe warten; darüber hinaus wird verworfen
+LOG_FLUSH_TIMEOUT = 1.0  # So lange wartet flush() beim Beenden höchstens auf die Ausgabe
+
+# --- Hintergrund-Ausgabe ---
+
+LOG_DROPPED = METRICS.counter('zeitansage_log_dropped_total', "Verworfene Statusmeldungen (Ausgabe kam nicht nach)")
+
+_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+_thread = None
+_thread_lock = threading.Lock()
+_muted = False
+
+
+def _run():
+    while True:
+        message = _queue.get()
+        print(message, flush=True)
+        _queue.task_done()
+
+
+def log(message):
+    """
+    Gibt eine Statusmeldung aus, ohne den aufrufenden (Audio-)Thread zu blockieren:
+    die Meldung wird nur eingereiht und von einem Hintergrund-Thread geschrieben.
+    Hängt stdout (z.B. eine volle Pipe zu journald), wird verworfen statt gewartet.
+    """
+    global _thread
+    if _muted:
+        return
+    if _thread is None:
+        with _thread_lock:
+            if _thread is None:
+                _thread = threading.Thread(target=_run, name="zeitansage-log", daemon=True)
+                _thread.start()
+                atexit.register(flush)  # Meldungen kurz vor dem Beenden (z.B. Konfigurationsfehler) nicht verlieren
+    try:
+        _queue.put_nowait(message)
+    except queue.Full:
+        LOG_DROPPED.inc()
+
+
+def flush(timeout=LOG_FLUSH_TIMEOUT):
+    """Wartet höchstens timeout Sekunden, bis alle eingereihten Meldungen ausgegeben sind."""
+    deadline = time.monotonic() + timeout
+    while _queue.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def mute(muted=True):
+    """Unterdrückt alle Statusmeldungen (z.B. im Zeitraffer, der tausende Zyklen in Sekunden abspielt)."""
+    global _muted
+    _muted = muted
@@ -0,0 +1,220 @@
+import math
+import time
+import threading
+import contextlib
+
+# --- Konfiguration ---
+# Obergrenzen der Histogramm-Klassen in Sekunden (von Sample-Blöcken bis zu gTTS-Anfragen)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# --- Hilfsfunktionen ---
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(label_names, label_values, extra=()):
+    pairs = list(zip(label_names, label_values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+# --- Metriken ---
+
+class _Counter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self, name, label_names, label_values):
+        yield f"{name}{_format_labels(label_names, label_values)} {_format_value(self.value)}"
+
+
+class _Gauge:
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self, name, label_names, label_values):
+        yield f"{name}{_format_labels(label_names, label_values)} {_format_value(self.value)}"
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = tuple(buckets) + (math.inf,)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        with self._lock:
+            for index, upper in enumerate(self.buckets):
+                if value <= upper:
+                    self.counts[index] += 1
+                    break
+            self.sum += value
+            self.count += 1
+
+    @contextlib.contextmanager
+    def time(self):
+        """Misst die Dauer des with-Blocks."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def samples(self, name, label_names, label_values):
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative = 0
+        for upper, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            labels = _format_labels(label_names, label_values, [('le', _format_value(upper))])
+            yield f"{name}_bucket{labels} {cumulative}"
+        yield f"{name}_sum{_format_labels(label_names, label_values)} {_format_value(total)}"
+        yield f"{name}_count{_format_labels(label_names, label_values)} {count}"
+
+
+class MetricFamily:
+    """
+    Eine Metrik mit optionalen Labels. Ohne Labels werden inc()/set()/observe()
+    direkt aufgerufen, mit Labels über labels(backend='gtts').observe(...).
+    """
+
+    _kinds = {'counter': _Counter, 'gauge': _Gauge, 'histogram': _Histogram}
+
+    def __init__(self, kind, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = buckets
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.label_names:
+            self.labels()  # Metriken ohne Labels sind von Anfang an (mit 0) sichtbar
+
+    def labels(self, **label_values):
+        key = tuple(str(label_values[name]) for name in self.label_names)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = _Histogram(self.buckets) if self.kind == 'histogram' else self._kinds[self.kind]()
+                    self._children[key] = child
+        return child
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def set(self, value):
+        self.labels().set(value)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def exposition(self):
+        """Textformat von Prometheus für diese Metrik."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for label_values, child in sorted(self._children.items()):
+            lines.extend(child.samples(self.name, self.label_names, label_values))
+        return lines
+
+
+class MetricsRegistry:
+    """Sammelt alle Metriken des Prozesses; gleichnamige Metriken werden wiederverwendet."""
+
+    def __init__(self):
+        self._families = {}
+        self._lock = threading.Lock()
+
+    def _family(self, kind, name, documentation, label_names=(), **options):
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = MetricFamily(kind, name, documentation, label_names, **options)
+                self._families[name] = family
+            return family
+
+    def counter(self, name, documentation, label_names=()):
+        return self._family('counter', name, documentation, label_names)
+
+    def gauge(self, name, documentation, label_names=()):
+        return self._family('gauge', name, documentation, label_names)
+
+    def histogram(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        return self._family('histogram', name, documentation, label_names, buckets=buckets)
+
+    def exposition(self):
+        """Alle Metriken im Textformat von Prometheus."""
+        lines = []
+        for family in list(self._families.values()):
+            lines.extend(family.exposition())
+        return "\n".join(lines) + "\n"
+
+
+# Gemeinsame Registry, in der sich alle Module instrumentieren
+METRICS = MetricsRegistry()
+
+
+# --- HTTP-Endpunkt ---
+
+class MetricsServer:
+    """Stellt METRICS unter http://host:port/metrics für Prometheus bereit (Hintergrund-Thread)."""
+
+    def __init__(self, host, port, registry=METRICS):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self._server = None
+
+    def start(self):
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler  # Erst hier, spart Importzeit beim Start
+        from zeitansage_log import log  # zeitansage_log importiert dieses Modul, daher erst hier
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = registry.exposition().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', METRICS_CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # Kein Zugriffslog auf stdout
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            log(f"FEHLER: Metrik-Endpunkt auf {self.host}:{self.port} konnte nicht gestartet werden: {e}")
+            return
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="zeitansage-metrics", daemon=True).start()
+        log(f"INFO: Metriken unter http://{self.host}:{self.port}/metrics (Prometheus-Textformat).")
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
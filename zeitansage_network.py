@@ -0,0 +1,190 @@
+import asyncio
+import collections
+import threading
+
+from zeitansage_log import log
+from zeitansage_output import OUTPUT_SAMPLE_FORMATS
+
+# --- Konfiguration ---
+CLIENT_BUFFER_SECONDS = 2.0       # Maximaler Rückstand pro Client, danach wird vorgesprungen
+UDP_PAYLOAD_BYTES = 1400          # Nutzdaten pro UDP-Datagramm (Vielfaches von 4 Bytes, passt für alle Formate)
+UDP_SUBSCRIPTION_TIMEOUT = 60.0   # UDP-Abonnements verfallen ohne erneutes Datagramm nach dieser Zeit
+HTTP_HEADER_TIMEOUT = 5.0         # Zeit für den Empfang der HTTP-Anfrage
+
+
+# --- Hilfsfunktionen ---
+
+def http_chunk(data):
+    """Rahmt einen Block für Transfer-Encoding: chunked. Ein leerer Chunk beendet die Antwort und wird daher nie erzeugt."""
+    if not data:
+        return b''
+    return b"%x\r\n%s\r\n" % (len(data), data)
+
+
+# --- Hilfsklassen ---
+
+class _StreamClient:
+    """Begrenzter Puffer eines einzelnen Clients; bei Rückstand werden die ältesten Blöcke verworfen."""
+
+    def __init__(self, name, max_bytes):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.chunks = collections.deque()
+        self.queued_bytes = 0
+        self.skipped_bytes = 0
+        self.ready = asyncio.Event()
+
+    def offer(self, data):
+        self.chunks.append(data)
+        self.queued_bytes += len(data)
+        while self.queued_bytes > self.max_bytes and len(self.chunks) > 1:
+            dropped = self.chunks.popleft()
+            self.queued_bytes -= len(dropped)
+            self.skipped_bytes += len(dropped)
+        self.ready.set()
+
+    async def next_chunk(self):
+        while not self.chunks:
+            self.ready.clear()
+            await self.ready.wait()
+        data = self.chunks.popleft()
+        self.queued_bytes -= len(data)
+        return data
+
+
+class _UdpProtocol(asyncio.DatagramProtocol):
+    """Jedes empfangene Datagramm (re-)abonniert den Absender."""
+
+    def __init__(self, broadcaster):
+        self.broadcaster = broadcaster
+
+    def datagram_received(self, data, addr):
+        if addr not in self.broadcaster.udp_subscribers:
+            log(f"INFO: UDP-Client {addr[0]}:{addr[1]} abonniert den Stream.")
+        self.broadcaster.udp_subscribers[addr] = asyncio.get_running_loop().time()
+
+
+# --- Netzwerk-Verteiler ---
+
+class StreamBroadcaster:
+    """
+    Verteilt den einmal gerenderten Stream (float32, int16 oder int8) über eine asyncio-Schleife in
+    einem eigenen Thread an beliebig viele Clients: roh über TCP, als chunked
+    HTTP-Antwort und als UDP-Datagramme (an feste Ziele oder an Absender eines
+    beliebigen Datagramms an udp_port).
+
+    Jeder TCP/HTTP-Client hat einen eigenen begrenzten Puffer; ein langsamer Client
+    springt zur Live-Position vor, statt die anderen oder die FIFO aufzuhalten.
+    publish() ist threadsicher und wird als Abgriff am PcmStreamWriter registriert.
+    """
+
+    def __init__(self, sample_rate, host='0.0.0.0', tcp_port=None, http_port=None, udp_port=None,
+                 udp_targets=(), client_buffer_seconds=CLIENT_BUFFER_SECONDS, sample_format='float32'):
+        self.sample_rate = sample_rate
+        self.sample_format = sample_format
+        dtype, _, self.header_name = OUTPUT_SAMPLE_FORMATS[sample_format]
+        self.bytes_per_sample = dtype.itemsize
+        self.host = host
+        self.tcp_port = tcp_port
+        self.http_port = http_port
+        self.udp_port = udp_port
+        self.udp_targets = list(udp_targets)
+        self.client_buffer_bytes = int(client_buffer_seconds * sample_rate) * self.bytes_per_sample
+        self.clients = set()
+        self.udp_subscribers = {}  # (host, port) -> loop.time() des letzten Datagramms
+        self._udp_transport = None
+        self._loop = None
+        self._started = threading.Event()
+
+    def start(self):
+        """Startet die Server in einem Hintergrund-Thread und wartet, bis sie lauschen."""
+        threading.Thread(target=self._run, name="zeitansage-network", daemon=True).start()
+        self._started.wait()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._start_servers())
+        except OSError as e:
+            log(f"FEHLER: Netzwerk-Streaming konnte nicht gestartet werden: {e}")
+            self._loop = None
+            self._started.set()
+            return
+        self._started.set()
+        self._loop.run_forever()
+
+    async def _start_servers(self):
+        loop = asyncio.get_running_loop()
+        if self.tcp_port is not None:
+            await asyncio.start_server(self._handle_tcp, self.host, self.tcp_port)
+            log(f"INFO: TCP-Stream auf {self.host}:{self.tcp_port} ({self.sample_format}, {self.sample_rate} Hz).")
+        if self.http_port is not None:
+            await asyncio.start_server(self._handle_http, self.host, self.http_port)
+            log(f"INFO: HTTP-Stream auf http://{self.host}:{self.http_port}/ ({self.sample_format}, {self.sample_rate} Hz).")
+        if self.udp_port is not None or self.udp_targets:
+            local_addr = (self.host, self.udp_port if self.udp_port is not None else 0)
+            self._udp_transport, _ = await loop.create_datagram_endpoint(lambda: _UdpProtocol(self), local_addr=local_addr)
+            if self.udp_port is not None:
+                log(f"INFO: UDP-Stream auf {self.host}:{self.udp_port} (Abonnement per beliebigem Datagramm).")
+
+    def publish(self, data):
+        """Übergibt einen Block an alle Clients (threadsicher, blockiert nie)."""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._fan_out, data)
+
+    def _fan_out(self, data):
+        if not data:
+            return  # Nichts zu verteilen; als HTTP-Chunk wäre ein leerer Block das Ende des Streams
+        for client in self.clients:
+            client.offer(data)
+        if self._udp_transport is not None:
+            now = self._loop.time()
+            for addr, last_seen in list(self.udp_subscribers.items()):
+                if now - last_seen > UDP_SUBSCRIPTION_TIMEOUT:
+                    log(f"INFO: UDP-Abonnement von {addr[0]}:{addr[1]} abgelaufen.")
+                    del self.udp_subscribers[addr]
+            view = memoryview(data)
+            for addr in self.udp_targets + list(self.udp_subscribers):
+                for offset in range(0, len(view), UDP_PAYLOAD_BYTES):
+                    self._udp_transport.sendto(view[offset:offset + UDP_PAYLOAD_BYTES], addr)
+
+    async def _serve_client(self, writer, frame):
+        """Schreibt den Stream an einen verbundenen Client, bis dieser trennt."""
+        peer = writer.get_extra_info('peername')
+        client = _StreamClient(f"{peer[0]}:{peer[1]}" if peer else "?", self.client_buffer_bytes)
+        self.clients.add(client)
+        log(f"INFO: Stream-Client {client.name} verbunden ({len(self.clients)} aktiv).")
+        try:
+            while True:
+                framed = frame(await client.next_chunk())
+                if framed:
+                    writer.write(framed)
+                await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.clients.discard(client)
+            writer.close()
+            log(f"INFO: Stream-Client {client.name} getrennt "
+                f"({client.skipped_bytes // self.bytes_per_sample} Samples übersprungen, {len(self.clients)} aktiv).")
+
+    async def _handle_tcp(self, reader, writer):
+        await self._serve_client(writer, lambda data: data)
+
+    async def _handle_http(self, reader, writer):
+        try:
+            await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), HTTP_HEADER_TIMEOUT)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+        writer.write((
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Type: application/octet-stream\r\n"
+            f"X-Sample-Rate: {self.sample_rate}\r\n"
+            f"X-Sample-Format: {self.header_name}\r\n"
+            "X-Channels: 1\r\n"
+            "Cache-Control: no-cache\r\n"
+            "Transfer-Encoding: chunked\r\n"
+            "\r\n").encode('ascii'))
+        await self._serve_client(writer, http_chunk)
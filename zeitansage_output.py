@@ -0,0 +1,281 @@
+import os
+import time
+import fcntl
+import struct
+import termios
+import numpy as np
+
+from zeitansage_audio import PolyphaseResampler
+from zeitansage_metrics import METRICS
+
+# --- Konfiguration ---
+SILENCE_BUFFER_SECONDS = 1.0  # Größe des vorab angelegten Stille-Puffers
+MAX_IOVECS = 64               # Maximale Anzahl Puffer pro writev()-Aufruf
+WRITE_BATCH_SECONDS = 0.1     # Maximale Audiodauer pro Schreibvorgang (hält Netzwerk-Abgriffe zeitnah)
+PACED_MAX_LEAD_SECONDS = 0.2  # Nach der Uhr getaktet: so weit darf der Stream der Wanduhr vorauslaufen
+
+# Ausgabeformat -> (NumPy-Typ, Vollaussteuerung; None = float32 unverändert, Kurzname für Header)
+OUTPUT_SAMPLE_FORMATS = {
+    'float32': (np.dtype('<f4'), None, 'f32le'),
+    'int16': (np.dtype('<i2'), 32767.0, 's16le'),
+    'int8': (np.dtype('i1'), 127.0, 's8'),
+}
+
+# --- Metriken ---
+WRITE_SECONDS = METRICS.histogram('zeitansage_fifo_write_seconds',
+                                  "Dauer eines Schreibvorgangs auf die FIFO (inklusive Warten auf den Reader)")
+BYTES_WRITTEN = METRICS.counter('zeitansage_bytes_written_total', "Insgesamt geschriebene Audio-Bytes")
+READER_CONNECTS = METRICS.counter('zeitansage_reader_connects_total', "Verbindungen eines Readers mit dem Writer")
+READER_DISCONNECTS = METRICS.counter('zeitansage_reader_disconnects_total', "Vom Reader getrennte Verbindungen (BrokenPipe)")
+UNDERRUNS = METRICS.counter('zeitansage_underruns_total', "Reader lief leer, bevor neue Samples geschrieben wurden")
+
+
+# --- Ausgabeformate ---
+
+class OutputFormat:
+    """
+    Wandelt den gerenderten float32-Strom (source_rate) in das Format einer Ausgabe:
+    float32, int16 oder int8 bei beliebiger Abtastrate. Das Resampling läuft als
+    Polyphasen-Filter mit Zustand, so dass aufeinanderfolgende Blöcke lückenlos
+    bleiben. Jede Ausgabe braucht ihre eigene Instanz.
+    """
+
+    def __init__(self, source_rate, sample_rate=None, sample_format='float32'):
+        if sample_format not in OUTPUT_SAMPLE_FORMATS:
+            raise ValueError(f"Unbekanntes Sample-Format '{sample_format}' "
+                             f"(möglich: {', '.join(OUTPUT_SAMPLE_FORMATS)})")
+        self.source_rate = source_rate
+        self.sample_rate = sample_rate or source_rate
+        self.sample_format = sample_format
+        self.dtype, self._scale, self.header_name = OUTPUT_SAMPLE_FORMATS[sample_format]
+        self.bytes_per_sample = self.dtype.itemsize
+        self._resampler = PolyphaseResampler(source_rate, self.sample_rate) if self.sample_rate != source_rate else None
+
+    @property
+    def passthrough(self):
+        """True, wenn float32 bei der Renderrate unverändert (ohne Kopie) geschrieben werden kann."""
+        return self._resampler is None and self._scale is None
+
+    def same_as(self, other):
+        return other is not None and (self.sample_rate, self.sample_format) == (other.sample_rate, other.sample_format)
+
+    def describe(self):
+        return f"{self.sample_format}, {self.sample_rate} Hz"
+
+    def to_source_samples(self, num_samples):
+        """Rechnet eine Anzahl Ausgabe-Samples in Samples der Renderrate um."""
+        return num_samples * self.source_rate // self.sample_rate
+
+    def convert(self, samples):
+        """Wandelt einen float32-Block der Renderrate in ein Array des Ausgabeformats."""
+        if self._resampler is not None:
+            samples = self._resampler.process(samples)
+        if self._scale is None:
+            return samples
+        scaled = np.multiply(samples, self._scale, dtype=np.float32)
+        np.rint(scaled, out=scaled)
+        np.clip(scaled, -self._scale - 1, self._scale, out=scaled)
+        return scaled.astype(self.dtype)
+
+
+# --- Ausgabe ---
+
+class PcmStreamWriter:
+    """
+    Schreibt float32-Puffer ohne Zwischenkopien direkt auf den Dateideskriptor
+    der FIFO.
+
+    Stille wird aus einem einmalig angelegten Null-Puffer geschrieben, Segmente
+    gehen als memoryview per os.writev() hinaus. Ein flush() ist nicht mehr
+    nötig, da der Python-Dateipuffer umgangen wird.
+
+    Mit output (OutputFormat) geht die FIFO in einem anderen Format oder einer
+    anderen Rate hinaus, z.B. int16 für halbe Bandbreite; gezählt wird weiterhin
+    in Samples der Renderrate. Zusätzliche Abnehmer (z.B. Netzwerk-Streaming)
+    werden mit add_tap() registriert und erhalten jeden geschriebenen Block als
+    Bytes, auf Wunsch in einem eigenen Format. Ohne blockierende FIFO (mit einem
+    FifoSink oder attach(None)) taktet der Writer die Ausgabe selbst nach der Uhr.
+    """
+
+    def __init__(self, sample_rate, silence_buffer_seconds=SILENCE_BUFFER_SECONDS, output=None):
+        self.sample_rate = sample_rate
+        self.output = output or OutputFormat(sample_rate)
+        self.fd = None
+        self.sink = None          # FifoSink mit Ringpuffer statt direktem Deskriptor
+        self.bytes_written = 0    # Seit dem Start insgesamt auf die FIFO geschriebene Bytes
+        self.samples_written = 0  # Seit dem Start insgesamt geschriebene Samples (Renderrate)
+        self.taps = []            # Weitere Abnehmer: (tap(data_bytes), OutputFormat oder None)
+        self._batch_bytes = max(4, int(WRITE_BATCH_SECONDS * sample_rate) * 4)
+        self._paced_anchor = None  # Nur wenn nach der Uhr getaktet wird: monotonic()-Zeit von Sample 0
+        self._pace_blocking = True  # False: der Aufrufer wartet selbst (z.B. eine Station auf der Ereignisschleife)
+        self._attached_bytes = 0  # bytes_written beim letzten attach()
+        self._silence = np.zeros(max(1, int(silence_buffer_seconds * sample_rate)), dtype=np.float32)
+        self._silence_view = memoryview(self._silence).cast('B')
+
+    def attach(self, fifo_file, pace=True):
+        """
+        Verbindet den Writer mit seinem Ziel: einer geöffneten FIFO (Dateiobjekt oder
+        Deskriptor, der Reader bremst per Staudruck), einem FifoSink (Ringpuffer,
+        Reader kommen und gehen) oder None (nur die Abgriffe). Außer bei blockierender
+        FIFO oder FifoSink mit backpressure wird in Echtzeit nach der Uhr getaktet;
+        mit pace=False schläft der Writer dabei nicht selbst, sondern der Aufrufer
+        wartet anhand von lead_seconds().
+        """
+        self._attached_bytes = self.bytes_written
+        self.fd = None
+        self.sink = None
+        self._paced_anchor = None
+        self._pace_blocking = pace
+        if hasattr(fifo_file, 'write_views'):
+            self.sink = fifo_file
+        elif fifo_file is not None:
+            READER_CONNECTS.inc()
+            self.fd = fifo_file if isinstance(fifo_file, int) else fifo_file.fileno()
+        if self.fd is None and not (self.sink is not None and self.sink.backpressure):
+            self._paced_anchor = time.monotonic() - self.samples_written / self.sample_rate
+
+    def add_tap(self, tap, output=None):
+        """
+        Registriert einen weiteren Abnehmer für alle geschriebenen Daten. Ohne
+        output (oder im Format der FIFO) erhält er dieselben Bytes wie die FIFO.
+        """
+        if output is not None and output.same_as(self.output):
+            output = None  # Gleiches Format: die Bytes der FIFO werden geteilt
+        self.taps.append((tap, output))
+
+    def queued_samples(self):
+        """
+        Anzahl der Samples, die bereits in der FIFO liegen, aber vom Reader noch
+        nicht gelesen wurden (FIONREAD). Für andere Deskriptoren wird 0 geliefert.
+        Wird nach der Uhr getaktet, ist es der Vorlauf des Streams gegenüber der Uhr.
+        """
+        if self.sink is not None and self._paced_anchor is None:
+            return self.output.to_source_samples(self.sink.queued_bytes() // self.output.bytes_per_sample)
+        if self.fd is None and self._paced_anchor is not None:
+            return max(0, int(self.lead_seconds() * self.sample_rate))
+        try:
+            result = fcntl.ioctl(self.fd, termios.FIONREAD, b'\0\0\0\0')
+            return self.output.to_source_samples(struct.unpack('i', result)[0] // self.output.bytes_per_sample)
+        except (OSError, TypeError):
+            return 0
+
+    def _batches(self, views):
+        """Teilt Byte-Views in Blöcke von höchstens WRITE_BATCH_SECONDS Audiodauer."""
+        batch, batch_bytes = [], 0
+        for view in views:
+            while len(view):
+                take = min(len(view), self._batch_bytes - batch_bytes)
+                batch.append(view[:take])
+                batch_bytes += take
+                view = view[take:]
+                if batch_bytes == self._batch_bytes:
+                    yield batch
+                    batch, batch_bytes = [], 0
+        if batch:
+            yield batch
+
+    def _write_fd(self, views):
+        """Schreibt eine Liste von Byte-Views vollständig, auch bei Teil-Schreibvorgängen."""
+        while views:
+            written = os.writev(self.fd, views[:MAX_IOVECS])
+            while views and written >= len(views[0]):
+                written -= len(views[0])
+                views.pop(0)
+            if views and written:
+                views[0] = views[0][written:]
+
+    @property
+    def paced(self):
+        """True, wenn der Writer in Echtzeit nach der Uhr taktet (kein Staudruck durch den Reader)."""
+        return self._paced_anchor is not None
+
+    def lead_seconds(self):
+        """Getaktet: wie weit der geschriebene Stream der Uhr vorausläuft (sonst 0)."""
+        if self._paced_anchor is None:
+            return 0.0
+        return self._paced_anchor + self.samples_written / self.sample_rate - time.monotonic()
+
+    def _pace(self):
+        """Getaktet: wartet, bis der Stream höchstens PACED_MAX_LEAD_SECONDS vorausläuft."""
+        lead = self.lead_seconds()
+        if lead > PACED_MAX_LEAD_SECONDS:
+            if self._pace_blocking:
+                time.sleep(lead - PACED_MAX_LEAD_SECONDS)
+        elif lead < -PACED_MAX_LEAD_SECONDS:
+            # Unterlauf (z.B. Prozess angehalten): nicht nachholen, sondern neu verankern
+            UNDERRUNS.inc()
+            self._paced_anchor -= lead
+
+    @staticmethod
+    def _convert(output, batch):
+        """Wandelt einen Block float32-Views in Byte-Views des Ausgabeformats."""
+        converted = (output.convert(np.frombuffer(view, dtype=np.float32)) for view in batch)
+        return [memoryview(a).cast('B') for a in converted if len(a)]
+
+    def _write_views(self, views):
+        """Schreibt die Views blockweise auf die FIFO und an alle Abgriffe."""
+        if self.fd is not None and self.bytes_written > self._attached_bytes and self.queued_samples() == 0:
+            UNDERRUNS.inc()  # Die FIFO war leer: der Reader hat auf uns gewartet
+        for source_batch in self._batches(views):
+            self.samples_written += sum(len(v) for v in source_batch) // 4
+            batch = source_batch if self.output.passthrough else self._convert(self.output, source_batch)
+            batch_bytes = sum(len(v) for v in batch)
+            if self.fd is not None:
+                try:
+                    with WRITE_SECONDS.time():
+                        self._write_fd(list(batch))
+                except BrokenPipeError:
+                    READER_DISCONNECTS.inc()
+                    raise
+            elif self.sink is not None:
+                self.sink.write_views(batch)
+            self.bytes_written += batch_bytes
+            BYTES_WRITTEN.inc(batch_bytes)
+            if self.taps:
+                self._feed_taps(source_batch, batch)
+            if self._paced_anchor is not None:
+                self._pace()
+
+    def _feed_taps(self, source_batch, batch):
+        """Gibt einen Block an alle Abgriffe: im FIFO-Format die Bytes der FIFO, sonst eigens gewandelt."""
+        data = None
+        for tap, output in self.taps:
+            if output is not None:
+                # Beim Resampling kann ein kleiner Block 0 Samples ergeben; leere Blöcke gehen nicht hinaus
+                converted = b''.join(self._convert(output, source_batch))
+                if converted:
+                    tap(converted)
+                continue
+            if data is None:
+                data = b''.join(batch)  # Eine Kopie pro Block, von allen Abgriffen geteilt
+            if data:
+                tap(data)
+
+    def write_samples(self, samples):
+        """Schreibt ein float32-Array ohne .tobytes()-Kopie."""
+        self.write_segments([samples])
+
+    def write_segments(self, segments):
+        """Schreibt mehrere float32-Arrays mit möglichst wenigen Systemaufrufen."""
+        views = [memoryview(np.ascontiguousarray(s, dtype=np.float32)).cast('B') for s in segments if len(s)]
+        self._write_views(views)
+
+    def write_silence(self, num_samples):
+        """Schreibt num_samples Samples Stille aus dem vorab angelegten Puffer."""
+        remaining_bytes = num_samples * 4
+        views = []
+        while remaining_bytes > 0:
+            chunk = min(remaining_bytes, len(self._silence_view))
+            views.append(self._silence_view[:chunk])
+            remaining_bytes -= chunk
+        self._write_views(views)
+
+    def write_silence_until(self, event):
+        """
+        Schreibt blockweise Stille, bis event (threading.Event) gesetzt ist, z.B.
+        solange der Start im Hintergrund aufwärmt. Die Blöcke sind WRITE_BATCH_SECONDS
+        lang, die Bereitschaft wird also spätestens nach einem Block bemerkt.
+        """
+        batch_samples = self._batch_bytes // 4
+        while not event.is_set():
+            self.write_silence(batch_samples)
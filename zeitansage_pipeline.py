@@ -0,0 +1,130 @@
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from zeitansage_log import log
+from zeitansage_metrics import METRICS
+
+# --- Konfiguration ---
+LATE_RENDER_WARNING_SECONDS = 0.05  # Ab dieser Wartezeit auf das Vorab-Rendering wird gewarnt
+RENDER_WORKERS = 4  # Standardgröße des Render-Pools (TTS-Anfragen und FFmpeg warten überwiegend)
+
+# --- Metriken ---
+SKIPPED_SEGMENTS = METRICS.counter('zeitansage_skipped_segments_total',
+                                   "Segmente, die nicht gerendert werden konnten und entfallen sind")
+CYCLE_RENDER_SECONDS = METRICS.histogram('zeitansage_cycle_render_seconds', "Renderdauer aller Segmente eines Zyklus")
+RENDER_WAIT_SECONDS = METRICS.histogram('zeitansage_render_wait_seconds',
+                                        "Wartezeit der Hauptschleife auf das Vorab-Rendering nach dem Countdown")
+RENDER_HEADROOM = METRICS.gauge('zeitansage_render_headroom_seconds',
+                                "Zeit zwischen fertigem Rendering und Ansagezeitpunkt im letzten Zyklus (negativ = zu spät)")
+LATE_RENDERS = METRICS.counter('zeitansage_late_renders_total',
+                               "Zyklen, in denen das Rendering nach dem Countdown noch nicht fertig war")
+
+
+# --- Hilfsfunktionen ---
+
+def create_render_pool(max_workers=RENDER_WORKERS):
+    """Legt den gemeinsamen Thread-Pool für die parallele Synthese an."""
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="zeitansage-render")
+
+
+class Pause:
+    """Markiert ein festes Array in render_in_parallel() als Pause zwischen zwei Segmenten."""
+
+    __slots__ = ('samples',)
+
+    def __init__(self, samples):
+        self.samples = samples
+
+
+def render_in_parallel(executor, parts):
+    """
+    Rendert alle aufrufbaren Einträge von 'parts' gleichzeitig auf dem Pool und
+    gibt die Ergebnisse in der ursprünglichen Reihenfolge zurück. Fertige Arrays
+    und Pausen (Pause) werden unverändert übernommen; Einträge, die None liefern
+    oder fehlschlagen, entfallen samt einer angrenzenden Pause (der davor, am
+    Anfang der danach), damit keine doppelte oder einleitende Pause entsteht. Die
+    Dauer ist so durch das langsamste Segment begrenzt statt durch die Summe.
+    """
+    pending = [executor.submit(part) if callable(part) else part for part in parts]
+    results = []             # (Array, ist Pause)
+    drop_next_pause = False  # Ein fehlgeschlagenes Segment ohne Pause davor nimmt die folgende mit
+    for item in pending:
+        if isinstance(item, Future):
+            try:
+                item = item.result()
+            except Exception as e:
+                log(f"FEHLER: Segment konnte nicht gerendert werden: {e}")
+                item = None
+        if item is None:
+            SKIPPED_SEGMENTS.inc()
+            if results and results[-1][1]:
+                results.pop()
+            else:
+                drop_next_pause = True
+            continue
+        is_pause = isinstance(item, Pause)
+        if is_pause and drop_next_pause:
+            drop_next_pause = False
+            continue
+        drop_next_pause = False
+        results.append((item.samples if is_pause else item, is_pause))
+    return [samples for samples, _ in results]
+
+
+# --- Look-Ahead-Rendering ---
+
+class LookAheadRenderer:
+    """
+    Rendert die Ansage für den Zielzeitpunkt des nächsten Zyklus im Hintergrund,
+    während die Hauptschleife noch Stille und Countdown schreibt.
+
+    render_func(target_time) gibt die Liste der float32-Segmente des Zyklus in
+    Sendereihenfolge zurück. Die Hauptschleife schreibt nach dem Countdown nur
+    noch die fertigen Puffer.
+    """
+
+    def __init__(self, render_func):
+        self.render_func = render_func
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="zeitansage-lookahead")
+        self._pending = None  # (target_time, Future)
+
+    def schedule(self, target_time):
+        """Startet das Rendering für target_time, sofern es nicht bereits läuft."""
+        if self._pending is not None and self._pending[0] == target_time:
+            return
+        self._pending = (target_time, self._executor.submit(self._render, target_time))
+
+    def _render(self, target_time):
+        start = time.monotonic()
+        try:
+            return self.render_func(target_time)
+        finally:
+            CYCLE_RENDER_SECONDS.observe(time.monotonic() - start)
+            RENDER_HEADROOM.set(target_time.timestamp() - time.time())
+
+    def collect(self):
+        """
+        Holt die gerenderten Segmente ab (wartet notfalls) und gibt
+        (target_time, segments) zurück. Bei einem Fehler ist segments leer.
+        """
+        if self._pending is None:
+            return None, []
+        target_time, future = self._pending
+        self._pending = None
+
+        wait_start = time.monotonic()
+        try:
+            segments = future.result()
+        except Exception as e:
+            log(f"FEHLER: Vorab-Rendering für {target_time:%H:%M:%S} fehlgeschlagen: {e}")
+            segments = []
+        waited = time.monotonic() - wait_start
+        RENDER_WAIT_SECONDS.observe(waited)
+        if waited > LATE_RENDER_WARNING_SECONDS:
+            LATE_RENDERS.inc()
+            log(f"WARNUNG: Vorab-Rendering war nicht rechtzeitig fertig, {waited:.2f} Sekunden gewartet.")
+        return target_time, segments
+
+    def shutdown(self):
+        """Beendet den Hintergrund-Thread."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,198 @@
+import os
+import json
+import time
+import asyncio
+import datetime
+import numpy as np
+
+from zeitansage_log import mute
+from zeitansage_output import OutputFormat
+
+# --- Konfiguration ---
+REPLAY_TOLERANCE_SECONDS = 0.001   # Zulässige Abweichung im Zeitraffer (die Sample-Uhr ist exakt, erlaubt ist nur Rundung)
+ANNOUNCED_TOLERANCE_SECONDS = 0.5  # Angesagte und tatsächliche Zeit dürfen höchstens so weit auseinanderliegen
+
+
+# --- Simulierte Uhr und Ziel ---
+
+class SampleClock:
+    """
+    Simulierte Wanduhr für den Zeitraffer: die Zeit ergibt sich allein aus den
+    geschriebenen Samples eines Writers ab start_time. Ersetzt time.time im
+    SampleScheduler, so dass Zeitplan und Drift-Messung unverändert laufen.
+    """
+
+    def __init__(self, start_time, writer):
+        self.start_time = start_time
+        self.writer = writer
+
+    def __call__(self):
+        return self.start_time + self.writer.samples_written / self.writer.sample_rate
+
+
+class ReplaySink:
+    """
+    Ziel ohne Reader für den Zeitraffer: nimmt jeden Block sofort an und schreibt ihn
+    optional in eine Datei oder einen Speicherpuffer (z.B. io.BytesIO). Wie ein
+    FifoSink mit backpressure taktet der Writer dann nicht nach der Uhr.
+    """
+
+    backpressure = True
+
+    def __init__(self, output, file=None):
+        self.output = output
+        self.file = file
+        self.bytes_written = 0
+
+    def write_views(self, views):
+        for view in views:
+            if self.file is not None:
+                self.file.write(view)
+            self.bytes_written += len(view)
+
+    def queued_bytes(self):
+        return 0
+
+
+# --- Bericht ---
+
+def _iso(timestamp, timezone):
+    return datetime.datetime.fromtimestamp(timestamp, timezone).isoformat(timespec='milliseconds')
+
+
+def _milliseconds(values):
+    if not values:
+        return {'max': None, 'mean': None}
+    values = np.abs(np.asarray(values)) * 1000
+    return {'max': float(values.max()), 'mean': float(values.mean())}
+
+
+def timeline_report(station, start_time, include_cycles=True):
+    """
+    Wertet die Zyklus-Ereignisse einer Station aus: je Zyklus Beginn, Beep-Positionen,
+    geplante, tatsächliche und angesagte Zeit der Ansage sowie die Renderdauer.
+    Abweichungen über REPLAY_TOLERANCE_SECONDS gelten als Zeitplanfehler, ebenso
+    Zyklen ohne gesendete Sprache.
+    """
+    rate = station.sample_rate
+    beat_seconds = station.countdown.beat_samples / rate
+    cycles = []
+    errors = []
+    for kind, position, details in station.timeline:
+        stream_time = start_time + position / rate
+        if kind == 'error':
+            errors.append({'time': _iso(stream_time, station.timezone), 'message': details['message']})
+        elif kind == 'cycle':
+            cycles.append({'start': stream_time, 'planned': details['planned'], 'beeps': []})
+        elif kind == 'beep' and cycles:
+            cycles[-1]['beeps'].append(stream_time)
+        elif kind == 'announcement' and cycles:
+            cycles[-1].update(actual=stream_time, **details)
+    cycles = [cycle for cycle in cycles if 'actual' in cycle]  # Der letzte Zyklus kann unvollständig sein
+
+    alignment_errors = [cycle['actual'] - cycle['planned'] for cycle in cycles]
+    beep_errors = [later - earlier - beat_seconds
+                   for cycle in cycles for earlier, later in zip(cycle['beeps'], cycle['beeps'][1:])]
+    beep_errors += [cycle['actual'] - cycle['beeps'][-1] - beat_seconds for cycle in cycles if cycle['beeps']]
+    interval_errors = [later['planned'] - earlier['planned'] - station.scheduler.interval_seconds
+                       for earlier, later in zip(cycles, cycles[1:])]
+    mismatched = [cycle for cycle in cycles
+                  if cycle['announced'] is None or abs(cycle['announced'] - cycle['actual']) > ANNOUNCED_TOLERANCE_SECONDS]
+    # In Echtzeit beginnt das Rendering mit dem Zyklus und muss bis zur Ansage fertig sein
+    late_renders = [cycle for cycle in cycles if cycle['render_wait'] > cycle['planned'] - cycle['start']]
+    render_waits = np.asarray([cycle['render_wait'] for cycle in cycles]) * 1000
+
+    report = {
+        'name': station.name,
+        'sample_rate': rate,
+        'output': station.output.describe(),
+        'timezone': str(station.timezone) if station.timezone else None,
+        'cycles': len(cycles),
+        'alignment_error_ms': _milliseconds(alignment_errors),
+        'beep_spacing_error_ms': _milliseconds(beep_errors),
+        'interval_errors': sum(abs(error) > REPLAY_TOLERANCE_SECONDS for error in interval_errors),
+        'announced_mismatches': len(mismatched),
+        'empty_announcements': sum(cycle['segments'] == 0 for cycle in cycles),
+        'render_ms': {'p50': float(np.percentile(render_waits, 50)), 'p95': float(np.percentile(render_waits, 95)),
+                      'max': float(render_waits.max())} if len(render_waits) else None,
+        'late_renders': len(late_renders),
+        'errors': errors,
+    }
+    report['ok'] = (report['cycles'] > 0 and not errors and report['interval_errors'] == 0
+                    and report['announced_mismatches'] == 0 and report['empty_announcements'] == 0
+                    and all(abs(error) <= REPLAY_TOLERANCE_SECONDS for error in alignment_errors + beep_errors))
+    if include_cycles:
+        report['timeline'] = [{
+            'cycle_start': _iso(cycle['start'], station.timezone),
+            'beeps': [_iso(beep, station.timezone) for beep in cycle['beeps']],
+            'planned': _iso(cycle['planned'], station.timezone),
+            'actual': _iso(cycle['actual'], station.timezone),
+            'announced': _iso(cycle['announced'], station.timezone) if cycle['announced'] is not None else None,
+            'segments': cycle['segments'],
+            'render_ms': cycle['render_wait'] * 1000,
+        } for cycle in cycles]
+    return report
+
+
+# --- Zeitraffer ---
+
+def run_replay(stations, start_time, duration_seconds, output_dir=None, report_path=None, include_cycles=True):
+    """
+    Spielt duration_seconds Zeitplan ab start_time (time.time()-Sekunden) so schnell
+    ab, wie die CPU es erlaubt: derselbe Zyklus- und Renderpfad wie im Betrieb, aber
+    mit SampleClock statt Wanduhr und ReplaySink statt FIFO. Mit output_dir landen die
+    Streams als Rohdaten im FIFO-Format in Dateien, sonst wird nicht umgerechnet. Gibt den Bericht zurück und schreibt ihn als
+    JSON nach report_path (sonst nur die Zusammenfassung auf stdout).
+    """
+    files = []
+    for station in stations:
+        output_file = None
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+            output_file = open(os.path.join(output_dir, f"{station.name}.{station.output.header_name}"), 'wb')
+            files.append(output_file)
+        else:
+            # Ohne Mitschnitt zählt nur der Zeitplan: die Umrechnung ins FIFO-Format (Resampling) entfällt
+            station.writer.output = OutputFormat(station.sample_rate)
+        station.timeline = []
+        station.on_cycle = None  # Die TTS-Deadline bezieht sich auf die Wanduhr; es gelten nur die Backend-Budgets
+        station.scheduler.clock = SampleClock(start_time, station.writer)
+        station.start(ReplaySink(station.output, output_file))
+
+    async def replay():
+        await asyncio.gather(*(station.run(until=start_time + duration_seconds) for station in stations))
+
+    print(f"INFO: Zeitraffer über {duration_seconds / 3600:.2f} Stunden ab {_iso(start_time, None)} "
+          f"für {len(stations)} Station(en)...")
+    wall_start = time.monotonic()
+    mute()
+    try:
+        asyncio.run(replay())
+    finally:
+        mute(False)
+        for output_file in files:
+            output_file.close()
+    wall_seconds = time.monotonic() - wall_start
+
+    station_reports = [timeline_report(station, start_time, include_cycles) for station in stations]
+    report = {
+        'start': _iso(start_time, None),
+        'simulated_seconds': duration_seconds,
+        'wall_seconds': wall_seconds,
+        'speedup': duration_seconds * len(stations) / wall_seconds if wall_seconds > 0 else None,
+        'cycles_per_second': sum(r['cycles'] for r in station_reports) / wall_seconds if wall_seconds > 0 else None,
+        'ok': all(r['ok'] for r in station_reports),
+        'stations': station_reports,
+    }
+    for r in station_reports:
+        print(f"INFO: [{r['name']}] {r['cycles']} Zyklen, Abweichung vom Raster max. {r['alignment_error_ms']['max']} ms, "
+              f"{r['announced_mismatches']} falsche Ansagen, {r['empty_announcements']} ohne Sprache, "
+              f"{len(r['errors'])} Fehler, {r['late_renders']} in Echtzeit zu spät gerendert"
+              f"{'' if r['ok'] else ' -- ZEITPLANFEHLER'}.")
+    print(f"INFO: {duration_seconds * len(stations):.0f} s Programm in {wall_seconds:.1f} s abgespielt "
+          f"({report['speedup']:.0f}-fache Echtzeit, {report['cycles_per_second']:.0f} Zyklen/s).")
+    if report_path:
+        with open(report_path, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+        print(f"INFO: Zeitplan-Bericht nach '{report_path}' geschrieben.")
+    return report
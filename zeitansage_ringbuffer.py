@@ -0,0 +1,254 @@
+import os
+import time
+import errno
+import fcntl
+import select
+import struct
+import termios
+import threading
+import numpy as np
+
+from zeitansage_log import log
+from zeitansage_metrics import METRICS
+from zeitansage_output import PACED_MAX_LEAD_SECONDS, WRITE_SECONDS, READER_CONNECTS, READER_DISCONNECTS, UNDERRUNS
+
+# --- Konfiguration ---
+RING_BUFFER_SECONDS = 4.0       # Kapazität des Ringpuffers zwischen Renderer und FIFO
+FIFO_RECONNECT_INTERVAL = 0.25  # Ohne Reader wird in diesem Abstand erneut versucht, die FIFO zu öffnen
+FIFO_POLL_TIMEOUT = 0.1         # Spätestens nach dieser Zeit prüft der Sink Reader und Puffer erneut
+FIFO_WRITE_CHUNK_SECONDS = 0.1  # Maximale Audiodauer pro write() auf die FIFO
+
+# --- Metriken ---
+OVERRUNS = METRICS.counter('zeitansage_ring_overruns_total',
+                           "Reader zu langsam: ungelesene Daten im Ringpuffer wurden überschrieben")
+OVERRUN_BYTES = METRICS.counter('zeitansage_ring_overrun_bytes_total', "Dabei übersprungene Bytes")
+
+
+# --- Ringpuffer ---
+
+class ByteRingBuffer:
+    """
+    Ringpuffer fester Größe für genau einen Produzenten und einen Konsumenten,
+    ohne Locks.
+
+    Beide Seiten zählen absolute Byte-Positionen seit dem Start. Nur der Produzent
+    schreibt die Positionen, wie bei einem Seqlock in zwei Schritten:
+    reserved_position vor dem Kopieren (bis hierher wird gerade geschrieben),
+    write_position danach (bis hierher sind die Daten gültig). Der Konsument führt
+    seine Leseposition selbst und prüft nach dem Kopieren gegen reserved_position,
+    ob der Produzent inzwischen in den gelesenen Bereich geschrieben hat. Der
+    Produzent wartet nie: ist der Konsument zu weit hinterher, sind seine Daten
+    überschrieben und read() springt vor (Überlauf).
+    """
+
+    def __init__(self, capacity_bytes, frame_bytes=4):
+        self.frame_bytes = frame_bytes
+        self.capacity = max(frame_bytes, capacity_bytes // frame_bytes * frame_bytes)
+        self.write_position = 0     # Bis hierher vollständig geschrieben
+        self.reserved_position = 0  # Bis hierher geschrieben oder gerade im Schreiben
+        self._data = np.zeros(self.capacity, dtype=np.uint8)
+
+    def write(self, views):
+        """Kopiert Byte-Views in den Puffer (nur vom Produzenten aufzurufen)."""
+        position = self.write_position
+        # Zuerst ankündigen, welche Bytes gleich überschrieben werden, dann kopieren
+        self.reserved_position = position + sum(len(view) for view in views)
+        for view in views:
+            chunk = np.frombuffer(view, dtype=np.uint8)
+            if len(chunk) > self.capacity:
+                position += len(chunk) - self.capacity  # Passt nicht: nur das Ende bleibt erhalten
+                chunk = chunk[-self.capacity:]
+            start = position % self.capacity
+            first = min(len(chunk), self.capacity - start)
+            self._data[start:start + first] = chunk[:first]
+            self._data[:len(chunk) - first] = chunk[first:]
+            position += len(chunk)
+        self.write_position = position  # Erst jetzt für den Konsumenten sichtbar
+
+    def available(self, position):
+        """Anzahl Bytes, die ab position noch ungelesen sind (kann über capacity liegen)."""
+        return self.write_position - position
+
+    def read(self, position, max_bytes):
+        """
+        Liest ab position höchstens max_bytes (nur vom Konsumenten aufzurufen).
+        Gibt (data, position, skipped_bytes) zurück: position zeigt auf das erste
+        gelieferte Byte, skipped_bytes ist die wegen Überlauf übersprungene Menge.
+        """
+        skipped = 0
+        while True:
+            end = self.write_position
+            reserved = self.reserved_position
+            if reserved - position > self.capacity:
+                # Überholt (auch von einem gerade laufenden Schreibvorgang): auf das älteste Byte vorspringen,
+                # das der Produzent nicht anfasst, ohne die Sample-Grenzen zu verlieren
+                lag = reserved - self.capacity - position
+                step = -(-lag // self.frame_bytes) * self.frame_bytes
+                position += step
+                skipped += step
+            length = min(end - position, max_bytes)
+            if length <= 0:
+                return b'', position, skipped
+            start = position % self.capacity
+            first = min(length, self.capacity - start)
+            data = self._data[start:start + first].tobytes() + self._data[:length - first].tobytes()
+            # Hat der Produzent während des Kopierens mit dem Überschreiben begonnen, sind die Daten ungültig: erneut lesen
+            if self.reserved_position - position <= self.capacity:
+                return data, position, skipped
+
+
+# --- FIFO-Ausgabe ---
+
+class FifoSink:
+    """
+    Entkoppelt den Renderer vom Reader der Named Pipe.
+
+    Der PcmStreamWriter schreibt nach der Uhr getaktet in einen Ringpuffer
+    (write_views()), ein eigener Thread leert ihn mit nicht blockierendem I/O und
+    poll() in die FIFO. Ohne Reader läuft die Produktion einfach weiter; ein neuer
+    Reader steigt an der Live-Position ein, ein zu langsamer springt vor
+    (Überlauf), ein leer gelaufener wird als Unterlauf gezählt.
+
+    Mit backpressure=True wartet der Writer stattdessen auf den Reader, wie früher
+    beim blockierenden open()/write() (für Offline-Läufe wie den Benchmark).
+    """
+
+    def __init__(self, path, output, buffer_seconds=RING_BUFFER_SECONDS, backpressure=False):
+        self.path = path
+        self.output = output
+        self.backpressure = backpressure
+        frame_bytes = output.bytes_per_sample
+        self.ring = ByteRingBuffer(int(buffer_seconds * output.sample_rate) * frame_bytes, frame_bytes)
+        self.position = None  # Leseposition des verbundenen Readers (None = kein Reader)
+        self.fd = None
+        self._chunk_bytes = max(frame_bytes, int(FIFO_WRITE_CHUNK_SECONDS * output.sample_rate) * frame_bytes)
+        # Der Writer läuft der Uhr bis zu PACED_MAX_LEAD_SECONDS voraus; so weit vor dem Schreibende liegt "jetzt"
+        self._live_lag_bytes = 0 if backpressure else int(PACED_MAX_LEAD_SECONDS * output.sample_rate) * frame_bytes
+        self._starved = False
+        self._progress = threading.Event()  # Für backpressure: Reader hat gelesen oder sich verbunden
+        self._wake_read, self._wake_write = os.pipe()
+        os.set_blocking(self._wake_read, False)
+        os.set_blocking(self._wake_write, False)
+
+    def start(self):
+        """Startet den Thread, der die FIFO bedient."""
+        threading.Thread(target=self._run, name="zeitansage-fifo", daemon=True).start()
+
+    # --- Produzentenseite (Renderer-Thread) ---
+
+    def write_views(self, views):
+        """Übernimmt einen Block Byte-Views in den Ringpuffer und weckt den Sink-Thread."""
+        if self.backpressure:
+            needed = sum(len(view) for view in views)
+            while True:
+                self._progress.clear()
+                position = self.position
+                if position is not None and self.ring.available(position) + needed <= self.ring.capacity:
+                    break
+                self._progress.wait(FIFO_POLL_TIMEOUT)
+        self.ring.write(views)
+        try:
+            os.write(self._wake_write, b'\0')
+        except BlockingIOError:
+            pass  # Der Sink ist ohnehin schon geweckt
+
+    def queued_bytes(self):
+        """Geschriebene, aber vom Reader noch nicht gelesene Bytes (Ringpuffer und FIFO)."""
+        position = self.position
+        if position is None:
+            return 0
+        return max(0, self.ring.available(position)) + self._fifo_queued_bytes()
+
+    # --- Konsumentenseite (Sink-Thread) ---
+
+    def _fifo_queued_bytes(self):
+        try:
+            return struct.unpack('i', fcntl.ioctl(self.fd, termios.FIONREAD, b'\0\0\0\0'))[0]
+        except (OSError, TypeError):
+            return 0
+
+    def _connect(self):
+        """Versucht, die FIFO ohne Blockieren zu öffnen; ohne Reader schlägt das mit ENXIO fehl."""
+        try:
+            self.fd = os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+        except OSError as e:
+            if e.errno not in (errno.ENXIO, errno.ENOENT):
+                log(f"FEHLER: FIFO '{self.path}' kann nicht geöffnet werden: {e}")
+            return False
+        # Neuer Reader: ab der Live-Position (dem Sample, das gerade an der Reihe ist) statt ab dem ältesten Inhalt
+        self.position = max(0, self.ring.write_position - self._live_lag_bytes)
+        self._starved = True  # Erst nach dem ersten Schreiben kann der Reader leer laufen
+        READER_CONNECTS.inc()
+        self._progress.set()
+        log(f"INFO: Reader an FIFO '{self.path}' verbunden, Einstieg an der Live-Position.")
+        return True
+
+    def _disconnect(self):
+        os.close(self.fd)
+        self.fd = None
+        self.position = None
+        READER_DISCONNECTS.inc()
+        log(f"INFO: Reader von FIFO '{self.path}' hat die Verbindung getrennt. Warte auf neuen Reader...")
+
+    def _drain_wakeups(self):
+        try:
+            while os.read(self._wake_read, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _overrun(self, skipped_bytes):
+        OVERRUNS.inc()
+        OVERRUN_BYTES.inc(skipped_bytes)
+        log(f"WARNUNG: FIFO-Reader zu langsam, {skipped_bytes // self.ring.frame_bytes} Samples übersprungen.")
+
+    def _write_pending(self):
+        """Schreibt so viel wie die FIFO gerade aufnimmt. Gibt False zurück, wenn der Reader weg ist."""
+        if self.ring.available(self.position) > self.ring.capacity:
+            # Reader hängt weiter zurück, als der Puffer reicht: einmal zur Live-Position vorspringen
+            # (in ganzen Samples relativ zur bisherigen Position, damit der Reader im Raster bleibt)
+            live = self.ring.write_position - self._live_lag_bytes
+            skipped = (live - self.position) // self.ring.frame_bytes * self.ring.frame_bytes
+            self.position += skipped
+            self._overrun(skipped)
+        while True:
+            data, position, skipped = self.ring.read(self.position, self._chunk_bytes)
+            if skipped:  # Der Renderer hat während des Lesens überholt
+                self._overrun(skipped)
+            self.position = position
+            if not data:
+                if not self._starved and self._fifo_queued_bytes() == 0:
+                    self._starved = True
+                    UNDERRUNS.inc()  # Reader hat alles gelesen und wartet auf neue Samples
+                return True
+            try:
+                with WRITE_SECONDS.time():
+                    written = os.write(self.fd, data)
+            except BlockingIOError:
+                return True  # FIFO voll: poll() meldet, wenn wieder Platz ist
+            except BrokenPipeError:
+                return False
+            self.position += written
+            self._starved = False
+            self._progress.set()
+            if written < len(data):
+                return True
+
+    def _run(self):
+        poller = select.poll()
+        poller.register(self._wake_read, select.POLLIN)
+        while True:
+            if self.fd is None:
+                if not self._connect():
+                    time.sleep(FIFO_RECONNECT_INTERVAL)
+                    self._drain_wakeups()
+                    continue
+                poller.register(self.fd, select.POLLOUT)
+            # POLLOUT nur anfordern, solange Daten anstehen; POLLERR (Reader weg) kommt immer
+            pending = self.ring.available(self.position) > 0
+            poller.modify(self.fd, select.POLLOUT if pending else 0)
+            events = dict(poller.poll(FIFO_POLL_TIMEOUT * 1000))
+            self._drain_wakeups()
+            if events.get(self.fd, 0) & (select.POLLERR | select.POLLHUP) or not self._write_pending():
+                poller.unregister(self.fd)
+                self._disconnect()
@@ -0,0 +1,271 @@
+import os
+import time
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from zeitansage_archive import build_day_archive, load_announcement_archive
+from zeitansage_clips import PhraseClipEngine
+from zeitansage_config import ConfigWatcher, module_settings, settings_languages
+from zeitansage_log import log
+from zeitansage_network import StreamBroadcaster
+from zeitansage_output import OutputFormat, PcmStreamWriter
+from zeitansage_pipeline import create_render_pool
+from zeitansage_replay import run_replay
+from zeitansage_ringbuffer import FifoSink
+from zeitansage_scheduler import SampleScheduler
+from zeitansage_stations import create_station, run_stations
+
+# --- Konfiguration ---
+MAIN_LOOP_RETRY_SECONDS = 5  # Nach einem Fehler im Haupt-Loop beginnt der nächste Zyklus nach dieser Pause
+
+# Gemeinsamer Ablauf von zeitansage.py und zeitansage2.py. Die Funktionen hier lesen die Einstellungen
+# direkt aus dem Skriptmodul (script.SAMPLE_RATE, ...), damit neu geladene Werte sofort gelten. Jedes Skript
+# stellt dafür archive_params(), active_languages(), time_formats(), update_settings() und
+# single_station_config() bereit.
+
+
+# --- Start ---
+
+def load_config(script, config_path, startup):
+    """
+    Liest die Konfigurationsdatei (ohne config_path script.CONFIG_PATH, falls vorhanden).
+    Gibt (ConfigWatcher oder None, Einstellungen) zurück; die Einstellungen sind None,
+    wenn die Datei nicht gelesen werden kann.
+    """
+    if config_path is None and os.path.exists(script.CONFIG_PATH):
+        config_path = script.CONFIG_PATH
+    if config_path is None:
+        return None, {}
+    with startup.phase('Konfiguration'):
+        config_watcher = ConfigWatcher(config_path, script, module_settings(script, exclude=script.DERIVED_SETTINGS))
+        settings = config_watcher.load()
+    if settings is not None:
+        log(f"INFO: {len(settings)} Einstellungen aus '{config_path}' übernommen.")
+    return config_watcher, settings
+
+
+def create_clip_engine(script, tts):
+    """
+    Phrasen-Clips für alle angesagten Sprachen (im Mehrstationen-Betrieb nur die, die eine
+    Station ansagt; jede Phrase gibt es nur einmal). Gerendert wird erst beim Aufwärmen.
+    """
+    clip_engine = PhraseClipEngine(tts.render_for_cycle, script.SAMPLE_RATE)
+    languages = script.active_languages()
+    for lang_code, time_format in script.time_formats().items():
+        if lang_code in languages:
+            clip_engine.add_language(lang_code, time_format)
+    return clip_engine
+
+
+# --- Ansage-Zustand ---
+
+class AnnouncementState:
+    """
+    Phrasen-Clips, Tagesarchiv und TTS-Zyklus eines Skripts. warm_up() lädt beim Start
+    das Tagesarchiv oder rendert die Clips; apply_changes() übernimmt an jeder Zyklusgrenze
+    geänderte Einstellungen. Neu gerendert werden nur die Clips betroffener Sprachen, im
+    Hintergrund und ohne Zyklus-Deadline; bis sie fertig sind, laufen die bisherigen Clips
+    weiter. on_change(changes, previous) passt die übrigen Teile des Skripts an (previous
+    enthält die bisherigen Werte der geänderten Einstellungen).
+    """
+
+    def __init__(self, script, config_watcher, clip_engine, tts, render_pool, on_change=None):
+        self.script = script
+        self.config_watcher = config_watcher
+        self.clip_engine = clip_engine
+        self.tts = tts
+        self.render_pool = render_pool
+        self.on_change = on_change
+        self.archive = None   # Passendes Tagesarchiv, sonst werden die Zeitansagen zusammengesetzt
+        self.schedulers = []  # Scheduler, die UPDATE_INTERVAL_SECONDS folgen
+        self._pending = []    # Futures von _prepare() in Auftragsreihenfolge
+        self._reload_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="zeitansage-reload")
+        # Eigener Pool, damit der laufende Zyklus nicht hinten ansteht
+        self._reload_render_pool = create_render_pool(script.RENDER_WORKERS)
+
+    def warm_up(self):
+        """Liest ein passendes Tagesarchiv per mmap; ohne Archiv werden alle Phrasen-Clips gerendert."""
+        script = self.script
+        self.archive = load_announcement_archive(script.ANNOUNCEMENT_ARCHIVE_PATH, script.SAMPLE_RATE,
+                                                 script.UPDATE_INTERVAL_SECONDS, script.archive_params())
+        if self.archive is None:
+            self.clip_engine.warm_up(self.render_pool)
+            self.tts.report()
+
+    def begin_cycle(self, announcement_time):
+        """Setzt die Deadline der TTS-Engine für den Zyklus, der um announcement_time beginnt."""
+        self.tts.begin_cycle(announcement_time - self.script.TTS_DEADLINE_MARGIN_SECONDS)
+
+    def begin_station_cycle(self, announcement_time):
+        """on_cycle der Stationen: Einstellungen übernehmen und den Zyklus beginnen."""
+        self.apply_changes()
+        self.begin_cycle(announcement_time)
+
+    def apply_changes(self):
+        """An einer Zyklusgrenze: fertig vorbereitete Clips übernehmen und geänderte Einstellungen anwenden."""
+        self._install_prepared()
+        changes = self.config_watcher.changes() if self.config_watcher is not None else {}
+        for name in [name for name in changes if name not in self.script.RELOADABLE_SETTINGS]:
+            log(f"WARNUNG: Die geänderte Einstellung '{name}' wird erst nach einem Neustart wirksam.")
+            del changes[name]
+        if not changes:
+            return
+        log(f"INFO: Übernehme geänderte Einstellungen: {', '.join(sorted(changes))}.")
+        script = self.script
+        archive_state = (script.archive_params(), script.UPDATE_INTERVAL_SECONDS)
+        previous = {name: getattr(script, name) for name in changes}
+        script.update_settings(changes)
+
+        for scheduler in self.schedulers:
+            scheduler.interval_seconds = script.UPDATE_INTERVAL_SECONDS
+        self.tts.processor.target_rms_db = script.SPEECH_TARGET_RMS_DB
+        if self.on_change is not None:
+            self.on_change(changes, previous)
+        self._reload_languages(changes, archive_state)
+
+    def _install_prepared(self):
+        while self._pending and self._pending[0].done():
+            prepared, drop_archive = self._pending.pop(0).result()
+            self.clip_engine.install(prepared)
+            if drop_archive:
+                self.archive = None  # Passt nicht mehr zu den Einstellungen, ab jetzt wird zusammengesetzt
+            log(f"INFO: Neue Phrasen-Clips für {', '.join(prepared[0])} übernommen.")
+
+    def _reload_languages(self, changes, archive_state):
+        """Nur Sprachen mit geänderten Parametern neu rendern; bei gemeinsamen Parametern oder veraltetem Tagesarchiv alle."""
+        script, clip_engine = self.script, self.clip_engine
+        languages = script.active_languages()
+        for lang_code in [lang_code for lang_code in clip_engine.templates if lang_code not in languages]:
+            clip_engine.remove_language(lang_code)
+        drop_archive = self.archive is not None and (script.archive_params(), script.UPDATE_INTERVAL_SECONDS) != archive_state
+        if drop_archive or 'SPEECH_TARGET_RMS_DB' in changes:
+            stale = languages
+        else:
+            stale = settings_languages(changes, languages)
+            stale += [lang_code for lang_code in languages if lang_code not in clip_engine.templates]
+        time_formats = {lang_code: time_format for lang_code, time_format in script.time_formats().items()
+                        if lang_code in stale}
+        if time_formats:
+            self._pending.append(self._reload_pool.submit(self._prepare, time_formats, drop_archive))
+
+    def _prepare(self, time_formats, drop_archive):
+        log(f"INFO: Rendere Phrasen-Clips für {', '.join(time_formats)} im Hintergrund neu...")
+        return self.clip_engine.prepare_languages(time_formats, self._reload_render_pool, self.tts.render), drop_archive
+
+
+# --- Betriebsarten ---
+
+def run_archive_build(script, clip_engine, render_pool):
+    """Batch-Modus: alle Zeitansagen des Tages auf allen Kernen in ein Archiv rendern. Gibt den Exit-Code zurück."""
+    if clip_engine.warm_up(render_pool) > 0:
+        log("FEHLER: Nicht alle Phrasen-Clips konnten gerendert werden, Tagesarchiv wird nicht erstellt.")
+        return 1
+    build_day_archive(script.ANNOUNCEMENT_ARCHIVE_PATH, clip_engine, script.UPDATE_INTERVAL_SECONDS, script.archive_params())
+    return 0
+
+
+def run_station_mode(script, state, startup, station_renderer, countdown, replay_hours=None, replay_start=None,
+                     replay_output=None, replay_report=None):
+    """
+    Mehrstationen-Betrieb: alle Stationen auf einer Ereignisschleife, gerendert wird für alle gemeinsam.
+    Der Zeitraffer (replay_hours) nutzt denselben Pfad, ohne Stationsliste mit einer Station nach den
+    FIFO-Einstellungen. station_renderer(config) liefert render_segments(when) einer Station.
+    Gibt den Exit-Code zurück; der Mehrstationen-Betrieb selbst kehrt nicht zurück.
+    """
+    station_configs = script.STATIONS or [script.single_station_config()]
+    stations = [create_station(config, script.SAMPLE_RATE, station_renderer(config), countdown,
+                               script.UPDATE_INTERVAL_SECONDS, on_cycle=state.begin_station_cycle,
+                               create_fifo=replay_hours is None)
+                for config in station_configs]
+    if None in stations:
+        return 1
+    state.schedulers.extend(station.scheduler for station, config in zip(stations, station_configs)
+                            if 'interval_seconds' not in config)
+    if replay_hours is not None:
+        startup.ready.wait()  # Der Zeitraffer beginnt erst mit fertigen Clips
+        report = run_replay(stations, replay_start or time.time(), replay_hours * 3600, replay_output, replay_report)
+        return 0 if report['ok'] else 1
+    if state.config_watcher is not None:
+        state.config_watcher.start()
+    startup.on_air()
+    run_stations(stations, ready=startup.ready)
+    return 0
+
+
+def create_stream_writer(script, fifo_output):
+    """
+    Writer des Einzelbetriebs. Er schreibt in den Ringpuffer der FIFO, den der FIFO-Sink in
+    einem eigenen Thread leert; Reader können jederzeit kommen und gehen, ohne dass ein
+    Countdown oder eine Ansage verloren geht oder die Produktion stockt. Optional geht
+    derselbe Stream zusätzlich an Netzwerk-Clients.
+    """
+    writer = PcmStreamWriter(script.SAMPLE_RATE, output=fifo_output)
+    if script.ENABLE_FIFO_OUTPUT:
+        fifo_sink = FifoSink(script.FIFO_PATH, fifo_output)
+        fifo_sink.start()
+        writer.attach(fifo_sink)
+    else:
+        writer.attach(None)  # Ohne FIFO wird nur an die Netzwerk-Clients gesendet
+
+    if (script.STREAM_TCP_PORT is not None or script.STREAM_HTTP_PORT is not None or script.STREAM_UDP_PORT is not None
+            or script.STREAM_UDP_TARGETS):
+        stream_output = OutputFormat(script.SAMPLE_RATE, script.STREAM_SAMPLE_RATE, script.STREAM_SAMPLE_FORMAT)
+        broadcaster = StreamBroadcaster(stream_output.sample_rate, script.STREAM_HOST, tcp_port=script.STREAM_TCP_PORT,
+                                        http_port=script.STREAM_HTTP_PORT, udp_port=script.STREAM_UDP_PORT,
+                                        udp_targets=script.STREAM_UDP_TARGETS, sample_format=stream_output.sample_format)
+        broadcaster.start()
+        writer.add_tap(broadcaster.publish, stream_output)
+    return writer
+
+
+def run_cycle(writer, scheduler, look_ahead, countdown, state):
+    """Ein Ansage-Zyklus im Einzelbetrieb: Füll-Stille bis zum nächsten Rasterzeitpunkt, Countdown und Ansage."""
+    state.apply_changes()
+
+    # Nächsten Rasterzeitpunkt bestimmen und die Ansage dafür schon jetzt im Hintergrund rendern
+    announcement_time = scheduler.next_announcement_time(writer)
+    state.begin_cycle(announcement_time)
+    look_ahead.schedule(datetime.datetime.fromtimestamp(announcement_time))
+
+    # Füll-Stille wird jeden Zyklus neu gegen die Wanduhr berechnet und gleicht so Drift aus
+    silence_samples = scheduler.filler_samples(writer, announcement_time)
+    if silence_samples > 0:
+        log(f"Warte {silence_samples / countdown.sample_rate:.2f} Sekunden bis zum nächsten Ansage-Zyklus...")
+        writer.write_silence(silence_samples)  # Aus dem vorab angelegten Stille-Puffer
+
+    log(f"Beginne {countdown.beats}-Sekunden-Countdown...")
+    writer.write_samples(countdown.render(announcement_time))  # Vorab berechneter Block, ein Schreibaufruf
+
+    # Abweichung vom Sekundenraster und Drift der Sample-Zählung messen
+    scheduler.measure(writer, announcement_time)
+
+    # Die Segmente wurden während Stille und Countdown für genau diesen Zeitpunkt vorab gerendert
+    target_time, segments = look_ahead.collect()
+    log(f"Sende Ansage für {target_time:%H:%M:%S}.")
+    writer.write_segments(segments)  # Alle Segmente mit möglichst wenigen Systemaufrufen
+
+    log(f"Alle Ansagen gesendet. Abweichung vom Raster: {scheduler.alignment_error_seconds * 1000:+.0f} ms, "
+        f"Drift: {scheduler.drift_seconds * 1000:+.0f} ms.")
+
+
+def run_single_fifo(script, state, startup, look_ahead, countdown, fifo_output):
+    """Einzelbetrieb: ein Stream in die FIFO (und optional ins Netz) im Takt der Wanduhr (kehrt nicht zurück)."""
+    writer = create_stream_writer(script, fifo_output)
+
+    # Richtet die Ansagen nach der Wanduhr auf das Sekundenraster von UPDATE_INTERVAL_SECONDS aus
+    scheduler = SampleScheduler(script.SAMPLE_RATE, script.UPDATE_INTERVAL_SECONDS, countdown.seconds)
+    scheduler.attach(writer)
+    state.schedulers.append(scheduler)
+    if state.config_watcher is not None:
+        state.config_watcher.start()
+
+    # Bis alle Startphasen fertig sind, nur Stille senden; danach richtet der erste Zyklus wieder auf das Raster aus
+    startup.on_air()
+    writer.write_silence_until(startup.ready)
+
+    while True:
+        try:
+            run_cycle(writer, scheduler, look_ahead, countdown, state)
+        except Exception as e:
+            log(f"FEHLER im Haupt-Loop: {e}. Versuche es erneut in {MAIN_LOOP_RETRY_SECONDS} Sekunden.")
+            time.sleep(MAIN_LOOP_RETRY_SECONDS)
@@ -0,0 +1,81 @@
+import math
+import time
+
+from zeitansage_log import log
+from zeitansage_metrics import METRICS
+
+# --- Konfiguration ---
+DRIFT_WARNING_SECONDS = 0.05  # Ab dieser Abweichung der Ansage vom Sekundenraster wird gewarnt
+
+# --- Metriken ---
+ALIGNMENT_ERROR = METRICS.gauge('zeitansage_alignment_error_seconds',
+                                "Abweichung der letzten Ansage vom Sekundenraster (positiv = zu spät)")
+DRIFT = METRICS.gauge('zeitansage_drift_seconds', "Drift der Sample-Zählung gegenüber der Wanduhr seit Verbindungsbeginn")
+
+
+# --- Zeitplanung ---
+
+class SampleScheduler:
+    """
+    Richtet die Ansage-Zyklen nach der Wanduhr aus statt nach dem Staudruck der FIFO.
+
+    Die Ansagen beginnen exakt auf Vielfachen von interval_seconds (bei 15 s also
+    :00/:15/:30/:45), der Countdown entsprechend countdown_seconds davor. Die
+    Fülllänge der Stille wird für jeden Zyklus aus Wanduhr, geschriebenen und noch
+    in der FIFO liegenden Samples neu berechnet, so dass sich Drift nicht aufsummiert.
+    """
+
+    def __init__(self, sample_rate, interval_seconds, countdown_seconds, clock=time.time):
+        self.sample_rate = sample_rate
+        self.interval_seconds = interval_seconds
+        self.countdown_seconds = countdown_seconds
+        self.clock = clock
+        self.drift_seconds = 0.0            # Abweichung Sample-Zählung gegenüber Wanduhr seit attach()
+        self.alignment_error_seconds = 0.0  # Abweichung der letzten Ansage vom geplanten Zeitpunkt
+        self._anchor = None                 # Wanduhrzeit, zu der Sample 0 abgespielt wurde
+        self._last_announcement = None      # Zuletzt geplanter Ansagezeitpunkt
+
+    def attach(self, writer):
+        """Setzt die Referenz zurück, z.B. nachdem ein neuer Reader die FIFO geöffnet hat."""
+        self._anchor = self.playout_time(writer) - writer.samples_written / self.sample_rate
+        self.drift_seconds = 0.0
+
+    def playout_time(self, writer):
+        """Wanduhrzeit, zu der das nächste geschriebene Sample beim Reader ankommt."""
+        return self.clock() + writer.queued_samples() / self.sample_rate
+
+    def next_announcement_time(self, writer):
+        """
+        Nächster Rasterzeitpunkt, vor dem der komplette Countdown noch Platz hat.
+        Derselbe Zeitpunkt wird nie zweimal angesagt, auch wenn der Reader schneller
+        als in Echtzeit liest.
+        """
+        earliest = self.playout_time(writer) + self.countdown_seconds
+        announcement_time = math.ceil(earliest / self.interval_seconds) * self.interval_seconds
+        if self._last_announcement is not None:
+            announcement_time = max(announcement_time, self._last_announcement + self.interval_seconds)
+        self._last_announcement = announcement_time
+        return announcement_time
+
+    def filler_samples(self, writer, announcement_time):
+        """Anzahl Stille-Samples, damit der Countdown exakt zum geplanten Zeitpunkt beginnt."""
+        countdown_start = announcement_time - self.countdown_seconds
+        return max(0, round((countdown_start - self.playout_time(writer)) * self.sample_rate))
+
+    def measure(self, writer, planned_time):
+        """
+        Misst nach dem Countdown die Abweichung des aktuellen Abspielzeitpunkts vom
+        Plan und die Drift der Sample-Zählung gegenüber der Wanduhr.
+        Gibt die Abweichung vom Plan in Sekunden zurück (positiv = zu spät).
+        """
+        playout = self.playout_time(writer)
+        if self._anchor is None:
+            self.attach(writer)
+        self.drift_seconds = playout - (self._anchor + writer.samples_written / self.sample_rate)
+        self.alignment_error_seconds = playout - planned_time
+        ALIGNMENT_ERROR.set(self.alignment_error_seconds)
+        DRIFT.set(self.drift_seconds)
+        if abs(self.alignment_error_seconds) > DRIFT_WARNING_SECONDS:
+            log(f"WARNUNG: Ansage weicht um {self.alignment_error_seconds * 1000:+.0f} ms vom Sekundenraster ab "
+                f"(Drift seit Verbindungsbeginn: {self.drift_seconds * 1000:+.0f} ms).")
+        return self.alignment_error_seconds
@@ -0,0 +1,142 @@
+import numpy as np
+
+# --- Konfiguration ---
+TONE_RAMP_SECONDS = 0.005         # Ein- und Ausblenden jedes Tons (Raised-Cosine), verhindert Knackser
+TIMECODE_CARRIER_HZ = 1000        # IRIG-B-Träger (B12x: amplitudenmodulierter 1-kHz-Sinus)
+TIMECODE_MARK_SPACE_RATIO = 10 / 3  # Amplitudenverhältnis von Puls zu Pause (IRIG-Standard 10:3)
+IRIG_B_BITS_PER_SECOND = 100      # Ein Rahmen pro Sekunde, 100 Bits à 10 ms
+
+# Pulsdauer je Symbol in Bit-Anteilen: 0 = 2 ms, 1 = 5 ms, Positionsmarke = 8 ms
+_IRIG_PULSE_FRACTIONS = np.array([0.2, 0.5, 0.8])
+_IRIG_MARKER = 2
+# Bit-Positionen und Wertigkeiten der BCD-Felder eines IRIG-B-Rahmens (Tageszeit, Tag des Jahres, Jahr)
+_IRIG_FIELDS = {
+    'seconds': ((1, 2, 3, 4, 6, 7, 8), (1, 2, 4, 8, 10, 20, 40)),
+    'minutes': ((10, 11, 12, 13, 15, 16, 17), (1, 2, 4, 8, 10, 20, 40)),
+    'hours': ((20, 21, 22, 23, 25, 26), (1, 2, 4, 8, 10, 20)),
+    'day': ((30, 31, 32, 33, 35, 36, 37, 38, 40, 41), (1, 2, 4, 8, 10, 20, 40, 80, 100, 200)),
+    'tenths': ((45, 46, 47, 48), (1, 2, 4, 8)),
+    'year': ((50, 51, 52, 53, 55, 56, 57, 58), (1, 2, 4, 8, 10, 20, 40, 80)),
+}
+_IRIG_MARKER_BITS = (0, 9, 19, 29, 39, 49, 59, 69, 79, 89, 99)
+_IRIG_SBS_BITS = tuple(range(80, 89)) + tuple(range(90, 98))  # Sekunden des Tages, binär (2^0 bis 2^16)
+
+
+# --- Töne ---
+
+def raised_cosine_envelope(num_samples, ramp_samples):
+    """Hüllkurve mit Raised-Cosine-Flanken (Länge ramp_samples) und flachem Mittelteil."""
+    envelope = np.ones(num_samples, dtype=np.float32)
+    ramp_samples = min(ramp_samples, num_samples // 2)
+    if ramp_samples > 0:
+        ramp = 0.5 - 0.5 * np.cos(np.pi * np.arange(ramp_samples) / ramp_samples)
+        envelope[:ramp_samples] = ramp
+        envelope[num_samples - ramp_samples:] = ramp[::-1]
+    return envelope
+
+
+def generate_tone(freq, duration, sample_rate, volume, ramp_seconds=TONE_RAMP_SECONDS):
+    """Sinuston (float32) mit weichen Flanken."""
+    num_samples = int(sample_rate * duration)
+    t = np.arange(num_samples) / sample_rate
+    tone = volume * np.sin(2 * np.pi * freq * t) * raised_cosine_envelope(num_samples, int(ramp_seconds * sample_rate))
+    return tone.astype(np.float32)
+
+
+# --- Zeitcode ---
+
+def _bcd_bits(values, weights):
+    """Zerlegt values (Array) in die Bits der BCD-Wertigkeiten weights (größte zuerst abziehen)."""
+    remaining = values.copy()
+    bits = np.zeros((len(values), len(weights)), dtype=np.int8)
+    for index in sorted(range(len(weights)), key=lambda i: -weights[i]):
+        bit = remaining >= weights[index]
+        bits[:, index] = bit
+        remaining -= bit * weights[index]
+    return bits
+
+
+def irig_b_frames(timestamps):
+    """
+    IRIG-B-Rahmen (UTC) für ein Array von time.time()-Zeitpunkten: (n, 100) Symbole
+    0, 1 oder Positionsmarke. Enthält Sekunde, Minute, Stunde, Tag des Jahres,
+    Zehntelsekunde, Jahr und die Sekunden des Tages (SBS).
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    seconds = np.floor(timestamps).astype(np.int64)
+    days = seconds // 86400
+    second_of_day = seconds - days * 86400
+    years = days.astype('datetime64[D]').astype('datetime64[Y]')
+    values = {
+        'seconds': second_of_day % 60,
+        'minutes': second_of_day // 60 % 60,
+        'hours': second_of_day // 3600,
+        'day': days - years.astype('datetime64[D]').astype(np.int64) + 1,
+        'tenths': np.floor((timestamps - seconds) * 10).astype(np.int64),
+        'year': (years.astype(np.int64) + 1970) % 100,
+    }
+    frames = np.zeros((len(timestamps), IRIG_B_BITS_PER_SECOND), dtype=np.int8)
+    for name, (positions, weights) in _IRIG_FIELDS.items():
+        frames[:, positions] = _bcd_bits(values[name], weights)
+    frames[:, _IRIG_SBS_BITS] = (second_of_day[:, None] >> np.arange(len(_IRIG_SBS_BITS))) & 1
+    frames[:, _IRIG_MARKER_BITS] = _IRIG_MARKER
+    return frames
+
+
+def irig_b_signal(start_time, num_samples, sample_rate, volume, carrier_hz=TIMECODE_CARRIER_HZ):
+    """
+    IRIG-B als amplitudenmodulierter Träger (float32), ein Rahmen pro Sekunde ab
+    start_time. Vollständig vektorisiert: Symbol und Pulsdauer jedes Samples werden
+    aus seiner Position im Rahmen berechnet, nicht Bit für Bit zusammengesetzt.
+    """
+    t = np.arange(num_samples) / sample_rate
+    frame_index = t.astype(np.int64)
+    frames = irig_b_frames(start_time + np.arange(frame_index[-1] + 1 if num_samples else 0))
+    slot_position = (t - frame_index) * IRIG_B_BITS_PER_SECOND
+    slot = np.minimum(slot_position.astype(np.int64), IRIG_B_BITS_PER_SECOND - 1)
+    pulse = slot_position - slot < _IRIG_PULSE_FRACTIONS[frames[frame_index, slot]]
+    amplitude = np.where(pulse, volume, volume / TIMECODE_MARK_SPACE_RATIO)
+    return (amplitude * np.sin(2 * np.pi * carrier_hz * t)).astype(np.float32)
+
+
+# --- Countdown ---
+
+class CountdownBlock:
+    """
+    Der komplette Countdown (beats Töne im Abstand beat_interval, der letzte optional
+    mit eigener Frequenz und Dauer) als ein vorab berechneter Block, der pro Zyklus
+    mit einem einzigen Schreibaufruf gesendet wird. Mit timecode_volume wird ein
+    IRIG-B-Zeitcode (UTC, ein Rahmen pro Sekunde ab Countdown-Beginn) beigemischt,
+    an dem sich Empfänger ohne Spracherkennung synchronisieren können.
+    """
+
+    def __init__(self, sample_rate, beats, beat_interval, frequency, duration, volume, final_frequency=None,
+                 final_duration=None, ramp_seconds=TONE_RAMP_SECONDS, timecode_volume=None):
+        self.sample_rate = sample_rate
+        self.beats = beats
+        self.beat_samples = int(beat_interval * sample_rate)
+        self.seconds = beats * beat_interval
+        self.timecode_volume = timecode_volume
+        beat = np.zeros(self.beat_samples, dtype=np.float32)
+        tone = generate_tone(frequency, duration, sample_rate, volume, ramp_seconds)
+        beat[:len(tone)] = tone[:self.beat_samples]
+        block = np.tile(beat, beats)
+        if beats and (final_frequency is not None or final_duration is not None):
+            final_tone = generate_tone(final_frequency or frequency, final_duration or duration, sample_rate, volume,
+                                       ramp_seconds)
+            final_start = (beats - 1) * self.beat_samples
+            block[final_start:] = 0.0
+            block[final_start:final_start + len(final_tone)] = final_tone[:self.beat_samples]
+        block.flags.writeable = False  # Wird ohne Zeitcode unverändert in jedem Zyklus geschrieben
+        self.block = block
+
+    def beat_offsets(self):
+        """Sample-Positionen der Töne innerhalb des Blocks."""
+        return [beat * self.beat_samples for beat in range(self.beats)]
+
+    def render(self, announcement_time):
+        """Der Countdown vor announcement_time (time.time()); ohne Zeitcode immer derselbe Block."""
+        if not self.timecode_volume:
+            return self.block
+        start_time = announcement_time - len(self.block) / self.sample_rate
+        return self.block + irig_b_signal(start_time, len(self.block), self.sample_rate, self.timecode_volume)
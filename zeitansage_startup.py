@@ -0,0 +1,81 @@
+import time
+import threading
+import contextlib
+
+from zeitansage_log import log
+from zeitansage_metrics import METRICS
+
+# --- Metriken ---
+READY = METRICS.gauge('zeitansage_ready',
+                      "1, sobald der Start abgeschlossen ist und Ansagen gesendet werden (vorher nur Stille)")
+STARTUP_PHASE_SECONDS = METRICS.gauge('zeitansage_startup_phase_seconds', "Dauer der einzelnen Startphasen", ('phase',))
+
+
+# --- Start in Phasen ---
+
+class StartupPhases:
+    """
+    Misst den Start in Phasen und hält den Bereit-Zustand. Die Skripte senden ab
+    on_air() sofort Stille; die teuren Phasen (TTS-Engine, Phrasen-Clips, Wetter)
+    laufen währenddessen gleichzeitig im Hintergrund (run_in_background()). Erst
+    wenn alle fertig sind, wird ready gesetzt und der erste Zyklus beginnt.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.timings = {}           # Phase -> Dauer in Sekunden
+        self.on_air_seconds = None  # Vom Start bis zum ersten Sample auf dem Stream
+        self.ready_seconds = None   # Vom Start bis zur Bereitschaft für Ansagen
+        self.ready = threading.Event()
+        READY.set(0)
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Misst die Dauer einer Phase: with startup.phase('Konfiguration'): ..."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.monotonic() - start
+            STARTUP_PHASE_SECONDS.labels(phase=name).set(self.timings[name])
+
+    def on_air(self):
+        """Vermerkt den Sendebeginn: ab hier liegt (vorerst Stille) auf dem Stream."""
+        self.on_air_seconds = self.elapsed()
+        log(f"INFO: Sendebeginn nach {self.on_air_seconds:.2f} Sekunden, bis zur Bereitschaft wird Stille gesendet.")
+
+    def _run_phase(self, name, func):
+        try:
+            with self.phase(name):
+                func()
+        except Exception as e:
+            log(f"FEHLER: Startphase '{name}' fehlgeschlagen: {e}")
+
+    def run_in_background(self, phases):
+        """
+        Führt phases ({Name: Funktion}) gleichzeitig in Hintergrund-Threads aus und
+        meldet Bereitschaft, sobald alle abgeschlossen sind. Eine fehlgeschlagene Phase
+        hält den Start nicht auf; ihre Arbeit wird im Betrieb bei Bedarf nachgeholt.
+        """
+        threads = [threading.Thread(target=self._run_phase, args=(name, func), name=f"zeitansage-start-{index}", daemon=True)
+                   for index, (name, func) in enumerate(phases.items())]
+        for thread in threads:
+            thread.start()
+
+        def wait_for_phases():
+            for thread in threads:
+                thread.join()
+            self.set_ready()
+
+        threading.Thread(target=wait_for_phases, name="zeitansage-start", daemon=True).start()
+
+    def set_ready(self):
+        """Meldet Bereitschaft und gibt die Dauer aller Phasen aus."""
+        self.ready_seconds = self.elapsed()
+        READY.set(1)
+        self.ready.set()
+        phases = ", ".join(f"{name} {seconds:.2f} s" for name, seconds in self.timings.items())
+        log(f"INFO: Bereit nach {self.ready_seconds:.2f} Sekunden ({phases}).")
@@ -0,0 +1,207 @@
+import os
+import stat
+import time
+import asyncio
+import datetime
+from zoneinfo import ZoneInfo
+
+from zeitansage_log import log
+from zeitansage_metrics import METRICS
+from zeitansage_output import PACED_MAX_LEAD_SECONDS, WRITE_BATCH_SECONDS, OutputFormat, PcmStreamWriter
+from zeitansage_pipeline import LookAheadRenderer
+from zeitansage_ringbuffer import FifoSink
+from zeitansage_scheduler import SampleScheduler
+
+# --- Konfiguration ---
+STATION_RETRY_SECONDS = 5  # Nach einem Fehler beginnt der Zyklus einer Station nach dieser Pause neu
+
+# --- Metriken ---
+STATION_COUNT = METRICS.gauge('zeitansage_stations', "Anzahl der Stationen, die dieser Prozess bedient")
+
+
+# --- Hilfsfunktionen ---
+
+def ensure_fifo(path):
+    """Legt die Named Pipe an, falls nötig. Gibt False zurück, wenn das nicht möglich ist."""
+    if os.path.exists(path):
+        if not stat.S_ISFIFO(os.stat(path).st_mode):
+            log(f"FEHLER: '{path}' existiert, ist aber keine Named Pipe. Bitte löschen oder umbenennen.")
+            return False
+        return True
+    try:
+        os.mkfifo(path)
+        log(f"Named Pipe (FIFO) '{path}' erstellt.")
+        return True
+    except OSError as e:
+        log(f"FEHLER: Konnte Named Pipe '{path}' nicht erstellen: {e}")
+        log("Stellen Sie sicher, dass Sie die Berechtigung haben, in diesem Verzeichnis zu schreiben.")
+        return False
+
+
+def station_languages(stations, default_languages):
+    """Alle Sprachen, die mindestens eine Station ansagt (in der Reihenfolge von default_languages)."""
+    used = {lang_code for config in stations for lang_code in (config.get('languages') or default_languages)}
+    return [lang_code for lang_code in default_languages if lang_code in used]
+
+
+# --- Stationen ---
+
+class Station:
+    """
+    Eine Ausgabe im Mehrstationen-Betrieb mit eigener FIFO, Zeitzone, Sprachauswahl,
+    Intervall und Ausgabeformat.
+
+    Gerendert wird nicht pro Station: render_segments(when) setzt die Ansage aus den
+    gemeinsamen Phrasen-Clips (und dem gemeinsamen Wetter) zusammen. Pro Station
+    bleiben nur Writer, Ringpuffer, Zeitplan und das Vorab-Rendering des nächsten
+    Zyklus. Der Zyklus läuft als Coroutine; statt im Writer zu schlafen, wartet sie
+    auf der Ereignisschleife, so dass sich alle Stationen einen Thread teilen.
+
+    Uhr (clock, wie time.time) und Ziel (start(sink)) sind austauschbar, z.B. für den
+    Zeitraffer. Ist timeline eine Liste, wird jedes Ereignis des Zyklus als
+    (Art, Sample-Position, Details) angehängt.
+    """
+
+    def __init__(self, name, sample_rate, fifo_path, render_segments, countdown, interval_seconds, timezone=None,
+                 output=None, on_cycle=None, clock=time.time):
+        self.name = name
+        self.sample_rate = sample_rate
+        self.fifo_path = fifo_path
+        self.countdown = countdown  # CountdownBlock, von allen Stationen gemeinsam genutzt
+        self.timezone = timezone  # ZoneInfo oder None (Ortszeit)
+        self.output = output or OutputFormat(sample_rate)
+        self.on_cycle = on_cycle  # on_cycle(announcement_time), z.B. um die TTS-Deadline zu setzen
+        self.writer = PcmStreamWriter(sample_rate, output=self.output)
+        self.scheduler = SampleScheduler(sample_rate, interval_seconds, countdown.seconds, clock=clock)
+        self.look_ahead = LookAheadRenderer(render_segments)
+        self.sink = None
+        self.timeline = None  # Liste der Zyklus-Ereignisse, nur wenn ein Bericht gewünscht ist
+        self._batch_samples = max(1, int(WRITE_BATCH_SECONDS * sample_rate))
+
+    def start(self, sink=None):
+        """
+        Startet den FIFO-Sink (ohne FIFO nur die Abgriffe) und verankert den Zeitplan.
+        Ein übergebener sink (mit write_views()) ersetzt die FIFO.
+        """
+        if sink is None and self.fifo_path:
+            sink = FifoSink(self.fifo_path, self.output)
+            sink.start()
+            log(f"[{self.name}] Schreibe Audio-Stream als {self.output.describe()} in Named Pipe '{self.fifo_path}'"
+                f"{f', Zeitzone {self.timezone}' if self.timezone else ''}...")
+        self.sink = sink
+        self.writer.attach(self.sink, pace=False)
+        self.scheduler.attach(self.writer)
+
+    def _record(self, kind, offset=0, **details):
+        if self.timeline is not None:
+            self.timeline.append((kind, self.writer.samples_written + offset, details))
+
+    async def _pace(self):
+        """Gibt die Schleife an die anderen Stationen ab, solange der Stream genug Vorlauf hat."""
+        lead = self.writer.lead_seconds()
+        await asyncio.sleep(max(0.0, lead - PACED_MAX_LEAD_SECONDS))
+
+    async def _write(self, segments):
+        if not self.writer.paced:
+            # Der Sink bestimmt das Tempo (z.B. Zeitraffer): am Stück schreiben, nur einmal abgeben
+            self.writer.write_segments(segments)
+            await asyncio.sleep(0)
+            return
+        for segment in segments:
+            for start in range(0, len(segment), self._batch_samples):
+                self.writer.write_samples(segment[start:start + self._batch_samples])
+                await self._pace()
+
+    async def _write_silence(self, num_samples):
+        if not self.writer.paced:
+            self.writer.write_silence(num_samples)
+            await asyncio.sleep(0)
+            return
+        while num_samples > 0:
+            chunk = min(num_samples, self._batch_samples)
+            self.writer.write_silence(chunk)
+            num_samples -= chunk
+            await self._pace()
+
+    async def cycle(self):
+        """Ein Ansage-Zyklus: Füll-Stille, Countdown, Ansage (wie die Hauptschleife der Skripte)."""
+        announcement_time = self.scheduler.next_announcement_time(self.writer)
+        self._record('cycle', planned=announcement_time)
+        if self.on_cycle is not None:
+            self.on_cycle(announcement_time)
+        self.look_ahead.schedule(datetime.datetime.fromtimestamp(announcement_time, self.timezone))
+
+        silence_samples = self.scheduler.filler_samples(self.writer, announcement_time)
+        if silence_samples > 0:
+            log(f"[{self.name}] Warte {silence_samples / self.sample_rate:.2f} Sekunden bis zum nächsten Ansage-Zyklus...")
+            await self._write_silence(silence_samples)
+
+        log(f"[{self.name}] Beginne {self.countdown.beats}-Sekunden-Countdown...")
+        for offset in self.countdown.beat_offsets():
+            self._record('beep', offset=offset)
+        await self._write([self.countdown.render(announcement_time)])
+        self.scheduler.measure(self.writer, announcement_time)
+
+        # Das Vorab-Rendering läuft in seinem eigenen Thread; hier wird nur darauf gewartet, ohne die Schleife zu blockieren
+        wait_start = time.monotonic()
+        target_time, segments = await asyncio.get_running_loop().run_in_executor(None, self.look_ahead.collect)
+        log(f"[{self.name}] Sende Ansage für {target_time:%H:%M:%S}.")
+        self._record('announcement', planned=announcement_time, announced=target_time.timestamp() if target_time else None,
+                     segments=len(segments), render_wait=time.monotonic() - wait_start)
+        await self._write(segments)
+        log(f"[{self.name}] Alle Ansagen gesendet. "
+            f"Abweichung vom Raster: {self.scheduler.alignment_error_seconds * 1000:+.0f} ms, "
+            f"Drift: {self.scheduler.drift_seconds * 1000:+.0f} ms.")
+
+    async def wait_ready(self, ready):
+        """Sendet Stille, bis ready (threading.Event) gesetzt ist, z.B. solange der Start im Hintergrund aufwärmt."""
+        while not ready.is_set():
+            await self._write_silence(self._batch_samples)
+
+    async def run(self, until=None, ready=None):
+        """Betreibt die Station dauerhaft oder bis ihre Uhr 'until' erreicht (mit 'ready' erst nach wait_ready())."""
+        if ready is not None:
+            await self.wait_ready(ready)
+        while until is None or self.scheduler.clock() < until:
+            try:
+                await self.cycle()
+            except Exception as e:
+                log(f"FEHLER in Station '{self.name}': {e}. Versuche es erneut in {STATION_RETRY_SECONDS} Sekunden.")
+                self._record('error', message=str(e))
+                if self.writer.paced:
+                    await asyncio.sleep(STATION_RETRY_SECONDS)
+                else:
+                    # Ohne Wanduhr (z.B. Zeitraffer) vergeht die Pause nur im Stream
+                    await self._write_silence(int(STATION_RETRY_SECONDS * self.sample_rate))
+
+
+def create_station(config, sample_rate, render_segments, countdown, interval_seconds, on_cycle=None, create_fifo=True):
+    """
+    Baut eine Station aus einem Eintrag der Stationsliste. Schlüssel: 'name', 'fifo_path'
+    (None = keine FIFO), optional 'timezone' (z.B. "Europe/Berlin"), 'interval_seconds',
+    'sample_rate' und 'sample_format' der FIFO. Gibt None zurück, wenn die FIFO fehlt
+    und nicht angelegt werden kann (mit create_fifo=False wird sie gar nicht angefasst).
+    """
+    name = config.get('name') or config.get('fifo_path')
+    fifo_path = config.get('fifo_path')
+    if create_fifo and fifo_path and not ensure_fifo(fifo_path):
+        return None
+    timezone = ZoneInfo(config['timezone']) if config.get('timezone') else None
+    output = OutputFormat(sample_rate, config.get('sample_rate'), config.get('sample_format', 'float32'))
+    return Station(name, sample_rate, fifo_path, render_segments, countdown, config.get('interval_seconds', interval_seconds),
+                   timezone, output, on_cycle)
+
+
+def run_stations(stations, ready=None):
+    """
+    Betreibt alle Stationen auf einer gemeinsamen asyncio-Ereignisschleife (kehrt nicht zurück).
+    Bis 'ready' (threading.Event) gesetzt ist, senden alle Stationen Stille.
+    """
+    async def serve():
+        for station in stations:
+            station.start()
+        STATION_COUNT.set(len(stations))
+        log(f"INFO: {len(stations)} Stationen auf einer Ereignisschleife gestartet.")
+        await asyncio.gather(*(station.run(ready=ready) for station in stations))
+
+    asyncio.run(serve())
@@ -0,0 +1,127 @@
+import os
+import tempfile
+import threading
+
+from zeitansage_log import log
+
+# --- Konfiguration ---
+# pyttsx3 kann nur in Dateien schreiben; /dev/shm liegt im RAM und schont die SD-Karte
+TTS_TEMP_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+
+# --- Hilfsfunktionen ---
+
+def get_voice_by_lang_code(engine, lang_code_prefix, voice_ids=None):
+    """
+    Sucht eine passende Stimme basierend auf einem Sprachcode-Präfix.
+    Mit 'voice_ids' wird eine bereits ermittelte Stimmenliste durchsucht.
+    """
+    if voice_ids is None:
+        voice_ids = [voice.id for voice in engine.getProperty('voices')]
+    for voice_id in voice_ids:
+        if lang_code_prefix.lower() in voice_id.lower():
+            return voice_id
+    return None  # Fallback to default
+
+
+# --- pyttsx3-Engine-Verwaltung ---
+
+class Pyttsx3EngineManager:
+    """
+    Hält eine einzige, langlebige pyttsx3-Engine pro Prozess.
+
+    Die Zuordnung Sprachcode-Präfix -> Stimmen-ID wird nur einmal pro Präfix
+    ermittelt, Eigenschaften (voice, rate, volume) werden nur gesetzt, wenn sie
+    sich ändern. Wirft der Treiber einen Fehler, wird die Engine verworfen und
+    beim nächsten Versuch neu initialisiert. Die Treiber (espeak, sapi5) sind an
+    den Thread gebunden, der die Engine erzeugt: warm_up() und alle Synthesen
+    müssen im selben Thread laufen.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()  # pyttsx3 ist nicht threadsicher
+        self._engine = None
+        self._voice_ids = None      # Alle Stimmen-IDs des Treibers, einmalig ermittelt
+        self._default_voice = None  # Standardstimme der Engine
+        self._voices = {}           # lang_code_prefix -> voice_id oder None
+        self._properties = {}       # aktuell in der Engine gesetzte Eigenschaften
+
+    def _get_engine(self):
+        if self._engine is None:
+            import pyttsx3
+            self._engine = pyttsx3.init()
+            self._properties = {}
+            if self._voice_ids is None:
+                self._voice_ids = [voice.id for voice in self._engine.getProperty('voices')]
+                self._default_voice = self._engine.getProperty('voice')
+        return self._engine
+
+    def _voice_id(self, engine, lang_code_prefix):
+        if lang_code_prefix not in self._voices:
+            voice_id = get_voice_by_lang_code(engine, lang_code_prefix, self._voice_ids)
+            if voice_id:
+                log(f"INFO: Stimme für '{lang_code_prefix}' gefunden: {voice_id}")
+            else:
+                log(f"WARNUNG: Keine Stimme für '{lang_code_prefix}' gefunden. Verwende Standardstimme.")
+            self._voices[lang_code_prefix] = voice_id
+        return self._voices[lang_code_prefix] or self._default_voice
+
+    def _set_property(self, engine, name, value):
+        if value is not None and self._properties.get(name) != value:
+            engine.setProperty(name, value)
+            self._properties[name] = value
+
+    def warm_up(self):
+        """Initialisiert die Engine vorab, damit die erste Synthese nicht darauf wartet."""
+        with self._lock:
+            self._get_engine()
+
+    def reset(self):
+        """Verwirft die Engine (z.B. nach einem Treiberfehler); die Stimmenzuordnung bleibt erhalten."""
+        engine, self._engine = self._engine, None
+        self._properties = {}
+        if engine is not None:
+            try:
+                engine.stop()
+            except Exception:
+                pass
+
+    def save_to_file(self, text, output_path, volume, speech_rate, lang_code_prefix=None):
+        """
+        Synthetisiert 'text' in eine WAV-Datei. Bei einem Treiberfehler wird die
+        Engine einmal neu initialisiert und der Versuch wiederholt.
+        """
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    engine = self._get_engine()
+                    if lang_code_prefix:
+                        self._set_property(engine, 'voice', self._voice_id(engine, lang_code_prefix))
+                    else:
+                        self._set_property(engine, 'voice', self._default_voice)
+                    self._set_property(engine, 'rate', speech_rate)
+                    self._set_property(engine, 'volume', volume)
+                    engine.save_to_file(text, output_path)
+                    engine.runAndWait()
+                    return True
+                except Exception as e:
+                    log(f"FEHLER: pyttsx3-Treiber fehlgeschlagen ({e}). Initialisiere Engine neu...")
+                    self.reset()
+            return False
+
+    def synthesize_wav_bytes(self, text, volume, speech_rate, lang_code_prefix=None):
+        """
+        Synthetisiert 'text' und gibt die WAV-Daten als Bytes zurück (oder None).
+        pyttsx3 bietet keine Ausgabe in den Speicher, nur save_to_file(); die
+        Zwischendatei liegt daher in TTS_TEMP_DIR (im RAM, wenn /dev/shm existiert)
+        und wird auch bei einem Fehler sofort wieder gelöscht.
+        """
+        fd, temp_path = tempfile.mkstemp(suffix=".wav", prefix="zeitansage_tts_", dir=TTS_TEMP_DIR)
+        os.close(fd)
+        try:
+            if not self.save_to_file(text, temp_path, volume, speech_rate, lang_code_prefix):
+                return None
+            with open(temp_path, 'rb') as wav_file:
+                return wav_file.read()
+        finally:
+            os.remove(temp_path)
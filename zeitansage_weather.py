@@ -0,0 +1,145 @@
+import json
+import time
+import threading
+
+from zeitansage_metrics import METRICS
+from zeitansage_log import log
+
+# --- Konfiguration ---
+WEATHER_REFRESH_SECONDS = 60     # TTL: so oft werden die Wetterdaten im Hintergrund erneuert
+WEATHER_MAX_AGE_SECONDS = 600    # Ältere Daten gelten als nicht verfügbar
+
+# --- Metriken ---
+WEATHER_FETCH_SECONDS = METRICS.histogram('zeitansage_weather_fetch_seconds', "Dauer eines Wetterabrufs")
+WEATHER_FETCH_FAILURES = METRICS.counter('zeitansage_weather_fetch_failures_total', "Fehlgeschlagene Wetterabrufe")
+WEATHER_AGE = METRICS.gauge('zeitansage_weather_age_seconds', "Alter der ausgelieferten Wetterdaten beim letzten Abruf")
+
+
+# --- Hilfsfunktionen ---
+
+def fetch_weather_data(url, timeout, session=None):
+    """Ruft Wetterdaten von einer URL ab und parst sie als JSON (über eine Keep-Alive-Session, falls angegeben)."""
+    import requests  # Erst beim ersten Abruf (im Hintergrund), spart Importzeit beim Start
+    try:
+        response = (session or requests).get(url, timeout=timeout)
+        response.raise_for_status()
+        return json.loads(response.text)
+    except requests.exceptions.Timeout:
+        log(f"FEHLER: Timeout beim Abrufen von Wetterdaten von {url}")
+        return None
+    except requests.exceptions.ConnectionError:
+        log(f"FEHLER: Verbindungsfehler beim Abrufen von Wetterdaten von {url}. Ist der Server erreichbar?")
+        return None
+    except requests.exceptions.HTTPError as e:
+        log(f"FEHLER: HTTP-Fehler {e.response.status_code} beim Abrufen von Wetterdaten von {url}")
+        return None
+    except json.JSONDecodeError:
+        log(f"FEHLER: Konnte JSON von {url} nicht parsen. Ungültiges JSON-Format. Raw-Daten: '{response.text[:100]}...'")
+        return None
+    except Exception as e:
+        log(f"Ein unerwarteter Fehler ist beim Abrufen/Parsen von Wetterdaten aufgetreten: {e}")
+        return None
+
+
+# --- Wetter-Poller ---
+
+class WeatherPoller:
+    """
+    Hält die Wetterdaten im Hintergrund aktuell, damit der Ansage-Zyklus nie
+    auf den Wetterserver warten muss.
+
+    Alle refresh_seconds wird über eine wiederverwendete requests.Session neu
+    abgerufen; bis dahin (und bei Fehlern bis max_age_seconds) wird der letzte
+    gültige Wert ausgeliefert. Ändern sich die Werte, wird prepare(data) im
+    Hintergrund-Thread aufgerufen (z.B. um die Wetteransagen vorab zu rendern);
+    das Ergebnis liefert prepared(). Bei fehlenden oder veralteten Daten wird
+    prepare(None) aufgerufen. Mit url = None wird nicht abgerufen, prepare(None)
+    also nur einmal aufgerufen.
+    """
+
+    def __init__(self, url, timeout, prepare=None, refresh_seconds=WEATHER_REFRESH_SECONDS,
+                 max_age_seconds=WEATHER_MAX_AGE_SECONDS, session=None):
+        self.url = url
+        self.timeout = timeout
+        self.prepare = prepare
+        self.refresh_seconds = refresh_seconds
+        self.max_age_seconds = max_age_seconds
+        self.session = session  # Wird beim ersten Abruf angelegt
+        self._data = None
+        self._fetched_at = None  # time.monotonic() des letzten erfolgreichen Abrufs
+        self._prepared_for = object()  # Daten, für die _prepared zuletzt erzeugt wurde
+        self._prepared = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self.ready = threading.Event()  # Gesetzt nach dem ersten Abruf samt Aufbereitung (auch wenn er fehlschlug)
+        self._thread = None
+
+    def start(self):
+        """Startet den Hintergrund-Thread; der erste Abruf erfolgt sofort."""
+        self._thread = threading.Thread(target=self._run, name="zeitansage-weather", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def reprepare(self):
+        """
+        Ruft sofort neu ab und bereitet die Daten neu auf, auch wenn sie sich nicht
+        geändert haben (z.B. nach neuer Lautstärke).
+        """
+        self._prepared_for = object()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            try:
+                self.refresh()
+            finally:
+                self.ready.set()  # Auch ein fehlgeschlagener erster Abruf darf den Start nicht aufhalten
+            self._wake.wait(self.refresh_seconds)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+
+    def refresh(self):
+        """Ruft die Wetterdaten einmal ab und bereitet sie bei Änderungen neu auf."""
+        if self.url is None:  # Abruf abgeschaltet (z.B. ohne requests): es gibt nur "nicht verfügbar"
+            data = None
+        else:
+            if self.session is None:
+                import requests
+                self.session = requests.Session()
+            with WEATHER_FETCH_SECONDS.time():
+                data = fetch_weather_data(self.url, self.timeout, self.session)
+        if data is not None:
+            self._data, self._fetched_at = data, time.monotonic()
+        elif self.url is not None:
+            WEATHER_FETCH_FAILURES.inc()
+            if self._data is not None:
+                log(f"INFO: Verwende zwischengespeicherte Wetterdaten ({self.age():.0f} Sekunden alt).")
+        WEATHER_AGE.set(self.age() or 0.0)
+        current = self.current()
+        if current != self._prepared_for:
+            if self.prepare is not None:
+                try:
+                    self._prepared = self.prepare(current)
+                except Exception as e:
+                    log(f"FEHLER: Aufbereitung der Wetterdaten fehlgeschlagen: {e}")
+                    return
+            self._prepared_for = current
+
+    def age(self):
+        """Alter der letzten gültigen Wetterdaten in Sekunden (None, wenn es keine gibt)."""
+        return None if self._fetched_at is None else time.monotonic() - self._fetched_at
+
+    def current(self):
+        """Letzte gültige Wetterdaten, oder None wenn es keine gibt oder sie zu alt sind."""
+        age = self.age()
+        if age is None or age > self.max_age_seconds:
+            return None
+        return self._data
+
+    def prepared(self):
+        """Ergebnis von prepare() für die aktuellen Wetterdaten (None, solange noch nichts vorliegt)."""
+        return self._prepared